@@ -75,6 +75,7 @@ async def run_diagnose_and_repair(db: AsyncSession, operator: str, context: Dict
                     components=args.get("components"),
                     node_hostname=args.get("node_hostname"),
                     lines=int(args.get("lines", 200)),
+                    window_minutes=int(args.get("window_minutes", 180)),
                 )
             elif name == "run_cluster_command":
                 result = await tool_run_cluster_command(
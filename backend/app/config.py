@@ -39,7 +39,55 @@ JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 SSH_PORT = int(os.getenv("SSH_PORT", "22"))
 SSH_TIMEOUT = int(os.getenv("SSH_TIMEOUT", "10"))
 
+# SSH pool: connections per host, concurrent channels per connection (keep below sshd MaxSessions, default 10),
+# idle connections closed after N seconds, keepalive interval, max wait for a free channel
+SSH_MAX_TRANSPORTS_PER_HOST = int(os.getenv("SSH_MAX_TRANSPORTS_PER_HOST", "2"))
+SSH_MAX_CHANNELS_PER_TRANSPORT = int(os.getenv("SSH_MAX_CHANNELS_PER_TRANSPORT", "8"))
+SSH_IDLE_SECONDS = float(os.getenv("SSH_IDLE_SECONDS", "300"))
+SSH_KEEPALIVE_SECONDS = int(os.getenv("SSH_KEEPALIVE_SECONDS", "30"))
+SSH_ACQUIRE_TIMEOUT = float(os.getenv("SSH_ACQUIRE_TIMEOUT", "30"))
+# Default limit (seconds) for one awaitable remote command issued by request handlers; the channel is closed on expiry
+SSH_EXEC_TIMEOUT = float(os.getenv("SSH_EXEC_TIMEOUT", "60"))
+# Cluster-wide reads (e.g. /hadoop/logs/all): nodes handled at once, and each node's deadline in seconds
+SSH_FANOUT_CONCURRENCY = int(os.getenv("SSH_FANOUT_CONCURRENCY", "16"))
+SSH_FANOUT_NODE_TIMEOUT = float(os.getenv("SSH_FANOUT_NODE_TIMEOUT", "30"))
+
 ssh_port = SSH_PORT
 ssh_timeout = SSH_TIMEOUT
 
 LOG_DIR = os.getenv("HADOOP_LOG_DIR", "/usr/local/hadoop/logs")
+# Ranged log reads: default and maximum bytes returned per request, and how many bytes a
+# filtered (grep/since/until) read may scan on the remote side per request
+LOG_READ_DEFAULT_BYTES = int(os.getenv("LOG_READ_DEFAULT_BYTES", str(256 * 1024)))
+LOG_READ_MAX_BYTES = int(os.getenv("LOG_READ_MAX_BYTES", str(4 * 1024 * 1024)))
+LOG_READ_SCAN_BYTES = int(os.getenv("LOG_READ_SCAN_BYTES", str(64 * 1024 * 1024)))
+
+# Log Collector Configuration
+# All collectors share one event loop; these bound the SSH worker threads and DB connections it may use.
+LOG_COLLECTOR_SSH_WORKERS = int(os.getenv("LOG_COLLECTOR_SSH_WORKERS", "16"))
+LOG_COLLECTOR_DB_POOL_SIZE = int(os.getenv("LOG_COLLECTOR_DB_POOL_SIZE", "4"))
+# "copy" writes hadoop_logs rows with asyncpg binary COPY; "orm" uses ORM inserts
+LOG_INGEST_MODE = os.getenv("LOG_INGEST_MODE", "copy")
+# Write-behind buffer shared by all collectors: flush every N rows or after N ms, block producers above N queued rows
+LOG_INGEST_BATCH_ROWS = int(os.getenv("LOG_INGEST_BATCH_ROWS", "5000"))
+LOG_INGEST_MAX_DELAY_MS = int(os.getenv("LOG_INGEST_MAX_DELAY_MS", "200"))
+LOG_INGEST_QUEUE_ROWS = int(os.getenv("LOG_INGEST_QUEUE_ROWS", "50000"))
+# hadoop_logs daily partitions (see app/scripts/partition_hadoop_logs.py): days kept (0 = forever),
+# "drop" or "detach" expired days, partitions created ahead, maintenance period
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+LOG_RETENTION_ACTION = os.getenv("LOG_RETENTION_ACTION", "drop")
+LOG_PARTITION_PREMAKE_DAYS = int(os.getenv("LOG_PARTITION_PREMAKE_DAYS", "3"))
+LOG_PARTITION_MAINTENANCE_SECONDS = int(os.getenv("LOG_PARTITION_MAINTENANCE_SECONDS", "3600"))
+# Fault rule catalog (YAML, see fault_rules.example.yaml); empty uses the built-in rules. Checked for changes every N seconds
+FAULT_RULES_FILE = os.getenv("FAULT_RULES_FILE", "")
+FAULT_RULES_RELOAD_SECONDS = float(os.getenv("FAULT_RULES_RELOAD_SECONDS", "5"))
+# A (node, component) whose collector fed no lines for this many seconds is read over SSH instead of from the stream
+FAULT_STREAM_STALE_SECONDS = int(os.getenv("FAULT_STREAM_STALE_SECONDS", "60"))
+# Metric history tiers: raw samples, 1-minute and 1-hour rollups (min/avg/max/p95) and how long each is kept
+METRICS_RAW_TTL_HOURS = int(os.getenv("METRICS_RAW_TTL_HOURS", "48"))
+METRICS_1M_TTL_DAYS = int(os.getenv("METRICS_1M_TTL_DAYS", "30"))
+METRICS_1H_TTL_DAYS = int(os.getenv("METRICS_1H_TTL_DAYS", "400"))
+METRICS_ROLLUP_SECONDS = int(os.getenv("METRICS_ROLLUP_SECONDS", "60"))
+# Metrics scheduler: concurrent node probes per tick and how long one probe may take
+METRICS_PROBE_WORKERS = int(os.getenv("METRICS_PROBE_WORKERS", "16"))
+METRICS_PROBE_TIMEOUT_SECONDS = float(os.getenv("METRICS_PROBE_TIMEOUT_SECONDS", "10"))
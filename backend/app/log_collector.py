@@ -1,55 +1,119 @@
-import threading
 import time
 import uuid
-import datetime
-from typing import Dict, List, Optional
+from concurrent.futures import Future
+import re
+import shlex
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker, AsyncEngine
 from .log_reader import log_reader
-from .ssh_utils import ssh_manager
-from .db import SessionLocal
-from .models.hadoop_logs import HadoopLog
-from sqlalchemy import text
+from .log_parser import log_parser
+from .log_templates import TemplateMiners
+from .ssh_utils import ssh_manager, aiter_channel
+from .models.hadoop_log_checkpoints import HadoopLogCheckpoint
+from .log_ingest import LogIngestBuffer, to_log_record
+from .services.log_schema import ensure_log_schema
+from .services.log_partitions import maintain_log_partitions
+from .services.fault_detection import fault_detector
+from .services.background_loop import BackgroundLoop
+from sqlalchemy import select, text
 import asyncio
-from .config import BJ_TZ, DATABASE_URL, APP_TIMEZONE
+from .config import (
+    DATABASE_URL, APP_TIMEZONE, SSH_EXEC_TIMEOUT, LOG_COLLECTOR_SSH_WORKERS, LOG_COLLECTOR_DB_POOL_SIZE, LOG_INGEST_MODE,
+    LOG_INGEST_BATCH_ROWS, LOG_INGEST_MAX_DELAY_MS, LOG_INGEST_QUEUE_ROWS, LOG_PARTITION_MAINTENANCE_SECONDS,
+)
+
+SHIPPER_LOG_TYPE = "shipper"
+
+_FRAME_RE = re.compile(rb"^(\d+)\t")
+
+
+def build_follow_command(targets: List[Tuple[str, int]]) -> str:
+    """Build one remote command that follows several files from given byte offsets.
+
+    Every output line is framed as `<index>\t<original line>`, index being the
+    file's position in targets, so one channel can carry all of them. Each
+    tail follows the file it opened (`-f`, not `-F`), so a frame always comes
+    from the inode that was stat'ed before the channel was opened, and a
+    replacement file is only read after reopening. Framing
+    is one unbuffered sed per file rather than a shell loop per line (awk
+    implementations such as mawk block-buffer a pipe); an unterminated last
+    line is held back until its newline arrives.
+    """
+    parts = []
+    for idx, (path, offset) in enumerate(targets):
+        parts.append(f"tail -f --bytes=+{int(offset) + 1} {shlex.quote(path)} | sed -u 's/^/{idx}\\t/' &")
+    script = "LC_ALL=C; export LC_ALL; " + " ".join(parts) + " wait"
+    return f"sh -c {shlex.quote(script)}"
+
+
+def split_follow_frames(data: bytes) -> Tuple[List[Tuple[int, bytes]], bytes]:
+    """Split framed follow output into (index, line bytes incl. newline) and the incomplete rest."""
+    cut = data.rfind(b"\n") + 1
+    frames: List[Tuple[int, bytes]] = []
+    if cut:
+        for line in data[:cut - 1].split(b"\n"):
+            m = _FRAME_RE.match(line)
+            if m:
+                frames.append((int(m.group(1)), line[m.end():] + b"\n"))
+    return frames, data[cut:]
+
 
 class LogCollector:
-    """Real-time log collector for Hadoop cluster"""
+    """Real-time log collector for Hadoop cluster
+
+    Every collector runs as a task on one shared event loop; SSH calls go to
+    a bounded worker pool and database writes share one bounded engine.
+    """
     
     def __init__(self):
-        self.collectors: Dict[str, threading.Thread] = {}
+        self.collectors: Dict[str, Future] = {}
         self.is_running: bool = False
         self.collection_interval: int = 5  # 默认采集间隔，单位：秒
-        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
-        self._engines: Dict[str, AsyncEngine] = {}
-        self._session_locals: Dict[str, async_sessionmaker[AsyncSession]] = {}
+        self._runtime = BackgroundLoop("log-collector", max_workers=LOG_COLLECTOR_SSH_WORKERS)
+        self._engine: Optional[AsyncEngine] = None
+        self._session_local: Optional[async_sessionmaker[AsyncSession]] = None
+        self._ingest: Optional[LogIngestBuffer] = None
+        self._templates = TemplateMiners()
         self._intervals: Dict[str, int] = {}
+        self._modes: Dict[str, str] = {}
         self._cluster_name_cache: Dict[str, str] = {}
         self._targets: Dict[str, str] = {}
         self._line_counts: Dict[str, int] = {}
+        self._positions: Dict[Tuple[str, str], Tuple[int, int]] = {}  # (node, path) -> committed (inode, offset)
+        self._schema_ready: bool = False
+        self.rotation_recovered_bytes: Dict[str, int] = {}  # collector id -> bytes read from rotated files
         self.max_bytes_per_pull: int = 256 * 1024
+        self.stream_flush_interval: float = 0.2  # stream 模式下缓冲行的最长等待时间，单位：秒
+        self._maintenance: Optional[Future] = None
     
-    def start_collection(self, node_name: str, log_type: str, ip: Optional[str] = None, interval: Optional[int] = None) -> bool:
-        """Start real-time log collection for a specific node and log type"""
+    def start_collection(self, node_name: str, log_type: str, ip: Optional[str] = None, interval: Optional[int] = None, mode: str = "poll") -> bool:
+        """Start real-time log collection for a specific node and log type
+
+        mode="poll" checks the file every interval; mode="stream" keeps one
+        `tail -f` channel open and saves lines as they arrive (the interval
+        is then the reconnect delay and how often rotation is checked).
+        """
+        if mode not in ("poll", "stream"):
+            raise ValueError(f"Unsupported collection mode: {mode}")
         collector_id = f"{node_name}_{log_type}"
         if interval is not None:
             self._intervals[collector_id] = max(1, int(interval))
         
-        if collector_id in self.collectors and self.collectors[collector_id].is_alive():
+        if collector_id in self.collectors and not self.collectors[collector_id].done():
             print(f"Collector {collector_id} is already running")
             return False
         
         # Start even if log file not yet exists; collector will self-check in loop
         
-        # Create a new collector thread
-        collector_thread = threading.Thread(
-            target=self._collect_logs,
-            args=(node_name, log_type, ip),
-            name=collector_id,
-            daemon=True
-        )
-        
-        self.collectors[collector_id] = collector_thread
-        collector_thread.start()
+        # Schedule the collector as a task on the shared loop
+        self._modes[collector_id] = mode
+        if mode == "stream":
+            task = self._stream_logs(node_name, log_type, ip)
+        else:
+            task = self._collect_logs(node_name, log_type, ip)
+        self.collectors[collector_id] = self._runtime.submit(task)
+        self.is_running = True
+        self._ensure_maintenance()
         print(f"Started collector {collector_id}")
         return True
     
@@ -58,10 +122,11 @@ class LogCollector:
         collector_id = f"{node_name}_{log_type}"
         
         if collector_id in self.collectors:
-            # Threads are daemon, so they will exit when main process exits
-            # We just remove it from our tracking
-            del self.collectors[collector_id]
+            # Cancelling the future cancels the task on the collector loop
+            self.collectors.pop(collector_id).cancel()
             self._intervals.pop(collector_id, None)
+            self._modes.pop(collector_id, None)
+            self.is_running = bool(self.collectors)
             print(f"Stopped collector {collector_id}")
         else:
             print(f"Collector {collector_id} is not running")
@@ -69,163 +134,258 @@ class LogCollector:
     def stop_all_collections(self):
         """Stop all log collections"""
         for collector_id in list(self.collectors.keys()):
-            self.stop_collection(*collector_id.split("_"))
+            self.stop_collection(*collector_id.rsplit("_", 1))
+
+    def _get_session_local(self) -> async_sessionmaker[AsyncSession]:
+        """Shared session factory for all collectors; must be used on the collector loop"""
+        if self._session_local is None:
+            self._engine = create_async_engine(
+                DATABASE_URL,
+                echo=False,
+                pool_pre_ping=True,
+                connect_args={"server_settings": {"timezone": APP_TIMEZONE}},
+                pool_size=max(1, LOG_COLLECTOR_DB_POOL_SIZE),
+                max_overflow=0,
+            )
+            self._session_local = async_sessionmaker(self._engine, expire_on_commit=False, class_=AsyncSession)
+        return self._session_local
     
     def _parse_log_line(self, line: str, node_name: str, log_type: str):
         """Parse a single log line and return a dictionary of log fields"""
-        # Extract timestamp from the log line (format: [2023-12-17 10:00:00,123])
-        timestamp = None
-        log_level = "INFO"  # Default log level
-        message = line
-        exception = None
-        
-        # Simple log parsing logic
-        if line.startswith('['):
-            # Extract timestamp
-            timestamp_end = line.find(']', 1)
-            if timestamp_end > 0:
-                timestamp_str = line[1:timestamp_end]
-                try:
-                    timestamp = datetime.datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S,%f").replace(tzinfo=BJ_TZ)
-                except ValueError:
-                    # If parsing fails, use current time
-                    timestamp = datetime.datetime.now(BJ_TZ)
-        
-        # Extract log level
-        log_levels = ["ERROR", "WARN", "INFO", "DEBUG", "TRACE"]
-        for level in log_levels:
-            if f" {level} " in line:
-                log_level = level
-                break
-        
-        return {
-            "timestamp": timestamp or datetime.datetime.now(BJ_TZ),
-            "log_level": log_level,
-            "message": message,
-            "host": node_name,
-            "service": log_type,
-            "raw_log": line
-        }
+        return log_parser.parse_line(line, node_name, log_type)
     
-    async def _save_log_to_db(self, log_data: Dict, collector_id: str | None = None):
+    async def _get_cluster_name(self, session: AsyncSession, host: str) -> str:
+        """Resolve (and cache) the cluster name a host belongs to"""
+        cluster_name = self._cluster_name_cache.get(host)
+        if not cluster_name:
+            cluster_res = await session.execute(text("""
+                SELECT c.name
+                FROM clusters c
+                JOIN nodes n ON c.id = n.cluster_id
+                WHERE n.hostname = :hn LIMIT 1
+            """), {"hn": host})
+            cluster_row = cluster_res.first()
+            cluster_name = cluster_row[0] if cluster_row else "default_cluster"
+            self._cluster_name_cache[host] = cluster_name
+        return cluster_name
+
+    async def _save_log_to_db(self, log_data: Dict):
         """Save log data to database"""
+        await self._save_logs_to_db_batch([log_data])
+
+    async def _ensure_schema(self, session: AsyncSession):
+        if not self._schema_ready:
+            await ensure_log_schema(session)
+            self._schema_ready = True
+
+    async def _load_checkpoint(self, node_name: str, path: str) -> Optional[Tuple[int, int]]:
+        """Latest committed (inode, offset) for a remote file, from memory or the checkpoint table"""
+        pos = self._positions.get((node_name, path))
+        if pos is not None:
+            return pos
         try:
-            session_local = self._session_locals.get(collector_id) if collector_id else None
-            async with (session_local() if session_local else SessionLocal()) as session:
-                # 获取集群名称
-                host = log_data["host"]
-                cluster_name = self._cluster_name_cache.get(host)
-                if not cluster_name:
-                    cluster_res = await session.execute(text("""
-                        SELECT c.name
-                        FROM clusters c
-                        JOIN nodes n ON c.id = n.cluster_id
-                        WHERE n.hostname = :hn LIMIT 1
-                    """), {"hn": host})
-                    cluster_row = cluster_res.first()
-                    cluster_name = cluster_row[0] if cluster_row else "default_cluster"
-                    self._cluster_name_cache[host] = cluster_name
-
-                # Create HadoopLog instance
-                hadoop_log = HadoopLog(
-                    log_time=log_data["timestamp"],
-                    node_host=log_data["host"],
-                    title=log_data["service"],
-                    info=log_data["message"],
-                    cluster_name=cluster_name
+            async with self._get_session_local()() as session:
+                await self._ensure_schema(session)
+                res = await session.execute(
+                    select(HadoopLogCheckpoint.inode, HadoopLogCheckpoint.byte_offset)
+                    .where(HadoopLogCheckpoint.node_host == node_name, HadoopLogCheckpoint.file_path == path)
+                    .order_by(HadoopLogCheckpoint.updated_at.desc())
+                    .limit(1)
                 )
-                
-                # Add to session and commit
-                session.add(hadoop_log)
-                await session.commit()
+                row = res.first()
         except Exception as e:
-            print(f"Error saving log to database: {e}")
+            print(f"Error loading checkpoint for {node_name}:{path}: {e}")
+            return None
+        if row:
+            self._positions[(node_name, path)] = (int(row[0]), int(row[1]))
+            return self._positions[(node_name, path)]
+        return None
+
+    def _resume_offset(self, size: int, inode: int, checkpoint: Optional[Tuple[int, int]]) -> int:
+        """Where to start reading a file of the given size/inode
+
+        Same inode resumes at the committed offset (or 0 if the file was
+        truncated below it); a different inode is a new file and is read from
+        the start; with no checkpoint at all only the last max_bytes_per_pull
+        bytes are taken, like before checkpoints existed.
+        """
+        if checkpoint is None:
+            return max(0, size - self.max_bytes_per_pull)
+        cp_inode, cp_offset = checkpoint
+        if cp_inode != inode:
+            return 0
+        return cp_offset if cp_offset <= size else 0
     
-    async def _save_logs_to_db_batch(self, logs: List[Dict], collector_id: str | None = None):
-        """Save a batch of logs to database in one transaction"""
+    async def _save_logs_to_db_batch(self, logs: List[Dict], checkpoint: Optional[Dict] = None) -> bool:
+        """Save a batch of logs to database through the shared write-behind buffer
+
+        Rows from all collectors are coalesced into bounded transactions.
+        When checkpoint ({node_host, file_path, inode, offset}) is given, the
+        file offset is committed in the same transaction as the rows, so a
+        restart resumes exactly after the last saved line. Every line is
+        also assigned a mined template (template_id, params) whose counts are
+        committed with the rows, and committed lines are fed to the fault
+        rule detector. Returns False when the rows were dropped
+        after failed flushes.
+        """
         try:
-            session_local = self._session_locals.get(collector_id) if collector_id else None
-            async with (session_local() if session_local else SessionLocal()) as session:
-                host = logs[0]["host"] if logs else None
-                cluster_name = self._cluster_name_cache.get(host) if host else None
-                if host and not cluster_name:
-                    cluster_res = await session.execute(text("""
-                        SELECT c.name
-                        FROM clusters c
-                        JOIN nodes n ON c.id = n.cluster_id
-                        WHERE n.hostname = :hn LIMIT 1
-                    """), {"hn": host})
-                    cluster_row = cluster_res.first()
-                    cluster_name = cluster_row[0] if cluster_row else "default_cluster"
-                    self._cluster_name_cache[host] = cluster_name
-
-                objs: list[HadoopLog] = []
-                for log_data in logs:
-                    objs.append(HadoopLog(
-                        log_time=log_data["timestamp"],
-                        node_host=log_data["host"],
-                        title=log_data["service"],
-                        info=log_data["message"],
-                        cluster_name=cluster_name or "default_cluster",
-                    ))
-                session.add_all(objs)
-                await session.commit()
+            host = logs[0]["host"] if logs else None
+            cluster_name = self._cluster_name_cache.get(host) if host else None
+            if host and not cluster_name:
+                async with self._get_session_local()() as session:
+                    cluster_name = await self._get_cluster_name(session, host)
+            cluster_name = cluster_name or "default_cluster"
+            templates = self._templates.annotate(cluster_name, logs)
+            records = [to_log_record(log_data, cluster_name) for log_data in logs]
+            ok = await self._get_ingest_buffer().submit(records, checkpoint, list(templates.values()))
+            if ok:
+                fault_detector.observe(cluster_name, logs)
+            if ok and checkpoint:
+                self._positions[(checkpoint["node_host"], checkpoint["file_path"])] = (checkpoint["inode"], checkpoint["offset"])
+            return ok
         except Exception as e:
             print(f"Error batch saving logs: {e}")
-    
-    def _collect_logs(self, node_name: str, log_type: str, ip: str):
-        """Internal method to collect logs continuously"""
+            return False
+
+    def _get_ingest_buffer(self) -> LogIngestBuffer:
+        """Shared write-behind buffer; must be used on the collector loop"""
+        if self._ingest is None:
+            self._ingest = LogIngestBuffer(
+                self._get_session_local(),
+                prepare=self._ensure_schema,
+                mode=LOG_INGEST_MODE,
+                max_batch_rows=LOG_INGEST_BATCH_ROWS,
+                max_delay=LOG_INGEST_MAX_DELAY_MS / 1000.0,
+                capacity=LOG_INGEST_QUEUE_ROWS,
+            )
+        return self._ingest
+
+    def get_ingest_stats(self) -> Dict:
+        """Queue depth, flush latency and dropped-row counters of the write-behind buffer"""
+        if self._ingest is None:
+            return {"queue_depth_rows": 0, "flushes": 0, "rows_written": 0, "dropped_rows": 0}
+        return self._ingest.get_stats()
+
+    async def _resolve_target(self, node_name: str, log_type: str, ip: str) -> Optional[str]:
+        """Find the remote log file for a collector"""
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        dirs = [
+            "/opt/module/hadoop-3.1.3/logs",
+            "/usr/local/hadoop/logs",
+            "/usr/local/hadoop-3.3.6/logs",
+            "/usr/local/hadoop-3.3.5/logs",
+            "/usr/local/hadoop-3.1.3/logs",
+            "/opt/hadoop/logs",
+            "/var/log/hadoop",
+        ]
+        for d in dirs:
+            out, err = await ssh_client.aexecute_command(f"ls -1 {d} 2>/dev/null", SSH_EXEC_TIMEOUT)
+            if not err and out.strip():
+                for fn in out.splitlines():
+                    f = fn.lower()
+                    if log_type in f and node_name in f:
+                        return f"{d}/{fn}"
+        return None
+
+    async def _stat_files(self, node_name: str, ip: str, paths: List[str]) -> Dict[str, Tuple[int, int]]:
+        """Return {path: (size, inode)} for the paths that exist"""
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        out, _ = await ssh_client.aexecute_command("stat -c '%s %i %n' " + " ".join(shlex.quote(p) for p in paths) + " 2>/dev/null", SSH_EXEC_TIMEOUT)
+        stats: Dict[str, Tuple[int, int]] = {}
+        for line in out.splitlines():
+            parts = line.split(" ", 2)
+            if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+                stats[parts[2]] = (int(parts[0]), int(parts[1]))
+        return stats
+
+    async def _read_range(self, node_name: str, ip: str, path: str, offset: int, length: int) -> bytes:
+        """Read up to length bytes of a remote file starting at offset"""
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        path_q = shlex.quote(path)
+        out, err = await ssh_client.aexecute_command_bytes(f"tail -c +{offset + 1} {path_q} 2>/dev/null | head -c {length}", SSH_EXEC_TIMEOUT)
+        if err:
+            out, err = await ssh_client.aexecute_command_bytes(f"dd if={path_q} bs=1 skip={offset} count={length} 2>/dev/null", SSH_EXEC_TIMEOUT)
+        return out
+
+    async def _drain_file(self, node_name: str, ip: str, log_type: str, path: str, inode: int, offset: int, size: int,
+                          read_path: Optional[str] = None, final: bool = False) -> int:
+        """Save complete lines of path between offset and size, committing the offset with each chunk
+
+        read_path reads the bytes from another name (a rotated file) while the
+        checkpoint stays keyed by path and inode; final also takes an
+        unterminated last line, since a rotated file will not grow any more.
+        Returns the offset reached; stops early if a save fails so the same
+        bytes are read again next time.
+        """
+        while offset < size:
+            data = await self._read_range(node_name, ip, read_path or path, offset, min(self.max_bytes_per_pull, size - offset))
+            if not data:
+                break
+            cut = data.rfind(b"\n") + 1
+            if not cut:
+                if len(data) < self.max_bytes_per_pull and not (final and offset + len(data) >= size):
+                    # Trailing partial line; wait until it is terminated
+                    break
+                cut = len(data)
+            elif final and offset + len(data) >= size:
+                cut = len(data)
+            checkpoint = {"node_host": node_name, "file_path": path, "inode": inode, "offset": offset + cut}
+            if not await self._save_log_chunk_async(node_name, log_type, data[:cut].decode("utf-8", errors="replace"), checkpoint=checkpoint):
+                break
+            offset += cut
+        return offset
+
+    async def _find_rotated(self, node_name: str, ip: str, path: str, inode: int) -> Optional[Tuple[str, int]]:
+        """Locate the renamed file that still has the old inode, e.g. `.log.1`
+
+        Returns (rotated path, size) or None when it is gone.
+        """
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        base_dir = shlex.quote(path.rsplit("/", 1)[0] or "/")
+        out, _ = await ssh_client.aexecute_command(f"find {base_dir} -maxdepth 1 -inum {int(inode)} -exec stat -c '%s %n' {{}} + 2>/dev/null | head -n 1", SSH_EXEC_TIMEOUT)
+        size_s, _, rotated = out.strip().partition(" ")
+        if rotated and size_s.isdigit():
+            return rotated, int(size_s)
+        return None
+
+    async def _recover_rotated(self, collector_id: str, node_name: str, ip: str, log_type: str, path: str,
+                               checkpoint: Optional[Tuple[int, int]], inode: int):
+        """If path was rotated since its checkpoint, finish reading the old file up to EOF first"""
+        if checkpoint is None or checkpoint[0] == inode:
+            return
+        old_inode, old_offset = checkpoint
+        rotated = await self._find_rotated(node_name, ip, path, old_inode)
+        if not rotated:
+            print(f"Rotated file of {path} (inode {old_inode}) not found on {node_name}, skipping to the new file")
+            return
+        rotated_path, rotated_size = rotated
+        if rotated_size <= old_offset:
+            return
+        reached = await self._drain_file(node_name, ip, log_type, path, old_inode, old_offset, rotated_size, read_path=rotated_path, final=True)
+        recovered = reached - old_offset
+        if recovered > 0:
+            self.rotation_recovered_bytes[collector_id] = self.rotation_recovered_bytes.get(collector_id, 0) + recovered
+            print(f"Recovered {recovered} bytes from rotated file {rotated_path} on {node_name}")
+
+    async def _collect_logs(self, node_name: str, log_type: str, ip: str):
+        """Internal task to collect logs continuously"""
         print(f"Starting log collection for {node_name}_{log_type}")
         
         collector_id = f"{node_name}_{log_type}"
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        self._loops[collector_id] = loop
-        engine = create_async_engine(
-            DATABASE_URL,
-            echo=False,
-            pool_pre_ping=True,
-            connect_args={"server_settings": {"timezone": APP_TIMEZONE}},
-            pool_size=1,
-            max_overflow=0,
-        )
-        self._engines[collector_id] = engine
-        self._session_locals[collector_id] = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
-        last_remote_size = 0
         retry_count = 0
         max_retries = 3
         
-        while collector_id in self.collectors:
+        while True:
             try:
                 # Wait for next collection interval
                 interval = self._intervals.get(collector_id, self.collection_interval)
-                time.sleep(interval)
+                await asyncio.sleep(interval)
                 
                 # Resolve target file once and reuse
                 target = self._targets.get(collector_id)
                 if not target:
                     try:
-                        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
-                        dirs = [
-                            "/opt/module/hadoop-3.1.3/logs",
-                            "/usr/local/hadoop/logs",
-                            "/usr/local/hadoop-3.3.6/logs",
-                            "/usr/local/hadoop-3.3.5/logs",
-                            "/usr/local/hadoop-3.1.3/logs",
-                            "/opt/hadoop/logs",
-                            "/var/log/hadoop",
-                        ]
-                        for d in dirs:
-                            out, err = ssh_client.execute_command(f"ls -1 {d} 2>/dev/null")
-                            if not err and out.strip():
-                                for fn in out.splitlines():
-                                    f = fn.lower()
-                                    if log_type in f and node_name in f:
-                                        target = f"{d}/{fn}"
-                                        break
-                            if target:
-                                break
+                        target = await self._resolve_target(node_name, log_type, ip)
                         if target:
                             self._targets[collector_id] = target
                     except Exception:
@@ -234,91 +394,253 @@ class LogCollector:
                     print(f"Log file {node_name}_{log_type} not found, will retry")
                     retry_count += 1
                     continue
-                
-                ssh_client = ssh_manager.get_connection(node_name, ip=ip)
 
-                size_out, size_err = ssh_client.execute_command(f"stat -c %s {target} 2>/dev/null")
-                if size_err:
-                    retry_count += 1
-                    continue
-                try:
-                    remote_size = int((size_out or "").strip())
-                except Exception:
+                stats = await self._stat_files(node_name, ip, [target])
+                if target not in stats:
                     retry_count += 1
                     continue
+                remote_size, inode = stats[target]
 
-                if remote_size < last_remote_size:
-                    last_remote_size = 0
-
-                if remote_size > last_remote_size:
-                    delta = remote_size - last_remote_size
-                    if delta > self.max_bytes_per_pull:
-                        start_pos = remote_size - self.max_bytes_per_pull + 1
-                        last_remote_size = remote_size - self.max_bytes_per_pull
-                    else:
-                        start_pos = last_remote_size + 1
-
-                    out2, err2 = ssh_client.execute_command(f"tail -c +{start_pos} {target} 2>/dev/null")
-                    if err2:
-                        out2, err2 = ssh_client.execute_command(f"dd if={target} bs=1 skip={max(0, start_pos - 1)} 2>/dev/null")
-                    if not err2 and out2 and out2.strip():
-                        self._save_log_chunk(node_name, log_type, out2)
-                        print(f"Collected new logs from {node_name}_{log_type} bytes={len(out2)}")
-
-                    last_remote_size = remote_size
+                checkpoint = await self._load_checkpoint(node_name, target)
+                await self._recover_rotated(collector_id, node_name, ip, log_type, target, checkpoint, inode)
+                start = self._resume_offset(remote_size, inode, checkpoint)
+                reached = await self._drain_file(node_name, ip, log_type, target, inode, start, remote_size)
+                if reached > start:
+                    print(f"Collected new logs from {node_name}_{log_type} bytes={reached - start}")
 
                 # Reset retry count on successful collection
                 retry_count = 0
                 
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 print(f"Error collecting logs from {node_name}_{log_type}: {e}")
                 retry_count += 1
                 
                 if retry_count > max_retries:
                     print(f"Max retries reached for {node_name}_{log_type}, stopping collection")
-                    self.stop_collection(node_name, log_type)
+                    self.collectors.pop(collector_id, None)
+                    self._intervals.pop(collector_id, None)
+                    self._modes.pop(collector_id, None)
                     break
                 
                 print(f"Retrying in {self.collection_interval * 2} seconds... ({retry_count}/{max_retries})")
-        
-        try:
-            loop = self._loops.pop(collector_id, None)
-            engine = self._engines.pop(collector_id, None)
-            self._session_locals.pop(collector_id, None)
-            if engine and loop:
-                loop.run_until_complete(engine.dispose())
-            if loop and loop.is_running():
-                loop.stop()
-            if loop:
-                loop.close()
-        except Exception:
-            pass
+
+    async def _discover_host_targets(self, node_name: str, ip: str) -> Dict[str, str]:
+        """Map every daemon log in the node's log dir to its service"""
+        base_dir = await log_reader.afind_working_log_dir(node_name, ip)
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        out, err = await ssh_client.aexecute_command(f"ls -1 {base_dir} 2>/dev/null", SSH_EXEC_TIMEOUT)
+        targets: Dict[str, str] = {}
+        if err or not out.strip():
+            return targets
+        for fn in out.splitlines():
+            fn = fn.strip()
+            if not fn.lower().endswith(".log") or node_name not in fn.lower():
+                continue
+            service = log_reader.service_from_filename(fn)
+            if service:
+                targets[f"{base_dir}/{fn}"] = service
+        return targets
+
+    async def _follow_logs(self, collector_id: str, node_name: str, ip: str, discover: Callable[[], Awaitable[Dict[str, str]]]):
+        """Follow files over one long-lived framed `tail -f` channel
+
+        discover() returns {remote path: log_type}; it is re-run whenever the
+        channel has to be reopened, so new daemon logs get picked up too.
+        Each flush commits the file's offset with its rows, and reopening
+        resumes from those offsets. The files are re-stat'ed every collection
+        interval; a path with a new inode (rotated) or shorter than what was
+        read (truncated) makes the channel reopen, which first drains the
+        rotated file through _recover_rotated.
+        """
+        retry_count = 0
+        max_retries = 3
+
+        while True:
+            channel = None
+            try:
+                targets = await discover()
+                stats = await self._stat_files(node_name, ip, list(targets.keys())) if targets else {}
+                paths = [p for p in targets if p in stats]
+                if not paths:
+                    print(f"Log files for {collector_id} not found, will retry")
+                    await asyncio.sleep(self._intervals.get(collector_id, self.collection_interval))
+                    continue
+
+                inodes: Dict[str, int] = {}
+                offsets: Dict[str, int] = {}
+                for p in paths:
+                    size, inode = stats[p]
+                    inodes[p] = inode
+                    checkpoint = await self._load_checkpoint(node_name, p)
+                    await self._recover_rotated(collector_id, node_name, ip, targets[p], p, checkpoint, inode)
+                    offsets[p] = self._resume_offset(size, inode, checkpoint)
+
+                channel = await asyncio.to_thread(
+                    lambda: ssh_manager.get_connection(node_name, ip=ip).open_channel(build_follow_command([(p, offsets[p]) for p in paths]))
+                )
+                retry_count = 0
+                partial = b""
+                buffered: Dict[int, List[bytes]] = {}
+                buffered_size = 0
+                first_buffered_at = 0.0
+                checked_at = time.monotonic()
+                rotated = False
+
+                async def _flush():
+                    for idx, parts in buffered.items():
+                        p = paths[idx]
+                        content = b"".join(parts)
+                        checkpoint = {"node_host": node_name, "file_path": p, "inode": inodes[p], "offset": offsets[p] + len(content)}
+                        if not await self._save_log_chunk_async(node_name, targets[p], content.decode("utf-8", errors="replace"), checkpoint=checkpoint):
+                            raise RuntimeError(f"failed to save logs of {p}")
+                        offsets[p] += len(content)
+                    buffered.clear()
+
+                async def _changed() -> bool:
+                    # Frames come from the inodes in `inodes`, so a rename only needs a reopen. A file
+                    # truncated in place keeps its inode and its buffered bytes cannot be placed; drop them.
+                    current = await self._stat_files(node_name, ip, paths)
+                    changed = False
+                    for idx, p in enumerate(paths):
+                        size, inode = current.get(p, (-1, -1))
+                        if inode != inodes[p]:
+                            changed = True
+                        elif size < offsets[p] + sum(len(x) for x in buffered.get(idx, ())):
+                            buffered.pop(idx, None)
+                            changed = True
+                    return changed
+
+                stream = aiter_channel(channel, idle_timeout=self.stream_flush_interval)
+                try:
+                    async for out, err in stream:
+                        if err:
+                            # e.g. "file truncated"; only a hint to check early, attribution never depends on it
+                            checked_at = 0.0
+                        if out:
+                            frames, partial = split_follow_frames(partial + out)
+                            for idx, payload in frames:
+                                if 0 <= idx < len(paths):
+                                    if not buffered:
+                                        first_buffered_at = time.monotonic()
+                                    buffered.setdefault(idx, []).append(payload)
+                                    buffered_size += len(payload)
+                        if time.monotonic() - checked_at >= self._intervals.get(collector_id, self.collection_interval):
+                            checked_at = time.monotonic()
+                            if await _changed():
+                                rotated = True
+                                break
+                        if buffered and (buffered_size >= self.max_bytes_per_pull or time.monotonic() - first_buffered_at >= self.stream_flush_interval):
+                            await _flush()
+                            buffered_size = 0
+                finally:
+                    await stream.aclose()
+                if buffered:
+                    await _flush()
+                if rotated:
+                    print(f"Log file of {collector_id} rotated, reopening stream")
+                    channel.close()
+                    channel = None
+                    continue
+                print(f"Stream for {collector_id} closed, reconnecting")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error streaming logs for {collector_id}: {e}")
+                retry_count += 1
+                if retry_count > max_retries:
+                    print(f"Max retries reached for {collector_id}, stopping collection")
+                    self.collectors.pop(collector_id, None)
+                    self._intervals.pop(collector_id, None)
+                    self._modes.pop(collector_id, None)
+                    break
+            finally:
+                if channel is not None:
+                    channel.close()
+            await asyncio.sleep(self._intervals.get(collector_id, self.collection_interval))
+
+    async def _stream_logs(self, node_name: str, log_type: str, ip: str):
+        """Internal task that follows one log file over a persistent `tail -f` channel"""
+        print(f"Starting log streaming for {node_name}_{log_type}")
+        collector_id = f"{node_name}_{log_type}"
+
+        async def _discover() -> Dict[str, str]:
+            target = self._targets.get(collector_id)
+            if not target:
+                target = await self._resolve_target(node_name, log_type, ip)
+                if target:
+                    self._targets[collector_id] = target
+            return {target: log_type} if target else {}
+
+        await self._follow_logs(collector_id, node_name, ip, _discover)
+
+    def start_host_shipper(self, node_name: str, ip: str, interval: Optional[int] = None) -> bool:
+        """Ship every daemon log on a node over a single SSH channel
+
+        Replaces one collector per log type with one task per host; its id is
+        `{node_name}_shipper`.
+        """
+        collector_id = f"{node_name}_{SHIPPER_LOG_TYPE}"
+        if interval is not None:
+            self._intervals[collector_id] = max(1, int(interval))
+        if collector_id in self.collectors and not self.collectors[collector_id].done():
+            print(f"Collector {collector_id} is already running")
+            return False
+        self._modes[collector_id] = "ship"
+        self.collectors[collector_id] = self._runtime.submit(
+            self._follow_logs(collector_id, node_name, ip, lambda: self._discover_host_targets(node_name, ip))
+        )
+        self.is_running = True
+        self._ensure_maintenance()
+        print(f"Started collector {collector_id}")
+        return True
+
+    def _ensure_maintenance(self):
+        """Run hadoop_logs partition maintenance on the collector loop while collectors exist"""
+        if self._maintenance is None or self._maintenance.done():
+            self._maintenance = self._runtime.submit(self._maintain_partitions())
+
+    async def _maintain_partitions(self):
+        while True:
+            try:
+                async with self._get_session_local()() as session:
+                    result = await maintain_log_partitions(session)
+                if result["created"] or result["expired"]:
+                    print(f"Log partitions created={result['created']} expired={result['expired']}")
+            except Exception as e:
+                print(f"Error maintaining log partitions: {e}")
+            await asyncio.sleep(LOG_PARTITION_MAINTENANCE_SECONDS)
+
+    def _build_log_batch(self, node_name: str, log_type: str, content: str) -> List[Dict]:
+        """Split a chunk of log content into parsed log events (stack traces folded)"""
+        return log_parser.parse_chunk(content, node_name, log_type)
+
+    async def _save_log_chunk_async(self, node_name: str, log_type: str, content: str, checkpoint: Optional[Dict] = None) -> bool:
+        """Save a chunk of log content to database (on the collector loop)"""
+        log_batch = self._build_log_batch(node_name, log_type, content)
+        if checkpoint:
+            return await self._save_logs_to_db_batch(log_batch, checkpoint=checkpoint)
+        if log_batch:
+            return await self._save_logs_to_db_batch(log_batch)
+        return True
     
+    async def asave_log_chunk(self, node_name: str, log_type: str, content: str) -> bool:
+        """Save a chunk of log content from any event loop, without blocking it"""
+        return await asyncio.wrap_future(self._runtime.submit(self._save_log_chunk_async(node_name, log_type, content)))
+
     def _save_log_chunk(self, node_name: str, log_type: str, content: str):
-        """Save a chunk of log content to database"""
-        # Split content into lines
-        lines = content.splitlines()
-        
-        # Parse each line and save to database
-        log_batch: List[Dict] = []
-        for line in lines:
-            if line.strip():
-                log_data = self._parse_log_line(line, node_name, log_type)
-                log_batch.append(log_data)
+        """Save a chunk of log content to database (blocking, callable from any thread)"""
+        log_batch = self._build_log_batch(node_name, log_type, content)
         if not log_batch:
             return
-        collector_id = f"{node_name}_{log_type}"
-        loop = self._loops.get(collector_id)
-        if loop:
-            loop.run_until_complete(self._save_logs_to_db_batch(log_batch, collector_id=collector_id))
-        else:
-            asyncio.run(self._save_logs_to_db_batch(log_batch))
+        self._runtime.run(self._save_logs_to_db_batch(log_batch))
     
     def get_collectors_status(self) -> Dict[str, bool]:
         """Get the status of all collectors"""
         status = {}
-        for collector_id, thread in self.collectors.items():
-            status[collector_id] = thread.is_alive()
+        for collector_id, task in self.collectors.items():
+            status[collector_id] = not task.done()
         return status
     
     def set_collection_interval(self, interval: int):
@@ -0,0 +1,263 @@
+import time
+import asyncio
+import datetime
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .models.hadoop_logs import HadoopLog
+from .models.hadoop_log_checkpoints import HadoopLogCheckpoint
+from .models.hadoop_log_templates import HadoopLogTemplate
+from .config import BJ_TZ
+
+# Column order used for both the COPY records and the ORM fallback
+HADOOP_LOG_COLUMNS: Tuple[str, ...] = (
+    "cluster_name", "node_host", "title", "info", "log_time", "level", "service", "logger", "fingerprint",
+    "template_id", "params",
+)
+
+
+def to_log_record(log_data: Dict, cluster_name: str) -> tuple:
+    """Turn one parsed log dict into a row tuple in HADOOP_LOG_COLUMNS order"""
+    return (
+        cluster_name,
+        log_data["host"],
+        log_data["service"],
+        log_data["message"],
+        log_data["timestamp"],
+        log_data.get("log_level"),
+        log_data["service"],
+        (log_data.get("logger") or None) and log_data["logger"][:255],
+        log_data.get("fingerprint"),
+        log_data.get("template_id"),
+        log_data.get("params"),
+    )
+
+
+async def copy_log_records(session: AsyncSession, records: Sequence[tuple]) -> int:
+    """Write rows with asyncpg binary COPY, bypassing the ORM.
+
+    Runs on the session's connection, so it is part of the session's
+    transaction. Raises TypeError when the session is not on asyncpg.
+    """
+    if not records:
+        return 0
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    driver_conn = raw.driver_connection
+    if not hasattr(driver_conn, "copy_records_to_table"):
+        raise TypeError("COPY ingestion requires the asyncpg driver")
+    await driver_conn.copy_records_to_table(HadoopLog.__tablename__, records=records, columns=list(HADOOP_LOG_COLUMNS))
+    return len(records)
+
+
+async def insert_log_records_orm(session: AsyncSession, records: Sequence[tuple]) -> int:
+    """Write rows through ORM objects (the original ingestion path)"""
+    session.add_all([HadoopLog(**dict(zip(HADOOP_LOG_COLUMNS, r))) for r in records])
+    await session.flush()
+    return len(records)
+
+
+async def write_log_records(session: AsyncSession, records: Sequence[tuple], mode: str = "copy") -> int:
+    """Write rows with the configured ingestion mode, falling back to the ORM if COPY is unavailable"""
+    if mode == "copy":
+        try:
+            return await copy_log_records(session, records)
+        except TypeError:
+            pass
+    return await insert_log_records_orm(session, records)
+
+
+async def upsert_checkpoint(session: AsyncSession, checkpoint: Dict):
+    """Store a file's committed offset; call inside the same transaction as its rows"""
+    stmt = pg_insert(HadoopLogCheckpoint).values(
+        node_host=checkpoint["node_host"],
+        file_path=checkpoint["file_path"],
+        inode=checkpoint["inode"],
+        byte_offset=checkpoint["offset"],
+        updated_at=datetime.datetime.now(BJ_TZ),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["node_host", "file_path", "inode"],
+        set_={"byte_offset": stmt.excluded.byte_offset, "updated_at": stmt.excluded.updated_at},
+    )
+    await session.execute(stmt)
+
+
+async def upsert_template_counts(session: AsyncSession, templates: Sequence[Dict]):
+    """Add per-template line counts (see app/log_templates.py) to hadoop_log_templates"""
+    if not templates:
+        return
+    stmt = pg_insert(HadoopLogTemplate).values([dict(t) for t in templates])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["cluster_name", "template_id"],
+        set_={
+            "template": stmt.excluded.template,
+            "count": HadoopLogTemplate.count + stmt.excluded.count,
+            "last_seen": func.greatest(HadoopLogTemplate.last_seen, stmt.excluded.last_seen),
+        },
+    )
+    await session.execute(stmt)
+
+
+def merge_template_counts(into: Dict[Tuple[str, str], Dict], templates: Sequence[Dict]):
+    for t in templates:
+        key = (t["cluster_name"], t["template_id"])
+        cur = into.get(key)
+        if cur is None:
+            into[key] = dict(t)
+        else:
+            cur["template"] = t["template"]
+            cur["count"] += t["count"]
+            cur["first_seen"] = min(cur["first_seen"], t["first_seen"])
+            cur["last_seen"] = max(cur["last_seen"], t["last_seen"])
+
+
+class _PendingChunk:
+    __slots__ = ("records", "checkpoint", "templates", "future")
+
+    def __init__(self, records: Sequence[tuple], checkpoint: Optional[Dict], templates: Sequence[Dict], future: asyncio.Future):
+        self.records = records
+        self.checkpoint = checkpoint
+        self.templates = templates
+        self.future = future
+
+
+class LogIngestBuffer:
+    """Process-wide write-behind buffer for hadoop_logs rows.
+
+    Collectors submit parsed rows (plus the checkpoint they advance) and a
+    single flusher commits everything queued in one transaction once
+    max_batch_rows rows are waiting or max_delay seconds have passed since
+    the first one. Submitters wait until their rows are committed, so a
+    checkpoint is only trusted once it is durable; when more than capacity
+    rows are queued, submit() blocks, which backpressures the collectors.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, session_factory: Callable[[], Any], prepare: Optional[Callable[[AsyncSession], Awaitable[None]]] = None,
+                 mode: str = "copy", max_batch_rows: int = 5000, max_delay: float = 0.2, capacity: int = 50000, max_retries: int = 2):
+        self.session_factory = session_factory
+        self.prepare = prepare
+        self.mode = mode
+        self.max_batch_rows = max(1, int(max_batch_rows))
+        self.max_delay = max(0.0, float(max_delay))
+        self.capacity = max(self.max_batch_rows, int(capacity))
+        self.max_retries = max(0, int(max_retries))
+        self._queue: Deque[_PendingChunk] = deque()
+        self._pending_rows = 0
+        self._space: Optional[asyncio.Condition] = None
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.rows_written = 0
+        self.dropped_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.backpressure_waits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def _ensure_flusher(self):
+        if self._space is None:
+            self._space = asyncio.Condition()
+            self._has_items = asyncio.Event()
+            self._batch_full = asyncio.Event()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, records: Sequence[tuple], checkpoint: Optional[Dict] = None, templates: Sequence[Dict] = ()) -> bool:
+        """Queue rows and wait until they are committed; returns False if they were dropped"""
+        self._ensure_flusher()
+        future = asyncio.get_running_loop().create_future()
+        async with self._space:
+            if self._pending_rows >= self.capacity:
+                self.backpressure_waits += 1
+                await self._space.wait_for(lambda: self._pending_rows < self.capacity)
+            self._queue.append(_PendingChunk(records, checkpoint, templates, future))
+            self._pending_rows += len(records)
+        self._has_items.set()
+        if self._pending_rows >= self.max_batch_rows:
+            self._batch_full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            if self._pending_rows < self.max_batch_rows:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch: List[_PendingChunk] = []
+            rows = 0
+            while self._queue and (not batch or rows + len(self._queue[0].records) <= self.max_batch_rows):
+                chunk = self._queue.popleft()
+                batch.append(chunk)
+                rows += len(chunk.records)
+            async with self._space:
+                self._pending_rows -= rows
+                self._space.notify_all()
+            if not self._queue:
+                self._has_items.clear()
+            if self._pending_rows < self.max_batch_rows:
+                self._batch_full.clear()
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[_PendingChunk]):
+        records = [r for chunk in batch for r in chunk.records]
+        checkpoints: Dict[Tuple[str, str, int], Dict] = {}
+        templates: Dict[Tuple[str, str], Dict] = {}
+        for chunk in batch:
+            merge_template_counts(templates, chunk.templates)
+            if chunk.checkpoint:
+                cp = chunk.checkpoint
+                checkpoints[(cp["node_host"], cp["file_path"], cp["inode"])] = cp
+        start = time.perf_counter()
+        ok = False
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session_factory() as session:
+                    if self.prepare:
+                        await self.prepare(session)
+                    await write_log_records(session, records, mode=self.mode)
+                    for cp in checkpoints.values():
+                        await upsert_checkpoint(session, cp)
+                    await upsert_template_counts(session, list(templates.values()))
+                    await session.commit()
+                ok = True
+                break
+            except Exception as e:
+                print(f"Error flushing {len(records)} buffered logs (attempt {attempt + 1}/{self.max_retries + 1}): {e}")
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.flushes += 1
+        self.last_flush_ms = round(elapsed_ms, 2)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self._total_flush_ms += elapsed_ms
+        if ok:
+            self.rows_written += len(records)
+        else:
+            self.failed_flushes += 1
+            self.dropped_rows += len(records)
+        for chunk in batch:
+            if not chunk.future.done():
+                chunk.future.set_result(ok)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth_rows": self._pending_rows,
+            "queue_depth_chunks": len(self._queue),
+            "capacity_rows": self.capacity,
+            "max_batch_rows": self.max_batch_rows,
+            "max_delay_ms": int(self.max_delay * 1000),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rows_written": self.rows_written,
+            "dropped_rows": self.dropped_rows,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
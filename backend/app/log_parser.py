@@ -0,0 +1,138 @@
+import re
+import hashlib
+import datetime
+from typing import Dict, List, Optional
+from .config import BJ_TZ
+
+# 2024-01-01 10:00:00,123 INFO org.apache.hadoop.hdfs.server.namenode.NameNode: msg
+# (also accepts an optional [thread] between level and logger)
+_LOG4J_RE = re.compile(
+    r"^(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2})(?:[,.](?P<ms>\d{1,3}))?\s+"
+    r"(?P<level>TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL)\s+"
+    r"(?:\[[^\]]*\]\s+)?(?:(?P<logger>[\w$.]+(?:\([^)]*\))?):\s?)?(?P<msg>.*)$"
+)
+# [2024-01-01 10:00:00,123] INFO org.apache...: msg
+_BRACKET_RE = re.compile(
+    r"^\[(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2})(?:[,.](?P<ms>\d{1,3}))?\]\s*"
+    r"(?:(?P<level>TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL)\s+)?"
+    r"(?:(?P<logger>[\w$.]+(?:\([^)]*\))?):\s?)?(?P<msg>.*)$"
+)
+# 24/01/01 10:00:00 INFO org.apache...: msg (yarn container / client layout)
+_SHORT_RE = re.compile(
+    r"^(?P<ts>\d{2}/\d{2}/\d{2} \d{2}:\d{2}:\d{2})(?:[,.](?P<ms>\d{1,3}))?\s+"
+    r"(?P<level>TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL)\s+"
+    r"(?:(?P<logger>[\w$.]+(?:\([^)]*\))?):\s?)?(?P<msg>.*)$"
+)
+_LEVEL_RE = re.compile(r" (ERROR|FATAL|WARN|INFO|DEBUG|TRACE) ")
+# Lines belonging to the previous event: indented frames, "at ...", "Caused by: ...",
+# "... 12 more", "Suppressed: ..." and a bare exception header such as
+# "java.io.IOException: Connection reset"
+_CONTINUATION_RE = re.compile(
+    r"^(?:\s|at\s|Caused by:|Suppressed:|\.\.\. \d+ more)"
+    r"|^[a-zA-Z_$][\w$]*(?:\.[\w$]+)+(?:Exception|Error|Throwable)\b"
+)
+
+_LEVEL_ALIASES = {"WARNING": "WARN"}
+# Variable parts (block ids, addresses, hex, numbers) masked before fingerprinting
+_VARIABLE_RE = re.compile(r"blk_-?\d+(?:_\d+)?|\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?|0x[0-9a-fA-F]+|[0-9a-fA-F]{8,}|\d+")
+
+
+def log_fingerprint(logger: Optional[str], body: str) -> str:
+    """Stable 16-hex-digit hash of logger + message with variable tokens masked"""
+    masked = _VARIABLE_RE.sub("#", body)
+    return hashlib.sha1(f"{logger or ''}|{masked}".encode("utf-8", "replace")).hexdigest()[:16]
+
+
+class Log4jParser:
+    """Precompiled parser for Hadoop log4j layouts.
+
+    Timestamps are parsed once per distinct second and cached, and stack
+    trace continuation lines are folded into the event they belong to.
+    """
+
+    def __init__(self, max_event_lines: int = 400, ts_cache_size: int = 4096):
+        self.max_event_lines = max_event_lines
+        self.ts_cache_size = ts_cache_size
+        self._ts_cache: Dict[str, datetime.datetime] = {}
+
+    def _parse_ts(self, ts: str, ms: Optional[str]) -> datetime.datetime:
+        base = self._ts_cache.get(ts)
+        if base is None:
+            if "/" in ts:
+                base = datetime.datetime.strptime(ts, "%y/%m/%d %H:%M:%S")
+            else:
+                base = datetime.datetime.strptime(ts.replace("T", " "), "%Y-%m-%d %H:%M:%S")
+            base = base.replace(tzinfo=BJ_TZ)
+            if len(self._ts_cache) >= self.ts_cache_size:
+                self._ts_cache.clear()
+            self._ts_cache[ts] = base
+        if ms:
+            return base.replace(microsecond=int(ms.ljust(3, "0")) * 1000)
+        return base
+
+    def parse_line(self, line: str, node_name: str, log_type: str) -> Dict:
+        """Parse a single log line and return a dictionary of log fields"""
+        m = None
+        first = line[:1]
+        if first == "[":
+            m = _BRACKET_RE.match(line)
+        elif first.isdigit():
+            m = _LOG4J_RE.match(line) or _SHORT_RE.match(line)
+        timestamp = None
+        level = None
+        logger = None
+        body = line
+        if m:
+            try:
+                timestamp = self._parse_ts(m.group("ts"), m.group("ms"))
+            except ValueError:
+                timestamp = None
+            level = m.group("level")
+            logger = m.group("logger")
+            body = m.group("msg")
+        if not level:
+            lm = _LEVEL_RE.search(line)
+            level = lm.group(1) if lm else "INFO"
+        return {
+            "timestamp": timestamp or datetime.datetime.now(BJ_TZ),
+            "log_level": _LEVEL_ALIASES.get(level, level),
+            "logger": logger,
+            "body": body,
+            "fingerprint": log_fingerprint(logger, body),
+            "message": line,
+            "host": node_name,
+            "service": log_type,
+            "raw_log": line,
+        }
+
+    @staticmethod
+    def is_continuation(line: str) -> bool:
+        return _CONTINUATION_RE.match(line) is not None
+
+    def parse_chunk(self, content: str, node_name: str, log_type: str) -> List[Dict]:
+        """Parse a chunk of log text into events, folding stack traces into their header line"""
+        events: List[Dict] = []
+        current: Optional[Dict] = None
+        extra: List[str] = []
+
+        def _close():
+            if current is not None and extra:
+                text = current["message"] + "\n" + "\n".join(extra)
+                current["message"] = text
+                current["raw_log"] = text
+
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            if current is not None and len(extra) + 1 < self.max_event_lines and _CONTINUATION_RE.match(line):
+                extra.append(line)
+                continue
+            _close()
+            extra = []
+            current = self.parse_line(line, node_name, log_type)
+            events.append(current)
+        _close()
+        return events
+
+
+log_parser = Log4jParser()
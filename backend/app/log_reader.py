@@ -1,6 +1,31 @@
-from typing import List, Dict, Optional
-from .config import LOG_DIR
+import asyncio
+from typing import AsyncIterator, List, Dict, Optional
+from .config import (
+    LOG_DIR, LOG_READ_DEFAULT_BYTES, LOG_READ_MAX_BYTES, SSH_EXEC_TIMEOUT, SSH_FANOUT_CONCURRENCY, SSH_FANOUT_NODE_TIMEOUT,
+)
 from .ssh_utils import ssh_manager
+from .services.fanout import FanOutResult, fan_out
+from .services.log_ranges import decode_token, read_log_range, read_log_token
+
+_LOG_SUFFIXES = (".log", ".out", ".out.1")
+
+
+def _match_log_listing(listing: str, node_name: str, log_type: str) -> List[str]:
+    """File names in `ls -la` output that look like node_name's log_type log"""
+    names = []
+    for line in listing.splitlines():
+        parts = line.split()
+        if parts:
+            fn = parts[-1]
+            lf = fn.lower()
+            if log_type in lf and node_name in lf and lf.endswith(_LOG_SUFFIXES):
+                names.append(fn)
+    return names
+
+
+def _log_file_names(listing: str) -> List[str]:
+    """Log file names in `ls -1` output"""
+    return [line.strip() for line in listing.splitlines() if line.strip().endswith(_LOG_SUFFIXES)]
 
 class LogReader:
     """Log Reader for Hadoop cluster nodes"""
@@ -35,54 +60,97 @@ class LogReader:
         return f"{self.log_dir}/{base_name}-{node_name.replace('_', '')}.log"
     
     def read_log(self, node_name: str, log_type: str, ip: str) -> str:
-        """Read log from a specific node"""
-        # Ensure working log dir
-        self.find_working_log_dir(node_name, ip)
-        paths = self.get_log_file_paths(node_name, log_type)
-        
-        # Get SSH connection
+        """Read log from a specific node
+
+        Blocking wrapper of aread_log(): only the last LOG_READ_MAX_BYTES of
+        the file are returned; call it from a thread or a script.
+        """
+        return asyncio.run(self.aread_log(node_name, log_type, ip))
+
+    async def aresolve_log_path(self, node_name: str, log_type: str, ip: str, file: Optional[str] = None,
+                                timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> str:
+        """Remote path of node_name's log_type log, or of file in its log dir; FileNotFoundError if there is none"""
+        await self.afind_working_log_dir(node_name, ip, timeout)
+        base_dir = self._node_log_dir.get(node_name, self.log_dir)
+        if file:
+            if "/" in file or file in (".", ".."):
+                raise FileNotFoundError(file)
+            return f"{base_dir}/{file}"
         ssh_client = ssh_manager.get_connection(node_name, ip=ip)
-        
-        # Read log file content
-        # try direct candidates
-        for p in paths:
-            out, err = ssh_client.execute_command(f"ls -la {p} 2>/dev/null")
+        for p in self.get_log_file_paths(node_name, log_type):
+            out, err = await ssh_client.aexecute_command(f"ls -la {p} 2>/dev/null", timeout)
             if not err and out.strip():
-                out, err = ssh_client.execute_command(f"cat {p} 2>/dev/null")
-                if not err:
-                    return out
-        # resolve by directory listing
-        base_dir = self._node_log_dir.get(node_name, self.log_dir)
-        out, err = ssh_client.execute_command(f"ls -la {base_dir} 2>/dev/null")
-        if not err and out.strip():
-            for line in out.splitlines():
-                parts = line.split()
-                if parts:
-                    fn = parts[-1]
-                    lf = fn.lower()
-                    if log_type in lf and node_name in lf and (lf.endswith(".log") or lf.endswith(".out") or lf.endswith(".out.1")):
-                        out2, err2 = ssh_client.execute_command(f"cat {base_dir}/{fn} 2>/dev/null")
-                        if not err2:
-                            return out2
+                return p
+        out, err = await ssh_client.aexecute_command(f"ls -la {base_dir} 2>/dev/null", timeout)
+        names = _match_log_listing(out, node_name, log_type) if not err else []
+        if names:
+            return f"{base_dir}/{names[0]}"
         raise FileNotFoundError("No such file")
+
+    def _log_path_allowed(self, node_name: str, path: str) -> bool:
+        """Continuation tokens carry a path; only files directly in a known log dir may be read through them"""
+        base_dir, _, name = path.rpartition("/")
+        return bool(name) and name not in (".", "..") and base_dir in [self._node_log_dir.get(node_name, self.log_dir), self.log_dir] + self._candidates
+
+    async def aread_log(self, node_name: str, log_type: str, ip: str, timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> str:
+        """read_log() for the event loop: the last LOG_READ_MAX_BYTES of the log, in whole lines
+
+        Earlier parts are reachable page by page through aread_log_range().
+        """
+        path = await self.aresolve_log_path(node_name, log_type, ip, timeout=timeout)
+        page = await read_log_range(ssh_manager.get_connection(node_name, ip=ip), path, tail=True, length=LOG_READ_MAX_BYTES, timeout=timeout)
+        return page["content"]
+
+    async def aread_log_range(self, node_name: str, log_type: str, ip: str, token: Optional[str] = None, file: Optional[str] = None,
+                              length: int = LOG_READ_DEFAULT_BYTES, max_lines: int = 0, timeout: Optional[float] = SSH_EXEC_TIMEOUT,
+                              **where) -> Dict:
+        """One bounded page of a node's log (see services/log_ranges.read_log_range for where/filters and the result)
+
+        With token, the read continues where that page left off and the
+        other arguments except length/max_lines are taken from it.
+        """
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        if token:
+            path = decode_token(token)["p"]
+            if not self._log_path_allowed(node_name, path):
+                await self.afind_working_log_dir(node_name, ip, timeout)
+                if not self._log_path_allowed(node_name, path):
+                    raise ValueError("invalid token: path outside the log directory")
+            return await read_log_token(ssh_client, token, length, max_lines, timeout)
+        path = await self.aresolve_log_path(node_name, log_type, ip, file, timeout)
+        return await read_log_range(ssh_client, path, length=length, max_lines=max_lines, timeout=timeout, **where)
     
     def read_all_nodes_log(self, nodes: List[Dict[str, str]], log_type: str) -> Dict[str, str]:
-        """Read log from all nodes"""
+        """Read log from all nodes
+
+        Blocking: runs aread_all_nodes_log() on a private event loop, so call
+        it from a thread or a script, never from a coroutine.
+        """
+        return asyncio.run(self.aread_all_nodes_log(nodes, log_type))
+
+    async def aiter_all_nodes_log(self, nodes: List[Dict[str, str]], log_type: str, limit: int = SSH_FANOUT_CONCURRENCY,
+                                  node_timeout: Optional[float] = SSH_FANOUT_NODE_TIMEOUT) -> AsyncIterator[FanOutResult]:
+        """Read log_type from every node concurrently, yielding each node's result as soon as it is done"""
+        async def _read(node: Dict[str, str]) -> str:
+            if not node.get('ip'):
+                raise ValueError("IP address not found")
+            return await self.aread_log(node['name'], log_type, node['ip'])
+
+        async for res in fan_out(nodes, _read, limit, node_timeout):
+            yield res
+
+    async def aread_all_nodes_log(self, nodes: List[Dict[str, str]], log_type: str, limit: int = SSH_FANOUT_CONCURRENCY,
+                                  node_timeout: Optional[float] = SSH_FANOUT_NODE_TIMEOUT) -> Dict[str, str]:
+        """Read log from all nodes, limit at a time; a node that fails or misses node_timeout gets an error string"""
         logs = {}
-        
-        for node in nodes:
-            node_name = node['name']
-            ip = node.get('ip')
-            if not ip:
-                logs[node_name] = "Error: IP address not found"
-                continue
-                
-            try:
-                logs[node_name] = self.read_log(node_name, log_type, ip)
-            except Exception as e:
-                logs[node_name] = f"Error reading log: {str(e)}"
-        
-        return logs
+        async for res in self.aiter_all_nodes_log(nodes, log_type, limit, node_timeout):
+            if res.ok:
+                logs[res.item['name']] = res.value
+            elif not res.item.get('ip'):
+                logs[res.item['name']] = "Error: IP address not found"
+            else:
+                logs[res.item['name']] = f"Error reading log: {res.error}"
+        return {node['name']: logs[node['name']] for node in nodes}
     
     def filter_log_by_date(self, log_content: str, start_date: str, end_date: str) -> str:
         """Filter log content by date range"""
@@ -112,17 +180,21 @@ class LogReader:
                 stdout = out
                 self._node_log_dir[node_name] = d
                 break
-        stderr = ""
         
         # Parse log files from output
-        log_files = []
-        if not stderr and stdout.strip():
-            for line in stdout.splitlines():
-                name = line.strip()
-                if name.endswith(".log") or name.endswith(".out") or name.endswith(".out.1"):
-                    log_files.append(name)
-        
-        return log_files
+        return _log_file_names(stdout)
+
+    async def aget_log_files_list(self, node_name: str, ip: Optional[str] = None, timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> List[str]:
+        """get_log_files_list() for the event loop"""
+        if ip:
+            await self.afind_working_log_dir(node_name, ip, timeout)
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        for d in [self._node_log_dir.get(node_name, self.log_dir)] + self._candidates:
+            out, err = await ssh_client.aexecute_command(f"ls -1 {d} 2>/dev/null", timeout)
+            if not err and out.strip():
+                self._node_log_dir[node_name] = d
+                return _log_file_names(out)
+        return []
     
     def check_log_file_exists(self, node_name: str, log_type: str, ip: Optional[str] = None) -> bool:
         """Check if log file exists on a specific node"""
@@ -143,12 +215,7 @@ class LogReader:
             base_dir = self._node_log_dir.get(node_name, self.log_dir)
             stdout, stderr = ssh_client.execute_command(f"ls -la {base_dir} 2>/dev/null")
             if not stderr and stdout.strip():
-                for line in stdout.splitlines():
-                    parts = line.split()
-                    if parts:
-                        fn = parts[-1].lower()
-                        if log_type in fn and node_name in fn and (fn.endswith(".log") or fn.endswith(".out") or fn.endswith(".out.1")):
-                            return True
+                return bool(_match_log_listing(stdout, node_name, log_type))
             return False
         except Exception as e:
             print(f"Error checking log file existence: {e}")
@@ -176,6 +243,15 @@ class LogReader:
         # Remove duplicates
         return list(set(services))
 
+    @staticmethod
+    def service_from_filename(file_name: str) -> Optional[str]:
+        """Map a Hadoop log file name to its daemon type, or None"""
+        f = file_name.lower()
+        for service in ("secondarynamenode", "namenode", "datanode", "resourcemanager", "nodemanager", "historyserver"):
+            if service in f:
+                return service
+        return None
+
     def find_working_log_dir(self, node_name: str, ip: str) -> str:
         """Detect a working log directory on remote node and set it"""
         ssh_client = ssh_manager.get_connection(node_name, ip=ip)
@@ -193,6 +269,18 @@ class LogReader:
         self._node_log_dir[node_name] = self.log_dir
         return self._node_log_dir[node_name]
 
+    async def afind_working_log_dir(self, node_name: str, ip: str, timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> str:
+        """find_working_log_dir() for the event loop"""
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        current = self._node_log_dir.get(node_name, self.log_dir)
+        for d in [current] + [c for c in self._candidates if c != current]:
+            stdout, stderr = await ssh_client.aexecute_command(f"ls -la {d} 2>/dev/null", timeout)
+            if not stderr and stdout.strip():
+                self._node_log_dir[node_name] = d
+                return d
+        self._node_log_dir[node_name] = self.log_dir
+        return self._node_log_dir[node_name]
+
     def get_log_file_paths(self, node_name: str, log_type: str) -> List[str]:
         base_dir = self._node_log_dir.get(node_name, self.log_dir)
         base = f"{base_dir}/hadoop-hadoop-{log_type}-{node_name}"
@@ -0,0 +1,143 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+WILDCARD = "<*>"
+
+
+class LogTemplate:
+    __slots__ = ("template_id", "tokens", "size")
+
+    def __init__(self, template_id: str, tokens: List[str]):
+        self.template_id = template_id
+        self.tokens = tokens
+        self.size = 0
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens)
+
+
+def _is_variable(token: str) -> bool:
+    # numbers, ids, addresses, block ids, ports, sizes... anything with a digit
+    return any(c.isdigit() for c in token)
+
+
+class DrainMiner:
+    """Online log template miner (Drain: He et al., ICWS 2017).
+
+    Messages are tokenized on whitespace and routed through a fixed-depth
+    tree keyed by token count and the first depth - 2 tokens; within a leaf
+    the most similar template is reused if at least sim_threshold of its
+    tokens match, and differing positions become <*>. Templates are kept in
+    LRU order and the least recently used ones are dropped past
+    max_templates.
+    """
+
+    def __init__(self, scope: str = "", depth: int = 4, sim_threshold: float = 0.4, max_children: int = 100, max_templates: int = 2000):
+        self.scope = scope
+        self.depth = max(3, depth)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self.templates: "OrderedDict[str, LogTemplate]" = OrderedDict()
+        self._root: Dict[int, dict] = {}
+
+    def _leaf(self, tokens: List[str]) -> List[str]:
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[: self.depth - 2]:
+            key = WILDCARD if _is_variable(token) else token
+            if key not in node:
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                node = node.setdefault(key, {})
+            else:
+                node = node[key]
+        return node.setdefault("", [])
+
+    @staticmethod
+    def _similarity(template: List[str], tokens: List[str]) -> Tuple[float, int]:
+        same = 0
+        wild = 0
+        for t, s in zip(template, tokens):
+            if t == WILDCARD:
+                wild += 1
+            elif t == s:
+                same += 1
+        return same / len(tokens), wild
+
+    def add(self, message: str) -> Tuple[LogTemplate, List[str]]:
+        """Assign message to a template, creating or generalizing one; returns (template, parameters)"""
+        raw = message.split()
+        tokens = [WILDCARD if _is_variable(t) else t for t in raw]
+        if not tokens:
+            tokens = raw = [""]
+        leaf = self._leaf(tokens)
+        best: Optional[LogTemplate] = None
+        best_key = (-1.0, -1)
+        for tid in list(leaf):
+            tpl = self.templates.get(tid)
+            if tpl is None:
+                leaf.remove(tid)  # evicted
+                continue
+            key = self._similarity(tpl.tokens, tokens)
+            if key > best_key:
+                best, best_key = tpl, key
+        if best is not None and best_key[0] >= self.sim_threshold:
+            best.tokens = [t if t == s else WILDCARD for t, s in zip(best.tokens, tokens)]
+            self.templates.move_to_end(best.template_id)
+        else:
+            tid = hashlib.sha1(f"{self.scope}|{' '.join(tokens)}".encode("utf-8", "replace")).hexdigest()[:16]
+            best = self.templates.get(tid)
+            if best is None:
+                best = LogTemplate(tid, tokens)
+                self.templates[tid] = best
+                leaf.append(tid)
+                while len(self.templates) > self.max_templates:
+                    self.templates.popitem(last=False)
+            else:
+                self.templates.move_to_end(tid)
+        best.size += 1
+        params = [r for t, r in zip(best.tokens, raw) if t == WILDCARD]
+        return best, params
+
+
+class TemplateMiners:
+    """One DrainMiner per (cluster, service), plus per-batch template counts"""
+
+    def __init__(self, **miner_kwargs):
+        self.miner_kwargs = miner_kwargs
+        self.miners: Dict[Tuple[str, str], DrainMiner] = {}
+
+    def get(self, cluster_name: str, service: str) -> DrainMiner:
+        key = (cluster_name, service)
+        miner = self.miners.get(key)
+        if miner is None:
+            miner = DrainMiner(scope=f"{cluster_name}|{service}", **self.miner_kwargs)
+            self.miners[key] = miner
+        return miner
+
+    def annotate(self, cluster_name: str, logs: List[Dict]) -> Dict[Tuple[str, str], Dict]:
+        """Set template_id/params on each parsed log and return count deltas per (cluster, template)"""
+        counts: Dict[Tuple[str, str], Dict] = {}
+        for log in logs:
+            tpl, params = self.get(cluster_name, log["service"]).add(log.get("body") or log["message"])
+            log["template_id"] = tpl.template_id
+            log["params"] = params
+            entry = counts.get((cluster_name, tpl.template_id))
+            if entry is None:
+                counts[(cluster_name, tpl.template_id)] = {
+                    "cluster_name": cluster_name,
+                    "template_id": tpl.template_id,
+                    "service": log["service"],
+                    "template": tpl.text,
+                    "count": 1,
+                    "first_seen": log["timestamp"],
+                    "last_seen": log["timestamp"],
+                }
+            else:
+                entry["template"] = tpl.text
+                entry["count"] += 1
+                entry["first_seen"] = min(entry["first_seen"], log["timestamp"])
+                entry["last_seen"] = max(entry["last_seen"], log["timestamp"])
+        return counts
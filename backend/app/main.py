@@ -3,10 +3,24 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, health, secure, users, clusters, nodes, metrics, faults, ops, ai, hadoop_logs, sys_exec_logs, hadoop_exec_logs
+from .db import SessionLocal
+from .services.log_schema import ensure_log_schema
 import os
 
 app = FastAPI(title="Hadoop Fault Detecting API", version="v1")
 
+@app.on_event("startup")
+async def prepare_log_schema():
+    """
+    启动时补齐日志相关表和列（仅元数据级 DDL），请求处理中不再执行 DDL；
+    hadoop_logs 的索引由 app.scripts.backfill_log_columns 以 CONCURRENTLY 方式创建
+    """
+    try:
+        async with SessionLocal() as session:
+            await ensure_log_schema(session)
+    except Exception as e:
+        print(f"Error preparing log schema: {e}")
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """
@@ -1,33 +1,61 @@
-import threading
 import time
 import datetime
-import time as _time
+from concurrent.futures import Future
 from typing import Dict, List, Optional, Tuple
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine
 from .ssh_utils import ssh_manager
 from .db import SessionLocal
 from .models.nodes import Node
 import asyncio
-from .config import BJ_TZ
+from .config import (
+    BJ_TZ, DATABASE_URL, APP_TIMEZONE, METRICS_ROLLUP_SECONDS, METRICS_PROBE_WORKERS, METRICS_PROBE_TIMEOUT_SECONDS,
+)
+from .services.background_loop import BackgroundLoop
+from .services.metrics_store import write_samples, rollup_metrics
+from .services.node_probe import node_prober
+
+NodeSpec = Tuple[int, str, str, int]  # (node id, hostname, ip, cluster id)
+
+
+def next_tick(now: float, interval: int) -> float:
+    """Next wall-clock multiple of interval, so every node is sampled on the same aligned instant"""
+    return (int(now // interval) + 1) * interval
+
 
 class MetricsCollector:
+    """Cluster-wide metrics sampler.
+
+    One scheduler task on a dedicated event loop wakes on wall-clock aligned
+    ticks, probes every registered node concurrently (at most
+    METRICS_PROBE_WORKERS SSH calls at a time) and writes the whole tick in
+    one transaction. A tick that overruns the interval makes the scheduler
+    skip the ticks it missed instead of piling them up.
+    """
+
     def __init__(self):
-        self.collectors: Dict[str, threading.Thread] = {}
+        self.collectors: Dict[str, NodeSpec] = {}  # hostname -> node being sampled
         self.collection_interval: int = 5
         self.last_errors: Dict[str, str] = {}
         self._columns_cache: Dict[str, set] = {}
         self._cluster_avg_inited: bool = False
+        self._runtime = BackgroundLoop("metrics-collector", max_workers=METRICS_PROBE_WORKERS)
+        self._engine: Optional[AsyncEngine] = None
+        self._scheduler: Optional[Future] = None
+        self._next_rollup: float = 0.0
+        self.last_rollup: Optional[Dict] = None
+        self.tick_stats: Dict[str, float] = {"ticks": 0, "missed_ticks": 0, "last_tick_ms": 0.0, "last_write_ms": 0.0, "last_nodes": 0}
 
     def set_collection_interval(self, interval: int):
         self.collection_interval = max(1, interval)
 
+    def is_scheduler_running(self) -> bool:
+        return self._scheduler is not None and not self._scheduler.done()
+
     def get_collectors_status(self) -> Dict[str, bool]:
-        status = {}
-        for cid, t in self.collectors.items():
-            status[cid] = t.is_alive()
-        return status
-    
+        running = self.is_scheduler_running()
+        return {hn: running for hn in self.collectors}
+
     def get_errors(self) -> Dict[str, str]:
         return dict(self.last_errors)
 
@@ -40,70 +68,150 @@ class MetricsCollector:
             del self.collectors[collector_id]
         if collector_id in self.last_errors:
             del self.last_errors[collector_id]
+        if not self.collectors and self._scheduler is not None:
+            self._scheduler.cancel()
+            self._scheduler = None
 
-    def start_for_nodes(self, nodes: List[Tuple[int, str, str, int]], interval: Optional[int] = None) -> Tuple[int, List[str]]:
+    def start_for_nodes(self, nodes: List[NodeSpec], interval: Optional[int] = None) -> Tuple[int, List[str]]:
         if interval:
             self.set_collection_interval(interval)
         started: List[str] = []
         for nid, hn, ip, cid in nodes:
-            cid_str = f"{hn}"
-            if cid_str in self.collectors and self.collectors[cid_str].is_alive():
+            if hn in self.collectors and self.is_scheduler_running():
                 continue
-            t = threading.Thread(target=self._collect_node_metrics, args=(nid, hn, ip, cid), name=f"metrics_{hn}", daemon=True)
-            self.collectors[cid_str] = t
-            t.start()
+            self.collectors[hn] = (nid, hn, ip, cid)
             started.append(hn)
+        if self.collectors and not self.is_scheduler_running():
+            self._scheduler = self._runtime.submit(self._run())
         return len(started), started
 
-    def _read_cpu_mem(self, node_name: str, ip: str) -> Tuple[float, float]:
+    def _get_engine(self) -> AsyncEngine:
+        """Engine for the scheduler loop only; asyncpg connections are bound to the loop that opened them"""
+        if self._engine is None:
+            self._engine = create_async_engine(
+                DATABASE_URL,
+                pool_pre_ping=True,
+                pool_size=2,
+                max_overflow=0,
+                connect_args={"server_settings": {"timezone": APP_TIMEZONE}},
+            )
+        return self._engine
+
+    def _probe(self, node_name: str, ip: str) -> Dict:
+        """One SSH exec per sample (see services/node_probe.py); CPU is a delta against the previous probe"""
         ssh_client = ssh_manager.get_connection(node_name, ip=ip)
-        out1, err1 = ssh_client.execute_command("cat /proc/stat | head -n 1")
-        _time.sleep(0.5)
-        out2, err2 = ssh_client.execute_command("cat /proc/stat | head -n 1")
-        cpu_pct = 0.0
-        if not err1 and not err2 and out1.strip() and out2.strip():
-            p1 = out1.strip().split()
-            p2 = out2.strip().split()
-            v1 = [int(x) for x in p1[1:]]
-            v2 = [int(x) for x in p2[1:]]
-            get1 = lambda i: (v1[i] if i < len(v1) else 0)
-            get2 = lambda i: (v2[i] if i < len(v2) else 0)
-            idle = (get2(3) + get2(4)) - (get1(3) + get1(4))
-            total = (get2(0) - get1(0)) + (get2(1) - get1(1)) + (get2(2) - get1(2)) + idle + (get2(5) - get1(5)) + (get2(6) - get1(6)) + (get2(7) - get1(7))
-            if total > 0:
-                cpu_pct = round((1.0 - idle / total) * 100.0, 2)
-        outm, errm = ssh_client.execute_command("cat /proc/meminfo")
-        mem_pct = 0.0
-        if not errm and outm.strip():
-            mt = 0
-            ma = 0
-            for line in outm.splitlines():
-                if line.startswith("MemTotal:"):
-                    mt = int(line.split()[1])
-                elif line.startswith("MemAvailable:"):
-                    ma = int(line.split()[1])
-            if mt > 0:
-                mem_pct = round((1.0 - (ma / mt)) * 100.0, 2)
-        return cpu_pct, mem_pct
+        return node_prober.sample(node_name, ssh_client.execute_command)
+
+    async def _aprobe(self, node_name: str, ip: str) -> Dict:
+        """_probe() over the awaitable SSH layer, so a tick holds no thread per node"""
+        ssh_client = ssh_manager.get_connection(node_name, ip=ip)
+        return await node_prober.asample(node_name, ssh_client.aexecute_command)
+
+    def _read_cpu_mem(self, node_name: str, ip: str) -> Tuple[float, float]:
+        m = self._probe(node_name, ip)
+        return m["cpu"] or 0.0, m["mem"] or 0.0
 
     async def _save_metrics(self, node_id: int, hostname: str, cluster_id: int, cpu: float, mem: float):
-        # 这里的 SessionLocal 绑定的 engine 可能在主线程 loop 中初始化
-        # 在 asyncio.run() 开启的新 loop 中使用它会报 Loop 冲突
-        from .db import engine
+        await self._save_samples([self._sample(node_id, hostname, cluster_id, cpu, mem)])
+
+    async def _save_samples(self, samples: List[Dict], engine=None):
+        """Write a batch of samples to node_metrics / nodes / cluster_metrics in one transaction"""
+        if engine is None:
+            from .db import engine
         async with AsyncSession(engine) as session:
-            now = datetime.datetime.now(BJ_TZ)
-            await session.execute(text("UPDATE nodes SET cpu_usage=:cpu, memory_usage=:mem, last_heartbeat=:hb WHERE id=:nid"), {"cpu": cpu, "mem": mem, "hb": now, "nid": node_id})
-            await session.commit()
+            await write_samples(session, samples)
+
+    @staticmethod
+    def _sample(node_id: int, hostname: str, cluster_id: int, cpu: Optional[float], mem: Optional[float], probe: Optional[Dict] = None, ts: Optional[datetime.datetime] = None) -> Dict:
+        sample = {"node_id": node_id, "hostname": hostname, "cluster_id": cluster_id, "cpu": cpu, "mem": mem, "ts": ts or datetime.datetime.now(BJ_TZ)}
+        if probe:
+            for key in ("disk", "load1", "net_rx_bps", "net_tx_bps"):
+                sample[key] = probe.get(key)
+        return sample
+
+    async def _probe_sample(self, node_id: int, hostname: str, ip: str, cluster_id: int, ts: Optional[datetime.datetime] = None) -> Dict:
+        m = await self._aprobe(hostname, ip)
+        return self._sample(node_id, hostname, cluster_id, m["cpu"], m["mem"], m, ts)
+
+    async def probe_nodes(self, nodes: List[NodeSpec], ts: Optional[datetime.datetime] = None, limit: int = METRICS_PROBE_WORKERS, timeout: float = METRICS_PROBE_TIMEOUT_SECONDS) -> Tuple[List[Dict], Dict[str, str]]:
+        """Probe nodes concurrently from the current event loop; returns (samples, errors by hostname).
+
+        At most limit probes run at a time and each is cancelled after
+        timeout seconds, which closes its SSH channel; nothing blocks the
+        loop, so this is safe to await from request handlers.
+        """
+        sem = asyncio.Semaphore(max(1, limit))
+        ts = ts or datetime.datetime.now(BJ_TZ)
 
-    def _collect_node_metrics(self, node_id: int, hostname: str, ip: str, cluster_id: int):
-        cid = hostname
-        while cid in self.collectors:
+        async def _one(spec: NodeSpec):
+            nid, hn, ip, cid = spec
+            async with sem:
+                return await asyncio.wait_for(self._probe_sample(nid, hn, ip, cid, ts), timeout)
+
+        results = await asyncio.gather(*(_one(spec) for spec in nodes), return_exceptions=True)
+        samples: List[Dict] = []
+        errors: Dict[str, str] = {}
+        for spec, res in zip(nodes, results):
+            if isinstance(res, BaseException):
+                errors[spec[1]] = "probe_timeout" if isinstance(res, asyncio.TimeoutError) else str(res)
+            else:
+                samples.append(res)
+        return samples, errors
+
+    async def _tick(self, tick_at: float):
+        nodes = list(self.collectors.values())
+        if not nodes:
+            return
+        started = time.perf_counter()
+        ts = datetime.datetime.fromtimestamp(tick_at, BJ_TZ)
+        samples, errors = await self.probe_nodes(nodes, ts)
+        for hn in [spec[1] for spec in nodes]:
+            if hn in errors:
+                self.last_errors[hn] = errors[hn]
+            else:
+                self.last_errors.pop(hn, None)
+        probed = time.perf_counter()
+        if samples:
             try:
-                cpu, mem = self._read_cpu_mem(hostname, ip)
-                asyncio.run(self._save_metrics(node_id, hostname, cluster_id, cpu, mem))
+                await self._save_samples(samples, self._get_engine())
+                self.last_errors.pop("flush", None)
             except Exception as e:
-                self.last_errors[cid] = str(e)
-            time.sleep(self.collection_interval)
+                self.last_errors["flush"] = str(e)
+                print(f"Error saving {len(samples)} metric samples: {e}")
+        done = time.perf_counter()
+        self.tick_stats["ticks"] += 1
+        self.tick_stats["last_nodes"] = len(nodes)
+        self.tick_stats["last_tick_ms"] = round((done - started) * 1000.0, 1)
+        self.tick_stats["last_write_ms"] = round((done - probed) * 1000.0, 1)
+
+    async def _rollup(self, engine) -> Dict:
+        async with AsyncSession(engine) as session:
+            return await rollup_metrics(session)
+
+    async def _maybe_rollup(self):
+        if time.monotonic() < self._next_rollup:
+            return
+        self._next_rollup = time.monotonic() + METRICS_ROLLUP_SECONDS
+        try:
+            self.last_rollup = await self._rollup(self._get_engine())
+            self.last_errors.pop("rollup", None)
+        except Exception as e:
+            self.last_errors["rollup"] = str(e)
+            print(f"Error rolling up metrics: {e}")
+
+    async def _run(self):
+        rollup: Optional[asyncio.Task] = None
+        while self.collectors:
+            interval = self.collection_interval
+            tick_at = next_tick(time.time(), interval)
+            await asyncio.sleep(max(0.0, tick_at - time.time()))
+            await self._tick(tick_at)
+            behind = int((time.time() - tick_at) // interval)
+            if behind > 0:
+                self.tick_stats["missed_ticks"] += behind
+            if rollup is None or rollup.done():
+                # off the tick path so a long first rollup does not delay sampling
+                rollup = asyncio.create_task(self._maybe_rollup())
 
     async def _get_table_columns(self, session: AsyncSession, table_name: str) -> set:
         if table_name in self._columns_cache:
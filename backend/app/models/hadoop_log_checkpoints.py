@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Text, BigInteger, TIMESTAMP
+from . import Base
+
+class HadoopLogCheckpoint(Base):
+    __tablename__ = "hadoop_log_checkpoints"
+
+    node_host: Mapped[str] = mapped_column(String(100), primary_key=True)
+    file_path: Mapped[str] = mapped_column(Text, primary_key=True)
+    inode: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    byte_offset: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[str] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "node_host": self.node_host,
+            "file_path": self.file_path,
+            "inode": self.inode,
+            "byte_offset": self.byte_offset,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -0,0 +1,25 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Text, BigInteger, TIMESTAMP
+from . import Base
+
+class HadoopLogTemplate(Base):
+    __tablename__ = "hadoop_log_templates"
+
+    cluster_name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    template_id: Mapped[str] = mapped_column(String(16), primary_key=True)
+    service: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    template: Mapped[str] = mapped_column(Text, nullable=False)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    first_seen: Mapped[str] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+    last_seen: Mapped[str] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "cluster_name": self.cluster_name,
+            "template_id": self.template_id,
+            "service": self.service,
+            "template": self.template,
+            "count": self.count,
+            "first_seen": self.first_seen.isoformat() if self.first_seen else None,
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+        }
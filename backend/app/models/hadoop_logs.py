@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import String, Integer, Text, TIMESTAMP
+from sqlalchemy.dialects.postgresql import ARRAY
 from . import Base
 
 class HadoopLog(Base):
@@ -11,6 +12,12 @@ class HadoopLog(Base):
     title: Mapped[str | None] = mapped_column(String(255), nullable=True)
     info: Mapped[str | None] = mapped_column(Text, nullable=True)
     log_time: Mapped[str] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+    level: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    service: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    logger: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    fingerprint: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    template_id: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    params: Mapped[list[str] | None] = mapped_column(ARRAY(Text), nullable=True)
 
     def to_dict(self) -> dict:
         return {
@@ -20,4 +27,10 @@ class HadoopLog(Base):
             "title": self.title,
             "info": self.info,
             "log_time": self.log_time.isoformat() if self.log_time else None,
+            "level": self.level,
+            "service": self.service,
+            "logger": self.logger,
+            "fingerprint": self.fingerprint,
+            "template_id": self.template_id,
+            "params": self.params,
         }
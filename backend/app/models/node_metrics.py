@@ -11,4 +11,8 @@ class NodeMetric(Base):
     hostname: Mapped[str] = mapped_column(String(100))
     cpu_usage: Mapped[float] = mapped_column(Float)
     memory_usage: Mapped[float] = mapped_column(Float)
+    disk_usage: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load1: Mapped[float | None] = mapped_column(Float, nullable=True)
+    net_rx_bps: Mapped[float | None] = mapped_column(Float, nullable=True)
+    net_tx_bps: Mapped[float | None] = mapped_column(Float, nullable=True)
     created_at: Mapped[str] = mapped_column(TIMESTAMP(timezone=True))
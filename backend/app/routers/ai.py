@@ -6,10 +6,14 @@ from pydantic import BaseModel, Field
 import os
 import json
 import uuid
+from datetime import datetime
 
 from ..db import get_db
+from ..config import BJ_TZ
 from ..deps.auth import get_current_user
 from ..models.hadoop_logs import HadoopLog
+from ..services.log_search import parse_search_query, search_condition, search_rank
+from ..services.log_template_stats import top_templates
 from ..models.chat import ChatSession, ChatMessage
 from ..agents.diagnosis_agent import run_diagnose_and_repair
 from ..services.llm import LLMClient
@@ -52,15 +56,29 @@ async def diagnose_repair(req: DiagnoseRepairReq, user=Depends(get_current_user)
         filters = []
         if req.node:
             filters.append(HadoopLog.node_host == req.node)
+        if req.timeFrom:
+            # 限定起始时间，分区表上只扫描相关日期的分区
+            try:
+                tf = datetime.fromisoformat(req.timeFrom.replace("Z", "+00:00"))
+                filters.append(HadoopLog.log_time >= (tf.replace(tzinfo=BJ_TZ) if tf.tzinfo is None else tf))
+            except ValueError:
+                pass
+        order = [HadoopLog.log_time.desc()]
         if req.keywords:
-            # 这里简化为 info 包含关键词
-            filters.append(HadoopLog.info.ilike(f"%{req.keywords}%"))
-        stmt = select(HadoopLog).limit(100).order_by(HadoopLog.log_time.desc())
-        for f in filters:
-            stmt = stmt.where(f)
+            # 关键词走全文索引，结果按相关度排序
+            parsed = parse_search_query(req.keywords)
+            cond = search_condition(parsed)
+            if cond is not None:
+                filters.append(cond)
+                rank = search_rank(parsed)
+                if rank is not None:
+                    order.insert(0, rank.desc())
+        stmt = select(HadoopLog).where(*filters).order_by(*order).limit(100)
         rows = (await db.execute(stmt)).scalars().all()
         ctx_logs = [r.to_dict() for r in rows[:50]]
-        context = {"cluster": req.cluster, "node": req.node, "logs": ctx_logs}
+        # 最近 10 分钟的高频日志模板，比原始日志更能概括现场
+        ctx_templates = await top_templates(db, node=req.node, minutes=10, limit=20)
+        context = {"cluster": req.cluster, "node": req.node, "logs": ctx_logs, "top_templates": ctx_templates}
         uname = _get_username(user)
         result = await run_diagnose_and_repair(db, uname, context, auto=req.auto, max_steps=req.maxSteps, model=req.model)
         return result
@@ -170,6 +188,7 @@ async def ai_chat(req: ChatReq, user=Depends(get_current_user), db: AsyncSession
                         args.get("components"),
                         args.get("node_hostname"),
                         int(args.get("lines", 200)),
+                        int(args.get("window_minutes", 180)),
                     )
                 elif name == "run_cluster_command":
                     tool_result = await tool_run_cluster_command(
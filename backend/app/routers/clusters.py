@@ -9,6 +9,7 @@ from ..services.ssh_probe import check_ssh_connectivity, get_hdfs_cluster_id
 from pydantic import BaseModel
 from datetime import datetime, timezone
 import uuid as uuidlib
+import asyncio
 from ..config import now_bj
 
 router = APIRouter()
@@ -103,7 +104,8 @@ async def create_cluster(
             raise HTTPException(status_code=400, detail={"errors": errors})
         
         # 1. 获取 HDFS 集群真实 UUID (从 NameNode 获取)
-        cluster_uuid, err = get_hdfs_cluster_id(str(req.namenode_ip), req.nodes[0].ssh_user, req.nodes[0].ssh_password)
+        # 一次性连接（注册时的账号可能尚未入库），放到线程中执行以免阻塞事件循环
+        cluster_uuid, err = await asyncio.to_thread(get_hdfs_cluster_id, str(req.namenode_ip), req.nodes[0].ssh_user, req.nodes[0].ssh_password)
         if not cluster_uuid:
             raise HTTPException(status_code=400, detail={"errors": [{"field": "namenode_ip", "message": f"无法获取集群ID: {err}"}]})
 
@@ -122,13 +124,14 @@ async def create_cluster(
             if name_exists.scalars().first():
                 raise HTTPException(status_code=400, detail={"errors": [{"field": "name", "message": "集群名称已存在"}]})
 
-            # SSH 连通性预检查
+            # SSH 连通性预检查（各节点并发）
             ssh_errors: list[dict] = []
-            for idx, n_req in enumerate(req.nodes):
-                ip = getattr(n_req, "ip_address", None) or getattr(n_req, "ip", None)
-                user_ = getattr(n_req, "ssh_user", None)
-                pwd_ = getattr(n_req, "ssh_password", None)
-                ok, conn_err = check_ssh_connectivity(str(ip), str(user_ or ""), str(pwd_ or ""))
+            node_ips = [getattr(n_req, "ip_address", None) or getattr(n_req, "ip", None) for n_req in req.nodes]
+            checks = await asyncio.gather(*(
+                asyncio.to_thread(check_ssh_connectivity, str(ip), str(getattr(n_req, "ssh_user", None) or ""), str(getattr(n_req, "ssh_password", None) or ""))
+                for n_req, ip in zip(req.nodes, node_ips)
+            ))
+            for idx, (n_req, ip, (ok, conn_err)) in enumerate(zip(req.nodes, node_ips, checks)):
                 if not ok:
                     ssh_errors.append({
                         "field": f"nodes[{idx}].ssh",
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, delete, update
+from sqlalchemy import select, delete, update
 from ..db import get_db
 from ..models.hadoop_logs import HadoopLog
 from ..models.clusters import Cluster
@@ -10,6 +10,8 @@ from datetime import datetime
 import json
 from ..config import now_bj
 from ..config import BJ_TZ
+from ..services.pagination import keyset_page, next_cursor, count_rows, COUNT_MODE_PATTERN
+from ..services.fault_detection import rule_catalog
 
 router = APIRouter()
 
@@ -58,17 +60,16 @@ async def list_faults(
     time_from: str | None = Query(None),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
+    cursor: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
 ):
     try:
-        stmt = select(HadoopLog).where(HadoopLog.title == "fault")
-        count_stmt = select(func.count(HadoopLog.log_id)).where(HadoopLog.title == "fault")
+        filters = [HadoopLog.title == "fault"]
 
         if cluster:
-            stmt = stmt.where(HadoopLog.cluster_name == cluster)
-            count_stmt = count_stmt.where(HadoopLog.cluster_name == cluster)
+            filters.append(HadoopLog.cluster_name == cluster)
         if node:
-            stmt = stmt.where(HadoopLog.node_host == node)
-            count_stmt = count_stmt.where(HadoopLog.node_host == node)
+            filters.append(HadoopLog.node_host == node)
         if time_from:
             try:
                 tf = datetime.fromisoformat(time_from.replace("Z", "+00:00"))
@@ -76,14 +77,18 @@ async def list_faults(
                     tf = tf.replace(tzinfo=BJ_TZ)
                 else:
                     tf = tf.astimezone(BJ_TZ)
-                stmt = stmt.where(HadoopLog.log_time >= tf)
-                count_stmt = count_stmt.where(HadoopLog.log_time >= tf)
+                filters.append(HadoopLog.log_time >= tf)
             except Exception:
                 pass
 
-        stmt = stmt.order_by(HadoopLog.log_time.desc()).offset((page - 1) * size).limit(size)
-        rows = (await db.execute(stmt)).scalars().all()
-        total = (await db.execute(count_stmt)).scalar() or 0
+        try:
+            stmt = keyset_page(select(HadoopLog).where(*filters), HadoopLog.log_time, HadoopLog.log_id, size, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid_cursor")
+        if not cursor:
+            stmt = stmt.offset((page - 1) * size)
+        rows, nxt = next_cursor((await db.execute(stmt)).scalars().all(), size, "log_time", "log_id")
+        counted = await count_rows(db, select(HadoopLog.log_id).where(*filters), count)
 
         items = []
         for r in rows:
@@ -104,7 +109,7 @@ async def list_faults(
                 "node": r.node_host,
                 "created": r.log_time.isoformat() if r.log_time else None
             })
-        return {"items": items, "total": int(total)}
+        return {"items": items, **counted, "next": nxt}
     except HTTPException:
         raise
     except Exception as e:
@@ -144,7 +149,9 @@ async def create_fault(req: FaultCreate, user=Depends(get_current_user), db: Asy
             node_host=req.node or "unknown",
             title="fault",
             info=json.dumps(meta, ensure_ascii=False),
-            log_time=ts
+            log_time=ts,
+            level=_map_level(req.level),
+            service="fault",
         )
         db.add(log)
         await db.commit()
@@ -204,3 +211,31 @@ async def delete_fault(fid: int, user=Depends(get_current_user), db: AsyncSessio
     except Exception as e:
         print(f"Error deleting fault: {e}")
         raise HTTPException(status_code=500, detail="server_error")
+
+
+@router.get("/faults/rules")
+async def list_fault_rules(user=Depends(get_current_user)):
+    """当前生效的故障规则目录（版本、来源）及每条规则的命中统计。"""
+    try:
+        rule_catalog.matcher()
+        return rule_catalog.describe()
+    except Exception as e:
+        print(f"Error listing fault rules: {e}")
+        raise HTTPException(status_code=500, detail="server_error")
+
+
+@router.post("/faults/rules/reload")
+async def reload_fault_rules(user=Depends(get_current_user)):
+    """立即重新加载规则文件；文件不合法时保留原规则并在 lastError 中返回原因。"""
+    try:
+        uname = _get_username(user)
+        if uname not in {"admin", "ops"}:
+            raise HTTPException(status_code=403, detail="not_allowed")
+        if not rule_catalog.path:
+            raise HTTPException(status_code=400, detail="rules_file_not_configured")
+        return rule_catalog.reload()
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error reloading fault rules: {e}")
+        raise HTTPException(status_code=500, detail="server_error")
@@ -1,21 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, text
+from sqlalchemy import select
 from ..db import get_db
 from ..deps.auth import get_current_user
 from ..log_reader import log_reader
-from ..log_collector import log_collector
+from ..log_collector import log_collector, SHIPPER_LOG_TYPE
 from ..ssh_utils import ssh_manager
 from ..models.nodes import Node
 from ..models.clusters import Cluster
 from ..metrics_collector import metrics_collector
 from ..models.hadoop_logs import HadoopLog
+from ..services.metrics_store import ensure_metrics_schema
+from ..services.log_search import parse_search_query, search_condition, search_rank, source_condition
+from ..services.log_template_stats import top_templates
+from ..services.log_ranges import LogRotatedError, log_time_key
+from ..services.pagination import keyset_page, next_cursor, count_rows, COUNT_MODE_PATTERN
 from datetime import datetime, timezone
 import time
+import json
+import shlex
+import asyncio
 from ..models.node_metrics import NodeMetric
 from ..models.cluster_metrics import ClusterMetric
 from datetime import timedelta
-from ..config import now_bj
+from ..config import now_bj, SSH_EXEC_TIMEOUT, SSH_FANOUT_CONCURRENCY, SSH_FANOUT_NODE_TIMEOUT, LOG_READ_DEFAULT_BYTES, LOG_READ_MAX_BYTES
 from ..config import BJ_TZ
 from zoneinfo import ZoneInfo
 from ..schemas import (
@@ -29,39 +38,7 @@ from ..schemas import (
 router = APIRouter()
 
 async def _ensure_metrics_schema(db: AsyncSession):
-    await db.execute(text("""
-        CREATE TABLE IF NOT EXISTS node_metrics (
-            id SERIAL PRIMARY KEY,
-            cluster_id INTEGER,
-            node_id INTEGER,
-            hostname VARCHAR(100),
-            cpu_usage DOUBLE PRECISION,
-            memory_usage DOUBLE PRECISION,
-            created_at TIMESTAMPTZ
-        )
-    """))
-    await db.execute(text("""
-        CREATE TABLE IF NOT EXISTS cluster_metrics (
-            id SERIAL PRIMARY KEY,
-            cluster_id INTEGER,
-            cluster_name VARCHAR(100),
-            cpu_avg DOUBLE PRECISION,
-            memory_avg DOUBLE PRECISION,
-            created_at TIMESTAMPTZ
-        )
-    """))
-    await db.execute(text("ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS node_id INTEGER"))
-    await db.execute(text("ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS hostname VARCHAR(100)"))
-    await db.execute(text("ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS cpu_usage DOUBLE PRECISION"))
-    await db.execute(text("ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS memory_usage DOUBLE PRECISION"))
-    await db.execute(text("ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ"))
-    await db.execute(text("ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS cluster_id INTEGER"))
-    await db.execute(text("ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS cluster_name VARCHAR(100)"))
-    await db.execute(text("ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS cpu_avg DOUBLE PRECISION"))
-    await db.execute(text("ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS memory_avg DOUBLE PRECISION"))
-    await db.execute(text("ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ"))
-    await db.execute(text("ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS cluster_id INTEGER"))
-    await db.commit()
+    await ensure_metrics_schema(db, force=True)
 
 def _parse_time(s: str | None) -> datetime | None:
     if not s:
@@ -81,33 +58,38 @@ async def list_logs(
     cluster: str | None = Query(None),
     node: str | None = Query(None),
     source: str | None = Query(None),
+    level: str | None = Query(None),
+    service: str | None = Query(None),
     time_from: str | None = Query(None),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
+    cursor: str | None = Query(None, description="上一页返回的 next，传入后按 (log_time, log_id) 游标翻页，忽略 page"),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
 ):
     try:
-        stmt = select(HadoopLog)
-        count_stmt = select(func.count(HadoopLog.log_id))
-
         filters = []
         if cluster:
             filters.append(HadoopLog.cluster_name == cluster)
         if node:
             filters.append(HadoopLog.node_host == node)
+        if level:
+            filters.append(HadoopLog.level == level.upper())
+        if service:
+            filters.append(HadoopLog.service == service)
         if source:
-            like = f"%{source}%"
-            filters.append(or_(HadoopLog.title.ilike(like), HadoopLog.info.ilike(like), HadoopLog.node_host.ilike(like)))
+            filters.append(source_condition(source))
         tf = _parse_time(time_from)
         if tf:
             filters.append(HadoopLog.log_time >= tf)
 
-        for f in filters:
-            stmt = stmt.where(f)
-            count_stmt = count_stmt.where(f)
-
-        stmt = stmt.order_by(HadoopLog.log_time.desc()).offset((page - 1) * size).limit(size)
-        rows = (await db.execute(stmt)).scalars().all()
-        total = (await db.execute(count_stmt)).scalar() or 0
+        try:
+            stmt = keyset_page(select(HadoopLog).where(*filters), HadoopLog.log_time, HadoopLog.log_id, size, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid_cursor")
+        if not cursor:
+            stmt = stmt.offset((page - 1) * size)
+        rows, nxt = next_cursor((await db.execute(stmt)).scalars().all(), size, "log_time", "log_id")
+        counted = await count_rows(db, select(HadoopLog.log_id).where(*filters), count)
 
         items = [
             {
@@ -117,16 +99,92 @@ async def list_logs(
                 "node": r.node_host,
                 "title": r.title,
                 "info": r.info,
+                "level": r.level,
+                "service": r.service,
+                "logger": r.logger,
             }
             for r in rows
         ]
-        return {"items": items, "total": int(total)}
+        return {"items": items, **counted, "next": nxt}
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error listing logs: {e}")
         raise HTTPException(status_code=500, detail="server_error")
 
+@router.get("/logs/search")
+async def search_logs(
+    q: str = Query(..., min_length=1, description='关键词；"短语"、前缀*、异常类名（如 java.io.IOException）'),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    cluster: str | None = Query(None),
+    node: str | None = Query(None),
+    level: str | None = Query(None),
+    time_from: str | None = Query(None),
+    size: int = Query(20, ge=1, le=100),
+):
+    """按相关度排序的日志全文检索"""
+    try:
+        parsed = parse_search_query(q)
+        cond = search_condition(parsed)
+        if cond is None:
+            raise HTTPException(status_code=400, detail="empty_query")
+        filters = [cond]
+        if cluster:
+            filters.append(HadoopLog.cluster_name == cluster)
+        if node:
+            filters.append(HadoopLog.node_host == node)
+        if level:
+            filters.append(HadoopLog.level == level.upper())
+        tf = _parse_time(time_from)
+        if tf:
+            filters.append(HadoopLog.log_time >= tf)
+        rank = search_rank(parsed)
+        cols = [HadoopLog, rank.label("rank")] if rank is not None else [HadoopLog]
+        stmt = select(*cols).where(*filters)
+        stmt = stmt.order_by(rank.desc(), HadoopLog.log_time.desc()) if rank is not None else stmt.order_by(HadoopLog.log_time.desc())
+        rows = (await db.execute(stmt.limit(size))).all()
+        items = []
+        for row in rows:
+            r = row[0]
+            items.append({
+                "id": r.log_id,
+                "time": r.log_time.isoformat() if r.log_time else None,
+                "cluster": r.cluster_name,
+                "node": r.node_host,
+                "title": r.title,
+                "info": r.info,
+                "level": r.level,
+                "service": r.service,
+                "rank": round(float(row[1]), 4) if rank is not None else None,
+            })
+        return {"items": items, "query": {"terms": parsed.terms, "prefixes": parsed.prefixes, "phrases": parsed.phrases, "classes": parsed.classes, "substrings": parsed.substrings}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error searching logs: {e}")
+        raise HTTPException(status_code=500, detail="server_error")
+
+@router.get("/logs/templates/top")
+async def list_top_templates(
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    cluster: str | None = Query(None),
+    node: str | None = Query(None),
+    level: str | None = Query(None),
+    minutes: int = Query(10, ge=1, le=1440),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """最近一段时间出现最多的日志模板"""
+    try:
+        items = await top_templates(db, cluster, node, minutes=minutes, limit=limit, level=level)
+        return {"items": items, "minutes": minutes}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error listing log templates: {e}")
+        raise HTTPException(status_code=500, detail="server_error")
+
 async def get_node_ip(db: AsyncSession, node_name: str) -> str:
     result = await db.execute(select(Node.ip_address).where(Node.hostname == node_name))
     ip = result.scalar_one_or_none()
@@ -150,7 +208,7 @@ async def get_hadoop_log(node_name: str, log_type: str, user=Depends(get_current
     ip = await get_node_ip(db, node_name)
     try:
         # Read log content
-        log_content = log_reader.read_log(node_name, log_type, ip=ip)
+        log_content = await log_reader.aread_log(node_name, log_type, ip=ip)
         return LogResponse(
             node_name=node_name,
             log_type=log_type,
@@ -159,18 +217,98 @@ async def get_hadoop_log(node_name: str, log_type: str, user=Depends(get_current
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/hadoop/logs/{node_name}/{log_type}/range/")
+async def get_hadoop_log_range(
+    node_name: str,
+    log_type: str,
+    token: str | None = Query(None),
+    offset: int | None = Query(None, ge=0),
+    line: int | None = Query(None, ge=1),
+    tail_bytes: int | None = Query(None, ge=1),
+    length: int = Query(LOG_READ_DEFAULT_BYTES, ge=1, le=LOG_READ_MAX_BYTES),
+    lines: int = Query(0, ge=0),
+    grep: str | None = Query(None, max_length=500),
+    since: str | None = Query(None),
+    until: str | None = Query(None),
+    file: str | None = Query(None),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """分段读取节点日志，单次最多返回 length 字节的整行
+
+    起点优先级：token（续读）> line（行号）> offset（字节偏移）> tail_bytes / 默认（文件末尾）。
+    grep 为扩展正则，since/until 按行首时间过滤，均在远端执行；
+    响应中的 next_token / prev_token 用于向后 / 向前翻页。
+    """
+    ip = await get_node_ip(db, node_name)
+    try:
+        if token:
+            where = {}
+        else:
+            if line is not None:
+                where = {"line": line}
+            elif offset is not None:
+                where = {"offset": offset}
+            else:
+                where = {"tail": True}
+                if tail_bytes:
+                    length = min(tail_bytes, LOG_READ_MAX_BYTES)
+            where.update(pattern=grep or "", since=log_time_key(since), until=log_time_key(until))
+        page = await log_reader.aread_log_range(node_name, log_type, ip, token=token, file=file, length=length, max_lines=lines, **where)
+        return {"node_name": node_name, "log_type": log_type, **page}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="log_not_found")
+    except LogRotatedError:
+        raise HTTPException(status_code=409, detail="log_rotated")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_all_nodes_log(nodes_list: list[dict], log_type: str, concurrency: int, timeout: float):
+    """每个节点完成即输出一行 JSON，最后一行为汇总"""
+    started = time.perf_counter()
+    failed = 0
+    async for res in log_reader.aiter_all_nodes_log(nodes_list, log_type, concurrency, timeout):
+        line = {"node_name": res.item["name"], "log_type": log_type, "ok": res.ok, "elapsed_ms": res.elapsed_ms}
+        if res.ok:
+            line["log_content"] = res.value
+        else:
+            failed += 1
+            line["error"] = res.error
+        yield json.dumps(line, ensure_ascii=False) + "\n"
+    yield json.dumps({"done": True, "nodes": len(nodes_list), "failed": failed, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}) + "\n"
+
 @router.get("/hadoop/logs/all/{log_type}/", response_model=MultiLogResponse)
-async def get_all_hadoop_nodes_log(log_type: str, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Get logs from all Hadoop nodes"""
+async def get_all_hadoop_nodes_log(
+    log_type: str,
+    stream: bool = Query(False),
+    concurrency: int = Query(SSH_FANOUT_CONCURRENCY, ge=1, le=256),
+    timeout: float = Query(SSH_FANOUT_NODE_TIMEOUT, gt=0, le=600),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get logs from all Hadoop nodes
+
+    Nodes are read concurrently (concurrency at a time, each within timeout
+    seconds); stream=true returns one NDJSON line per node as it finishes.
+    """
     stmt = select(Node.hostname, Node.ip_address).join(Cluster)
     result = await db.execute(stmt)
     nodes_data = result.all()
     
     nodes_list = [{"name": n[0], "ip": str(n[1])} for n in nodes_data]
+
+    if stream:
+        return StreamingResponse(
+            _stream_all_nodes_log(nodes_list, log_type, concurrency, timeout),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
     
     try:
         # Read logs from all nodes
-        logs = log_reader.read_all_nodes_log(nodes_list, log_type)
+        logs = await log_reader.aread_all_nodes_log(nodes_list, log_type, concurrency, timeout)
         return MultiLogResponse(logs=logs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -181,7 +319,7 @@ async def get_hadoop_log_files(node_name: str, user=Depends(get_current_user), d
     ip = await get_node_ip(db, node_name)
     try:
         # Get log files list
-        log_files = log_reader.get_log_files_list(node_name, ip=ip)
+        log_files = await log_reader.aget_log_files_list(node_name, ip=ip)
         return LogFilesResponse(
             node_name=node_name,
             log_files=log_files
@@ -196,17 +334,38 @@ async def get_hadoop_collectors_status(user=Depends(get_current_user)):
     status = log_collector.get_collectors_status()
     return {
         "collectors": status,
-        "total_running": sum(status.values())
+        "total_running": sum(status.values()),
+        "rotation_recovered_bytes": dict(log_collector.rotation_recovered_bytes),
+        "ingest": log_collector.get_ingest_stats(),
+        "ssh": ssh_manager.stats()
     }
 
 @router.post("/hadoop/collectors/start/{node_name}/{log_type}/")
-async def start_hadoop_collector(node_name: str, log_type: str, interval: int = 5, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Start log collection for a specific Hadoop node and log type"""
+async def start_hadoop_collector(node_name: str, log_type: str, interval: int = 5, mode: str = Query("poll", pattern="^(poll|stream)$"), user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Start log collection for a specific Hadoop node and log type
+
+    mode=stream keeps a persistent `tail -f` channel open instead of polling every interval.
+    """
     ip = await get_node_ip(db, node_name)
     try:
-        log_collector.start_collection(node_name, log_type, ip=ip, interval=interval)
+        log_collector.start_collection(node_name, log_type, ip=ip, interval=interval, mode=mode)
         return {
             "message": f"Started log collection for {node_name}_{log_type}",
+            "interval": interval,
+            "mode": mode
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/hadoop/collectors/start-shipper/{node_name}/")
+async def start_hadoop_shipper(node_name: str, interval: int = 5, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Ship all daemon logs of a Hadoop node over one SSH channel"""
+    ip = await get_node_ip(db, node_name)
+    try:
+        log_collector.start_host_shipper(node_name, ip, interval=interval)
+        return {
+            "message": f"Started log shipper for {node_name}",
+            "collector": f"{node_name}_{SHIPPER_LOG_TYPE}",
             "interval": interval
         }
     except Exception as e:
@@ -272,7 +431,7 @@ async def execute_hadoop_command(node_name: str, command: str, timeout: int = 30
         ssh_client = ssh_manager.get_connection(node_name, ip=str(ip))
         
         # Execute command with timeout
-        stdout, stderr = ssh_client.execute_command_with_timeout(command, timeout)
+        stdout, stderr = await ssh_client.aexecute_command(command, timeout)
         
         return {
             "node_name": node_name,
@@ -284,9 +443,19 @@ async def execute_hadoop_command(node_name: str, command: str, timeout: int = 30
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _list_log_files(hn: str, ip: str) -> list[str]:
+    """节点上的日志文件名，探测失败时返回空列表"""
+    try:
+        return await log_reader.aget_log_files_list(hn, ip=ip)
+    except Exception:
+        return []
+
 @router.post("/hadoop/collectors/start-by-cluster/{cluster_uuid}/")
-async def start_collectors_by_cluster(cluster_uuid: str, interval: int = 5, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Start log collection for all nodes of the cluster (by UUID), only for existing services"""
+async def start_collectors_by_cluster(cluster_uuid: str, interval: int = 5, mode: str = Query("poll", pattern="^(poll|stream|ship)$"), user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Start log collection for all nodes of the cluster (by UUID), only for existing services
+
+    mode=ship starts one shipper per node that tails all of its daemon logs over a single channel.
+    """
     try:
         cid_res = await db.execute(select(Cluster.id).where(Cluster.uuid == cluster_uuid).limit(1))
         cid = cid_res.scalar_one_or_none()
@@ -297,14 +466,17 @@ async def start_collectors_by_cluster(cluster_uuid: str, interval: int = 5, user
         if not rows:
             return {"started": 0, "nodes": []}
         started = []
-        for hn, ip in rows:
+        if mode == "ship":
+            node_files = [[] for _ in rows]
+        else:
+            # 各节点的日志目录并发探测
+            node_files = await asyncio.gather(*(_list_log_files(hn, str(ip)) for hn, ip in rows))
+        for (hn, ip), files in zip(rows, node_files):
             ip_s = str(ip)
-            files = []
-            try:
-                log_reader.find_working_log_dir(hn, ip_s)
-                files = log_reader.get_log_files_list(hn, ip=ip_s)
-            except Exception:
-                files = []
+            if mode == "ship":
+                if log_collector.start_host_shipper(hn, ip_s, interval=interval):
+                    started.append(f"{hn}_{SHIPPER_LOG_TYPE}")
+                continue
             services = []
             for fn in files:
                 f = fn.lower()
@@ -324,17 +496,75 @@ async def start_collectors_by_cluster(cluster_uuid: str, interval: int = 5, user
             for t in services:
                 ok = False
                 try:
-                    ok = log_collector.start_collection(hn, t, ip=ip_s, interval=interval)
+                    ok = log_collector.start_collection(hn, t, ip=ip_s, interval=interval, mode=mode)
                 except Exception:
                     ok = False
                 if ok:
                     started.append(f"{hn}_{t}")
-        return {"started": len(started), "nodes": started, "interval": interval}
+        return {"started": len(started), "nodes": started, "interval": interval, "mode": mode}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _backfill_node(hn: str, ip_s: str) -> dict:
+    """读取节点日志目录下的全部守护进程日志并入库"""
+    ssh_client = ssh_manager.get_connection(hn, ip=ip_s)
+    candidates = [
+        "/opt/module/hadoop-3.1.3/logs",
+        "/usr/local/hadoop/logs",
+        "/usr/local/hadoop-3.3.6/logs",
+        "/usr/local/hadoop-3.3.5/logs",
+        "/usr/local/hadoop-3.1.3/logs",
+        "/opt/hadoop/logs",
+        "/var/log/hadoop",
+    ]
+    base = None
+    for d in candidates:
+        out, err = await ssh_client.aexecute_command(f"ls -1 {d} 2>/dev/null", SSH_EXEC_TIMEOUT)
+        if not err and out.strip():
+            base = d
+            break
+    services = []
+    count = 0
+    if base:
+        out, err = await ssh_client.aexecute_command(f"ls -1 {base} 2>/dev/null", SSH_EXEC_TIMEOUT)
+        if not err and out.strip():
+            for fn in out.splitlines():
+                f = fn.lower()
+                t = None
+                if "namenode" in f:
+                    t = "namenode"
+                elif "secondarynamenode" in f:
+                    t = "secondarynamenode"
+                elif "datanode" in f:
+                    t = "datanode"
+                elif "resourcemanager" in f:
+                    t = "resourcemanager"
+                elif "nodemanager" in f:
+                    t = "nodemanager"
+                elif "historyserver" in f:
+                    t = "historyserver"
+                if t:
+                    services.append(t)
+                    # 流式读取整个文件（stdout/stderr 同时排空、增量解码），按 LOG_READ_MAX_BYTES 分批入库，内存占用与文件大小无关
+                    batch = []
+                    size = 0
+                    async with ssh_client.astream(f"cat {shlex.quote(f'{base}/{fn}')} 2>/dev/null", lines=True) as stream:
+                        async for name, line in stream:
+                            if name != "stdout":
+                                continue
+                            batch.append(line)
+                            size += len(line) + 1
+                            if size >= LOG_READ_MAX_BYTES:
+                                await log_collector.asave_log_chunk(hn, t, "\n".join(batch) + "\n")
+                                count += len(batch)
+                                batch, size = [], 0
+                    if batch:
+                        await log_collector.asave_log_chunk(hn, t, "\n".join(batch) + "\n")
+                        count += len(batch)
+    return {"node": hn, "services": list(set(services)), "lines": count}
+
 @router.post("/hadoop/collectors/backfill-by-cluster/{cluster_uuid}/")
 async def backfill_logs_by_cluster(cluster_uuid: str, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     try:
@@ -346,52 +576,8 @@ async def backfill_logs_by_cluster(cluster_uuid: str, user=Depends(get_current_u
         rows = nodes_res.all()
         if not rows:
             return {"backfilled": 0, "details": []}
-        details = []
-        for hn, ip in rows:
-            ip_s = str(ip)
-            ssh_client = ssh_manager.get_connection(hn, ip=ip_s)
-            candidates = [
-                "/opt/module/hadoop-3.1.3/logs",
-                "/usr/local/hadoop/logs",
-                "/usr/local/hadoop-3.3.6/logs",
-                "/usr/local/hadoop-3.3.5/logs",
-                "/usr/local/hadoop-3.1.3/logs",
-                "/opt/hadoop/logs",
-                "/var/log/hadoop",
-            ]
-            base = None
-            for d in candidates:
-                out, err = ssh_client.execute_command(f"ls -1 {d} 2>/dev/null")
-                if not err and out.strip():
-                    base = d
-                    break
-            services = []
-            count = 0
-            if base:
-                out, err = ssh_client.execute_command(f"ls -1 {base} 2>/dev/null")
-                if not err and out.strip():
-                    for fn in out.splitlines():
-                        f = fn.lower()
-                        t = None
-                        if "namenode" in f:
-                            t = "namenode"
-                        elif "secondarynamenode" in f:
-                            t = "secondarynamenode"
-                        elif "datanode" in f:
-                            t = "datanode"
-                        elif "resourcemanager" in f:
-                            t = "resourcemanager"
-                        elif "nodemanager" in f:
-                            t = "nodemanager"
-                        elif "historyserver" in f:
-                            t = "historyserver"
-                        if t:
-                            services.append(t)
-                            out2, err2 = ssh_client.execute_command(f"cat {base}/{fn} 2>/dev/null")
-                            if not err2 and out2:
-                                log_collector._save_log_chunk(hn, t, out2)
-                                count += out2.count("\n")
-            details.append({"node": hn, "services": list(set(services)), "lines": count})
+        # 各节点并发回填
+        details = list(await asyncio.gather(*(_backfill_node(hn, str(ip)) for hn, ip in rows)))
         total_lines = sum(d["lines"] for d in details)
         return {"backfilled": total_lines, "details": details}
     except HTTPException:
@@ -416,39 +602,16 @@ async def sync_metrics(cluster_uuid: str, user=Depends(get_current_user), db: As
         rows = nodes_res.all()
         now = now_bj()
         details = []
-        for nid, hn, ip in rows:
-            ssh_client = ssh_manager.get_connection(hn, ip=str(ip))
-            out1, err1 = ssh_client.execute_command("cat /proc/stat | head -n 1")
-            time.sleep(0.5)
-            out2, err2 = ssh_client.execute_command("cat /proc/stat | head -n 1")
-            cpu_pct = 0.0
-            if not err1 and not err2 and out1.strip() and out2.strip():
-                p1 = out1.strip().split()
-                p2 = out2.strip().split()
-                v1 = [int(x) for x in p1[1:]]
-                v2 = [int(x) for x in p2[1:]]
-                get1 = lambda i: (v1[i] if i < len(v1) else 0)
-                get2 = lambda i: (v2[i] if i < len(v2) else 0)
-                idle = (get2(3) + get2(4)) - (get1(3) + get1(4))
-                total = (get2(0) - get1(0)) + (get2(1) - get1(1)) + (get2(2) - get1(2)) + idle + (get2(5) - get1(5)) + (get2(6) - get1(6)) + (get2(7) - get1(7))
-                if total > 0:
-                    cpu_pct = round((1.0 - idle / total) * 100.0, 2)
-            outm, errm = ssh_client.execute_command("cat /proc/meminfo")
-            mem_pct = 0.0
-            if not errm and outm.strip():
-                mt = 0
-                ma = 0
-                for line in outm.splitlines():
-                    if line.startswith("MemTotal:"):
-                        mt = int(line.split()[1])
-                    elif line.startswith("MemAvailable:"):
-                        ma = int(line.split()[1])
-                if mt > 0:
-                    mem_pct = round((1.0 - (ma / mt)) * 100.0, 2)
-            details.append({"node": hn, "cpu": cpu_pct, "memory": mem_pct})
-        if details:
-            ca = round(sum(d["cpu"] for d in details) / len(details), 3)
-            ma = round(sum(d["memory"] for d in details) / len(details), 3)
+        # 所有节点并发探测（异步 SSH，超时即关闭通道，不阻塞事件循环）
+        samples, errors = await metrics_collector.probe_nodes([(int(nid), str(hn), str(ip), int(cid)) for nid, hn, ip in rows])
+        for smp in samples:
+            details.append({"node": smp["hostname"], "cpu": smp["cpu"] or 0.0, "memory": smp["mem"] or 0.0, "disk": smp.get("disk"), "load1": smp.get("load1")})
+        for hn, err in errors.items():
+            details.append({"node": hn, "cpu": 0.0, "memory": 0.0, "error": err})
+        ok = [d for d in details if "error" not in d]
+        if ok:
+            ca = round(sum(d["cpu"] for d in ok) / len(ok), 3)
+            ma = round(sum(d["memory"] for d in ok) / len(ok), 3)
         else:
             ca = 0.0
             ma = 0.0
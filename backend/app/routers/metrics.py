@@ -6,7 +6,9 @@ from ..deps.auth import get_current_user
 from ..metrics_collector import metrics_collector
 from ..models.nodes import Node
 from ..models.clusters import Cluster
-from datetime import datetime, timezone
+from ..services.metrics_store import cpu_series, pick_bucket_seconds, format_times, BUCKET_STEPS, STAT_PATTERN
+from ..config import BJ_TZ
+from datetime import datetime, timezone, timedelta
 
 router = APIRouter()
 
@@ -30,6 +32,46 @@ async def _ensure_access(db: AsyncSession, username: str, cluster_uuid: str) ->
     return cid
 
 
+def _parse_time(s: str | None) -> datetime | None:
+    if not s:
+        return None
+    try:
+        dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=BJ_TZ)
+        return dt.astimezone(BJ_TZ)
+    except Exception:
+        return None
+
+
+def _trend_range(time_from: str | None, time_to: str | None, minutes: int, step: int | None) -> tuple[datetime, datetime, int]:
+    """解析趋势查询的时间范围与分桶粒度；未指定 step 时按范围自动选择，约 120 个点。"""
+    end = _parse_time(time_to) or datetime.now(BJ_TZ)
+    start = _parse_time(time_from) or (end - timedelta(minutes=minutes))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="invalid_time_range")
+    if step is None:
+        step = pick_bucket_seconds(start, end)
+    elif step not in BUCKET_STEPS:
+        raise HTTPException(status_code=400, detail="invalid_step")
+    return start, end, step
+
+
+async def _cpu_trend(db: AsyncSession, cid: int, time_from, time_to, minutes, step, stat: str, hostname: str | None = None) -> dict:
+    start, end, step = _trend_range(time_from, time_to, minutes, step)
+    times, values, step, tier = await cpu_series(db, cid, start, end, step, hostname=hostname, stat=stat)
+    return {
+        "times": format_times(times, start, end),
+        "values": values,
+        "timestamps": [t.isoformat() for t in times],
+        "step": step,
+        "tier": tier,
+        "stat": stat,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+    }
+
+
 @router.post("/metrics/collectors/start-by-cluster/{cluster_uuid}")
 async def start_collectors_by_cluster(
     cluster_uuid: str,
@@ -91,7 +133,8 @@ async def get_collectors_status(
                 "active_collectors_count": int(sum(1 for v in status.values() if v)),
                 "interval": interval,
                 "collectors": status,
-                "errors": errors
+                "errors": errors,
+                "tick": dict(metrics_collector.tick_stats),
             }
         except Exception as inner_e:
             return {
@@ -138,22 +181,27 @@ async def stop_collectors_by_cluster(
 
 
 @router.get("/metrics/cpu_trend")
-async def cpu_trend(cluster: str = Query(...), user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """获取指定集群的 CPU 使用率趋势数据。"""
+async def cpu_trend(
+    cluster: str = Query(...),
+    time_from: str | None = Query(None, description="起始时间（ISO 8601），默认为 time_to 往前 minutes 分钟"),
+    time_to: str | None = Query(None, description="结束时间（ISO 8601），默认为当前时间"),
+    minutes: int = Query(1440, ge=1, le=60 * 24 * 90),
+    step: int | None = Query(None, description="分桶秒数，缺省时按时间范围自动选择"),
+    stat: str = Query("avg", pattern=STAT_PATTERN, description="桶内统计量：avg / min / max / p95"),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """获取指定集群的 CPU 使用率趋势数据（按请求粒度从原始 / 1 分钟 / 1 小时汇总层中选最粗的一层读取，无采样的桶为 null）。"""
     try:
         name = _get_username(user)
         cid = await _ensure_access(db, name, cluster)
         if not cid:
             raise HTTPException(status_code=403, detail="not_allowed")
-        res = await db.execute(select(Node.cpu_usage).where(Node.cluster_id == cid))
-        vals = [v for v in res.scalars().all() if v is not None]
-        base = sum(vals) / len(vals) if vals else 30.0
-        pattern = [-10, -5, 0, 5, 10, 5, 0]
-        series = [max(0, min(100, int(round(base + d)))) for d in pattern]
-        return {"times": ["00:00","04:00","08:00","12:00","16:00","20:00","24:00"], "values": series}
+        return await _cpu_trend(db, cid, time_from, time_to, minutes, step, stat)
     except HTTPException:
         raise
-    except Exception:
+    except Exception as e:
+        print(f"Error querying cpu trend: {e}")
         raise HTTPException(status_code=500, detail="server_error")
 
 
@@ -176,22 +224,28 @@ async def memory_usage(cluster: str = Query(...), user=Depends(get_current_user)
         raise HTTPException(status_code=500, detail="server_error")
 
 @router.get("/metrics/cpu_trend_node")
-async def cpu_trend_node(cluster: str = Query(...), node: str = Query(...), user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """获取指定节点的 CPU 使用率趋势数据。"""
+async def cpu_trend_node(
+    cluster: str = Query(...),
+    node: str = Query(...),
+    time_from: str | None = Query(None, description="起始时间（ISO 8601），默认为 time_to 往前 minutes 分钟"),
+    time_to: str | None = Query(None, description="结束时间（ISO 8601），默认为当前时间"),
+    minutes: int = Query(1440, ge=1, le=60 * 24 * 90),
+    step: int | None = Query(None, description="分桶秒数，缺省时按时间范围自动选择"),
+    stat: str = Query("avg", pattern=STAT_PATTERN, description="桶内统计量：avg / min / max / p95"),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """获取指定节点的 CPU 使用率趋势数据（按请求粒度从原始 / 1 分钟 / 1 小时汇总层中选最粗的一层读取，无采样的桶为 null）。"""
     try:
         name = _get_username(user)
         cid = await _ensure_access(db, name, cluster)
         if not cid:
             raise HTTPException(status_code=403, detail="not_allowed")
-        res = await db.execute(select(Node.cpu_usage).where(Node.cluster_id == cid, Node.hostname == node).limit(1))
-        v = res.scalars().first()
-        base = float(v) if v is not None else 30.0
-        pattern = [-10, -5, 0, 5, 10, 5, 0]
-        series = [max(0, min(100, int(round(base + d)))) for d in pattern]
-        return {"times": ["00:00","04:00","08:00","12:00","16:00","20:00","24:00"], "values": series}
+        return await _cpu_trend(db, cid, time_from, time_to, minutes, step, stat, hostname=node)
     except HTTPException:
         raise
-    except Exception:
+    except Exception as e:
+        print(f"Error querying node cpu trend: {e}")
         raise HTTPException(status_code=500, detail="server_error")
 
 @router.get("/metrics/memory_usage_node")
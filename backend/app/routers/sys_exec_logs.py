@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, delete
 from ..db import get_db
 from ..models.sys_exec_logs import SysExecLog
 from ..deps.auth import get_current_user
 from pydantic import BaseModel
 from datetime import datetime
+import uuid
+from ..services.pagination import keyset_page, next_cursor, count_rows, COUNT_MODE_PATTERN
 
 router = APIRouter()
 
@@ -19,18 +21,26 @@ async def list_sys_exec_logs(
     db: AsyncSession = Depends(get_db),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
+    cursor: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
 ):
     try:
-        stmt = select(SysExecLog).order_by(SysExecLog.operation_time.desc()).offset((page - 1) * size).limit(size)
-        count_stmt = select(func.count(SysExecLog.operation_id))
-        
-        rows = (await db.execute(stmt)).scalars().all()
-        total = (await db.execute(count_stmt)).scalar() or 0
+        try:
+            stmt = keyset_page(select(SysExecLog), SysExecLog.operation_time, SysExecLog.operation_id, size, cursor, key_type=uuid.UUID)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid_cursor")
+        if not cursor:
+            stmt = stmt.offset((page - 1) * size)
+        rows, nxt = next_cursor((await db.execute(stmt)).scalars().all(), size, "operation_time", "operation_id")
+        counted = await count_rows(db, select(SysExecLog.operation_id), count)
         
         return {
             "items": [r.to_dict() for r in rows],
-            "total": int(total)
+            **counted,
+            "next": nxt
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error listing sys exec logs: {e}")
         raise HTTPException(status_code=500, detail="server_error")
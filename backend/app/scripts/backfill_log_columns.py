@@ -0,0 +1,43 @@
+"""Fill level/service on hadoop_logs rows written before those columns existed, then build the indexes.
+
+Runs in small batches so it can be left running next to live ingestion;
+the indexes are built with CREATE INDEX CONCURRENTLY, which does not block
+writers either. Run it after each deploy that adds an index.
+Usage: python -m app.scripts.backfill_log_columns --batch 5000 [--skip-backfill]
+"""
+import asyncio
+import argparse
+from sqlalchemy import text
+from app.db import SessionLocal, engine
+from app.services.log_schema import create_log_indexes, ensure_log_schema
+
+
+async def run(batch: int, skip_backfill: bool):
+    total = 0
+    async with SessionLocal() as session:
+        await ensure_log_schema(session)
+    while not skip_backfill:
+        async with SessionLocal() as session:
+            res = await session.execute(text("""
+                UPDATE hadoop_logs
+                SET service = COALESCE(title, 'unknown'),
+                    level = COALESCE(level, substring(info from ' (ERROR|FATAL|WARN|INFO|DEBUG|TRACE) '), 'INFO')
+                WHERE log_id IN (
+                    SELECT log_id FROM hadoop_logs WHERE service IS NULL LIMIT :n
+                )
+            """), {"n": batch})
+            await session.commit()
+        done = res.rowcount or 0
+        total += done
+        print(f"updated {total} rows")
+        if done < batch:
+            break
+    await create_log_indexes(engine)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--skip-backfill", action="store_true", help="only build the indexes")
+    args = ap.parse_args()
+    asyncio.run(run(args.batch, args.skip_backfill))
@@ -0,0 +1,114 @@
+"""Benchmark fault rule matching over a large NameNode log.
+
+before: the original per-call matcher (recompiles every rule's regexes and
+        loops rules x lines x patterns)
+after:  RuleMatcher (literal prefilter over the whole text, regexes only on
+        candidate lines)
+
+Usage: python -m app.scripts.bench_fault_rules --size-mb 100
+       python -m app.scripts.bench_fault_rules --file /path/to/hadoop-hadoop-namenode.log
+"""
+import re
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+from app.services.fault_detection import FAULT_RULES, RuleMatcher
+
+_NN_LINES = [
+    "INFO org.apache.hadoop.hdfs.StateChange: BLOCK* allocate blk_{blk}_{gen}, replicas=10.0.0.{a}:9866, 10.0.0.{b}:9866 for /user/hive/warehouse/t/part-{n:05d}",
+    "INFO org.apache.hadoop.hdfs.server.namenode.FSNamesystem: BLOCK* blk_{blk}_{gen} is COMMITTED but not COMPLETE(numNodes= 0 <  minimum = 1) in file /tmp/x{n}",
+    "INFO org.apache.hadoop.hdfs.StateChange: DIR* completeFile: /user/spark/eventlog/app-{n}.inprogress is closed by DFSClient_NONMAPREDUCE_{gen}_1",
+    "INFO org.apache.hadoop.hdfs.server.namenode.FSEditLog: Number of transactions: {n} Total time for transactions(ms): 12 Number of transactions batched in Syncs: 3",
+    "INFO BlockStateChange: BLOCK* addStoredBlock: 10.0.0.{a}:9866 is added to blk_{blk}_{gen} (size=134217728)",
+    "INFO org.apache.hadoop.hdfs.server.blockmanagement.BlockManager: Total number of blocks = {n}; invalid = 0; under-replicated = 0",
+    "WARN org.apache.hadoop.hdfs.server.blockmanagement.BlockPlacementPolicy: Failed to place enough replicas, still in need of 1 to reach 3",
+    "INFO org.apache.hadoop.ipc.Server: IPC Server handler {a} on 8020, call Call#{n} Retry#0 org.apache.hadoop.hdfs.protocol.ClientProtocol.getFileInfo from 10.0.0.{b}:4{a}",
+]
+_FAULT_LINES = [
+    "WARN org.apache.hadoop.ipc.Client: Failed to connect to server: hadoop102/10.0.0.{a}:8020: java.net.ConnectException: Connection refused",
+    "ERROR org.apache.hadoop.hdfs.server.namenode.NameNode: RECEIVED SIGNAL 15: SIGTERM Container killed on request",
+    "WARN org.apache.hadoop.hdfs.server.namenode.FSNamesystem: NameNode is in safe mode. The reported blocks {n} needs additional blocks",
+    "ERROR org.apache.hadoop.hdfs.server.datanode.DataNode: DiskOutOfSpaceException: No space left on device",
+]
+
+
+def make_namenode_log(size_mb: float, fault_every: int = 5000, seed: int = 7) -> str:
+    rnd = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    out: List[str] = []
+    total = 0
+    n = 0
+    while total < target:
+        n += 1
+        tpl = rnd.choice(_FAULT_LINES) if n % fault_every == 0 else rnd.choice(_NN_LINES)
+        line = f"2024-01-01 {n // 3600 % 24:02d}:{n // 60 % 60:02d}:{n % 60:02d},{n % 1000:03d} " + tpl.format(
+            blk=1073741825 + n, gen=1001 + n, a=rnd.randint(1, 250), b=rnd.randint(1, 250), n=n
+        )
+        out.append(line)
+        total += len(line) + 1
+    return "\n".join(out)
+
+
+def legacy_detect(text: str, max_examples_per_rule: int = 3) -> List[Dict[str, Any]]:
+    """The matcher as it was before RuleMatcher (kept verbatim for comparison)."""
+    lines = (text or "").splitlines()
+    hits: List[Dict[str, Any]] = []
+    for rule in FAULT_RULES:
+        compiled = [re.compile(p, re.IGNORECASE) for p in rule.get("patterns") or []]
+        examples: List[Dict[str, Any]] = []
+        for idx, line in enumerate(lines):
+            if not line:
+                continue
+            if any(rgx.search(line) for rgx in compiled):
+                examples.append({"lineNo": idx + 1, "line": line[:500]})
+                if len(examples) >= max_examples_per_rule:
+                    break
+        if examples:
+            hits.append({"id": rule.get("id"), "examples": examples})
+    return hits
+
+
+def legacy_full_scan(text: str) -> int:
+    """Legacy algorithm without the early exit: every line against every rule."""
+    compiled = [[re.compile(p, re.IGNORECASE) for p in rule.get("patterns") or []] for rule in FAULT_RULES]
+    n = 0
+    for line in text.splitlines():
+        for rxs in compiled:
+            if any(rx.search(line) for rx in rxs):
+                n += 1
+    return n
+
+
+def run(text: str, skip_full: bool):
+    mb = len(text.encode("utf-8")) / 1024 / 1024
+    matcher = RuleMatcher(FAULT_RULES)
+    print(f"input: {mb:.1f} MB, {text.count(chr(10)) + 1} lines")
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        secs = time.perf_counter() - start
+        print(f"{name:<28} {secs:8.2f} s {mb / secs:9.1f} MB/s")
+        return result
+
+    if not skip_full:
+        before = timed("before (all matches)", lambda: legacy_full_scan(text))
+    after = timed("after  (all matches)", lambda: sum(len(r) for *_, r in matcher.scan(text)))
+    if not skip_full:
+        print(f"rule hits before={before} after={after}")
+    timed("before detect() 3 examples", lambda: legacy_detect(text))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=float, default=100)
+    ap.add_argument("--file", help="benchmark a real log file instead of a generated one")
+    ap.add_argument("--skip-full", action="store_true", help="skip the slow full legacy scan")
+    args = ap.parse_args()
+    if args.file:
+        with open(args.file, encoding="utf-8", errors="replace") as f:
+            data = f.read()
+    else:
+        data = make_namenode_log(args.size_mb)
+    run(data, args.skip_full)
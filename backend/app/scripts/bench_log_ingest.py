@@ -0,0 +1,62 @@
+"""Benchmark hadoop_logs ingestion: ORM inserts vs asyncpg binary COPY.
+
+Rows are written under a throw-away cluster name and deleted afterwards.
+Usage: python -m app.scripts.bench_log_ingest --sizes 10000 100000 1000000
+"""
+import asyncio
+import argparse
+import time
+import uuid
+from sqlalchemy import text
+from app.db import SessionLocal
+from app.log_collector import log_collector
+from app.log_ingest import to_log_record, copy_log_records, insert_log_records_orm
+
+LEVELS = ["INFO", "INFO", "INFO", "WARN", "ERROR"]
+
+
+def make_lines(n: int) -> str:
+    lines = []
+    for i in range(n):
+        lines.append(
+            f"2024-01-01 10:{(i // 60) % 60:02d}:{i % 60:02d},{i % 1000:03d} {LEVELS[i % len(LEVELS)]} "
+            f"org.apache.hadoop.hdfs.server.datanode.DataNode: Receiving BP-1:blk_{1073741825 + i}_{1001 + i} src: /10.0.0.{i % 250}:5{i % 1000:03d}"
+        )
+    return "\n".join(lines)
+
+
+async def run_path(name: str, writer, records: list, batch_rows: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(records), batch_rows):
+        async with SessionLocal() as session:
+            await writer(session, records[i:i + batch_rows])
+            await session.commit()
+    return time.perf_counter() - start
+
+
+async def run(sizes: list[int], batch_rows: int):
+    cluster = f"bench_{uuid.uuid4().hex[:8]}"
+    print(f"{'lines':>10} {'path':>6} {'seconds':>9} {'rows/sec':>12}")
+    try:
+        for n in sizes:
+            batch = log_collector._build_log_batch("bench-node", "datanode", make_lines(n))
+            records = [to_log_record(r, cluster) for r in batch]
+            for name, writer in (("orm", insert_log_records_orm), ("copy", copy_log_records)):
+                secs = await run_path(name, writer, records, batch_rows)
+                print(f"{n:>10} {name:>6} {secs:>9.2f} {len(records) / secs:>12.0f}")
+    finally:
+        async with SessionLocal() as session:
+            await session.execute(text("DELETE FROM hadoop_logs WHERE cluster_name = :c"), {"c": cluster})
+            await session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    # ~256 KB pull of ~200 byte lines, i.e. what one collector tick commits
+    parser.add_argument("--batch-rows", type=int, default=1300)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.batch_rows))
+
+if __name__ == "__main__":
+    main()
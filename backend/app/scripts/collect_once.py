@@ -18,9 +18,10 @@ async def run(uuid: str):
         if not rows:
             print("NO_NODES")
             return
-        for nid, hn, ip in rows:
-            cpu, mem = metrics_collector._read_cpu_mem(hn, str(ip))
-            await metrics_collector._save_metrics(nid, hn, cid, cpu, mem)
+        samples, errors = await metrics_collector.probe_nodes([(nid, hn, str(ip), cid) for nid, hn, ip in rows])
+        for hn, err in errors.items():
+            print(f"Error probing {hn}: {err}")
+        await metrics_collector._save_samples(samples)
         print("DONE", len(rows))
 
 def main():
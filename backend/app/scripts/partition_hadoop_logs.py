@@ -0,0 +1,119 @@
+"""Convert hadoop_logs into a table range-partitioned by day on log_time.
+
+The old table is renamed to hadoop_logs_legacy, an empty partitioned
+hadoop_logs takes its place (same columns and serial id sequence, primary key
+(log_id, log_time), plus a DEFAULT partition), and the old rows are copied
+over one day per transaction (re-running skips rows already copied). Collectors can keep writing while it runs.
+Afterwards the collector's maintenance task keeps creating partitions ahead
+of time and drops (or detaches) days older than LOG_RETENTION_DAYS.
+
+Usage: python -m app.scripts.partition_hadoop_logs [--drop-legacy]
+"""
+import asyncio
+import argparse
+import datetime
+from sqlalchemy import text
+from app.db import SessionLocal, engine
+from app.config import BJ_TZ, LOG_PARTITION_PREMAKE_DAYS
+from app.log_ingest import HADOOP_LOG_COLUMNS
+from app.services.log_schema import create_log_indexes, ensure_log_schema
+from app.services.log_partitions import is_partitioned, ensure_partitions, create_partition, partition_bounds
+
+COLUMNS = ", ".join(("log_id",) + HADOOP_LOG_COLUMNS)
+
+
+async def log_id_sequence(session) -> str:
+    """The sequence owned by hadoop_logs.log_id; exits if log_id is not a serial column
+
+    An identity column's sequence cannot be re-owned by the new table, so
+    such a table is refused before anything is renamed or copied.
+    """
+    row = (await session.execute(text("""
+        SELECT pg_get_serial_sequence('hadoop_logs', 'log_id'), a.attidentity
+        FROM pg_attribute a
+        WHERE a.attrelid = 'hadoop_logs'::regclass AND a.attname = 'log_id'
+    """))).first()
+    if not row or not row[0]:
+        raise SystemExit("hadoop_logs.log_id has no owned sequence; nothing was changed")
+    if row[1]:
+        raise SystemExit("hadoop_logs.log_id is an identity column, not serial; convert it first, nothing was changed")
+    return row[0]
+
+
+async def convert(session, seq: str):
+    await session.execute(text("ALTER TABLE hadoop_logs RENAME TO hadoop_logs_legacy"))
+    # free the index names (including hadoop_logs_pkey) for the new table
+    idx = await session.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'hadoop_logs_legacy'"))
+    for (name,) in idx.all():
+        await session.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name[:50]}_legacy"'))
+    await session.execute(text("""
+        CREATE TABLE hadoop_logs (
+            log_id BIGINT NOT NULL,
+            cluster_name VARCHAR(255) NOT NULL,
+            node_host VARCHAR(100) NOT NULL,
+            title VARCHAR(255),
+            info TEXT,
+            log_time TIMESTAMPTZ NOT NULL,
+            level VARCHAR(10),
+            service VARCHAR(50),
+            logger VARCHAR(255),
+            fingerprint VARCHAR(16),
+            template_id VARCHAR(16),
+            params TEXT[],
+            PRIMARY KEY (log_id, log_time)
+        ) PARTITION BY RANGE (log_time)
+    """))
+    await session.execute(text(f"ALTER TABLE hadoop_logs ALTER COLUMN log_id SET DEFAULT nextval('{seq}')"))
+    await session.execute(text(f"ALTER SEQUENCE {seq} OWNED BY hadoop_logs.log_id"))
+    await session.execute(text("CREATE TABLE hadoop_logs_default PARTITION OF hadoop_logs DEFAULT"))
+    await session.commit()
+
+
+async def run(days_ahead: int, drop_legacy: bool):
+    async with SessionLocal() as session:
+        if await is_partitioned(session):
+            print("hadoop_logs is already partitioned")
+        else:
+            seq = await log_id_sequence(session)
+            # make sure the legacy table has every column before copying
+            await ensure_log_schema(session, force=True)
+            await convert(session, seq)
+            await ensure_log_schema(session, force=True)
+            await ensure_partitions(session, days_ahead)
+            print("hadoop_logs converted; copying legacy rows")
+    # indexes on the new (still small) partitions, so the copied rows are indexed as they arrive
+    await create_log_indexes(engine)
+    async with SessionLocal() as session:
+        exists = (await session.execute(text("SELECT to_regclass('hadoop_logs_legacy')"))).scalar()
+        if not exists:
+            return
+        lo, hi = (await session.execute(text("SELECT MIN(log_time), MAX(log_time) FROM hadoop_logs_legacy"))).first()
+    if lo is not None:
+        day = lo.astimezone(BJ_TZ).date()
+        last = hi.astimezone(BJ_TZ).date()
+        while day <= last:
+            start, end = partition_bounds(day)
+            async with SessionLocal() as session:
+                await create_partition(session, day)
+                res = await session.execute(text(f"""
+                    INSERT INTO hadoop_logs ({COLUMNS})
+                    SELECT {COLUMNS} FROM hadoop_logs_legacy
+                    WHERE log_time >= :s AND log_time < :e
+                    ON CONFLICT DO NOTHING
+                """), {"s": start, "e": end})
+                await session.commit()
+            print(f"{day}: {res.rowcount} rows")
+            day += datetime.timedelta(days=1)
+    if drop_legacy:
+        async with SessionLocal() as session:
+            await session.execute(text("DROP TABLE hadoop_logs_legacy"))
+            await session.commit()
+            print("dropped hadoop_logs_legacy")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days-ahead", type=int, default=LOG_PARTITION_PREMAKE_DAYS)
+    ap.add_argument("--drop-legacy", action="store_true")
+    args = ap.parse_args()
+    asyncio.run(run(args.days_ahead, args.drop_legacy))
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Coroutine, Optional
+
+
+class BackgroundLoop:
+    """A dedicated asyncio event loop running in one daemon thread.
+
+    Collectors are scheduled onto it as tasks instead of getting a thread
+    each. Blocking calls made through ``asyncio.to_thread`` inside the loop
+    go to a bounded thread pool, so the number of OS threads stays fixed no
+    matter how many tasks are scheduled.
+    """
+
+    def __init__(self, name: str, max_workers: int = 8):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if needed and return the loop."""
+        with self._lock:
+            if self.loop is not None and self._thread is not None and self._thread.is_alive():
+                return self.loop
+            loop = asyncio.new_event_loop()
+            executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-io")
+            loop.set_default_executor(executor)
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name=self.name, daemon=True)
+            thread.start()
+            ready.wait()
+            self.loop = loop
+            self._thread = thread
+            self._executor = executor
+            return loop
+
+    def is_running(self) -> bool:
+        return self.loop is not None and self._thread is not None and self._thread.is_alive()
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.get_ident() == self._thread.ident
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedule a coroutine on the loop from any thread.
+
+        The returned future is thread-safe; cancelling it cancels the task.
+        """
+        loop = self.ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block the calling thread for its result."""
+        if self.in_loop_thread():
+            raise RuntimeError(f"{self.name}: run() called from the loop thread")
+        return self.submit(coro).result(timeout)
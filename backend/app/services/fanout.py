@@ -0,0 +1,54 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Generic, Iterable, Optional, TypeVar
+
+from ..config import SSH_FANOUT_CONCURRENCY, SSH_FANOUT_NODE_TIMEOUT
+
+T = TypeVar("T")
+
+
+@dataclass
+class FanOutResult(Generic[T]):
+    item: T
+    value: Any = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def fan_out(items: Iterable[T], fn: Callable[[T], Awaitable[Any]], limit: int = SSH_FANOUT_CONCURRENCY,
+                  timeout: Optional[float] = SSH_FANOUT_NODE_TIMEOUT) -> AsyncIterator[FanOutResult[T]]:
+    """Run fn(item) for every item, at most limit at a time, yielding results as they finish.
+
+    timeout is a per-item deadline counted from when its call starts, not
+    from when it was queued; an item that misses it is cancelled and
+    reported with error "timeout". Exceptions become error strings, so one
+    bad node never fails the batch. If the consumer stops early, the calls
+    still running are cancelled.
+    """
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def _one(item: T) -> FanOutResult[T]:
+        async with sem:
+            started = time.perf_counter()
+            try:
+                value = await asyncio.wait_for(fn(item), timeout)
+                result = FanOutResult(item, value=value)
+            except asyncio.TimeoutError:
+                result = FanOutResult(item, error="timeout")
+            except Exception as e:
+                result = FanOutResult(item, error=str(e) or type(e).__name__)
+            result.elapsed_ms = round((time.perf_counter() - started) * 1000.0, 1)
+            return result
+
+    tasks = [asyncio.ensure_future(_one(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,546 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+import bisect
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ..config import now_bj, FAULT_RULES_FILE, FAULT_RULES_RELOAD_SECONDS, FAULT_STREAM_STALE_SECONDS
+
+
+FAULT_RULES: List[Dict[str, Any]] = [
+    {
+        "id": "hdfs_safemode",
+        "severity": "high",
+        "title": "NameNode 处于 SafeMode",
+        "patterns": [r"SafeModeException", r"NameNode is in safe mode", r"Safe mode is ON"],
+        "advice": "检查 DataNode 是否全部注册、磁盘与网络是否正常；必要时执行 hdfs dfsadmin -safemode leave。",
+    },
+    {
+        "id": "hdfs_standby",
+        "severity": "high",
+        "title": "访问到 Standby NameNode",
+        "patterns": [r"StandbyException", r"Operation category READ is not supported in state standby"],
+        "advice": "确认客户端的 fs.defaultFS/HA 配置；确认 active/standby 切换状态是否正确。",
+    },
+    {
+        "id": "rpc_connection_refused",
+        "severity": "high",
+        "title": "RPC 连接被拒绝或目标服务未启动",
+        "patterns": [r"java\.net\.ConnectException:\s*Connection refused", r"Call to .* failed on local exception", r"Connection refused"],
+        "advice": "确认对应守护进程是否存活、端口是否监听、iptables/安全组是否放通。",
+    },
+    {
+        "id": "dns_or_route",
+        "severity": "high",
+        "title": "DNS/网络不可达",
+        "patterns": [r"UnknownHostException", r"No route to host", r"Network is unreachable", r"Connection timed out"],
+        "advice": "检查 DNS 解析、/etc/hosts、一致的主机名配置与网络连通性。",
+    },
+    {
+        "id": "disk_no_space",
+        "severity": "high",
+        "title": "磁盘空间不足",
+        "patterns": [r"No space left on device", r"DiskOutOfSpaceException", r"ENOSPC"],
+        "advice": "清理磁盘、检查日志/临时目录增长；确认 DataNode 存储目录剩余空间。",
+    },
+    {
+        "id": "permission_denied",
+        "severity": "medium",
+        "title": "权限不足或 HDFS ACL/权限问题",
+        "patterns": [r"Permission denied", r"AccessControlException"],
+        "advice": "检查用户/组映射、HDFS 权限与 ACL；确认相关目录权限与 umask。",
+    },
+    {
+        "id": "kerberos_auth",
+        "severity": "high",
+        "title": "Kerberos 认证失败",
+        "patterns": [r"GSSException", r"Failed to find any Kerberos tgt", r"Client cannot authenticate via:\s*\[TOKEN, KERBEROS\]"],
+        "advice": "检查 KDC、keytab、principal、时间同步；确认客户端已 kinit 且票据未过期。",
+    },
+    {
+        "id": "oom",
+        "severity": "high",
+        "title": "Java 内存溢出",
+        "patterns": [r"OutOfMemoryError", r"Java heap space", r"GC overhead limit exceeded"],
+        "advice": "检查相关服务 JVM 参数（-Xmx/-Xms）、容器/节点内存；结合 GC 日志定位内存泄漏或峰值。",
+    },
+    {
+        "id": "jvm_exit_killed",
+        "severity": "medium",
+        "title": "进程异常退出或被杀",
+        "patterns": [r"ExitCodeException exitCode=143", r"Killed by signal", r"Container killed"],
+        "advice": "检查是否被资源管理器/系统 OOM killer 杀死；核对 YARN 队列资源与节点资源。",
+    },
+]
+
+
+_LITERAL_BREAK = set(".^$()[]{}|*+?")
+
+
+def required_literal(pattern: str, min_len: int = 4) -> Optional[str]:
+    """从正则中取出任何匹配都必然包含的最长字面子串（小写）；无法确定时返回 None。"""
+    runs: List[str] = []
+    cur: List[str] = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "\\":
+            nxt = pattern[i + 1] if i + 1 < n else ""
+            if nxt and not nxt.isalnum():
+                cur.append(nxt)
+            else:
+                runs.append("".join(cur))
+                cur = []
+            i += 2
+            continue
+        if c == "|":
+            return None
+        if c in "*?{":
+            # 前一个字符可以不出现
+            if cur:
+                cur.pop()
+            runs.append("".join(cur))
+            cur = []
+            if c == "{":
+                close = pattern.find("}", i)
+                i = close + 1 if close > 0 else n
+            else:
+                i += 1
+            continue
+        if c == "[":
+            runs.append("".join(cur))
+            cur = []
+            close = pattern.find("]", i + 2)
+            i = close + 1 if close > 0 else n
+            continue
+        if c == "(":
+            # 分组可能整体可选，跳过其中的内容
+            runs.append("".join(cur))
+            cur = []
+            depth = 0
+            while i < n:
+                if pattern[i] == "\\":
+                    i += 2
+                    continue
+                if pattern[i] == "(":
+                    depth += 1
+                elif pattern[i] == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            i += 1
+            continue
+        if c in _LITERAL_BREAK:
+            # "+" 之前的字符必然出现，但其后不再连续；其余元字符同样截断
+            runs.append("".join(cur))
+            cur = []
+            i += 1
+            continue
+        cur.append(c)
+        i += 1
+    runs.append("".join(cur))
+    best = max(runs, key=len) if runs else ""
+    return best.lower() if len(best) >= min_len else None
+
+
+class RuleStats:
+    """每条规则的命中行数、CPU 耗时与最近命中时间，跨规则重载保留。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.matched_lines: Dict[str, int] = {}
+        self.cpu_ns: Dict[str, int] = {}
+        self.last_hit: Dict[str, datetime] = {}
+
+    def merge(self, hits: Dict[str, int], cpu_ns: Dict[str, int]):
+        now = now_bj()
+        with self._lock:
+            for rid, ns in cpu_ns.items():
+                self.cpu_ns[rid] = self.cpu_ns.get(rid, 0) + ns
+            for rid, n in hits.items():
+                self.matched_lines[rid] = self.matched_lines.get(rid, 0) + n
+                self.last_hit[rid] = now
+
+    def snapshot(self, rule_id: str) -> Dict[str, Any]:
+        with self._lock:
+            last = self.last_hit.get(rule_id)
+            return {
+                "matchedLines": self.matched_lines.get(rule_id, 0),
+                "cpuMs": round(self.cpu_ns.get(rule_id, 0) / 1e6, 3),
+                "lastHit": last.isoformat() if last else None,
+            }
+
+
+class RuleMatcher:
+    """规则的编译形态，整段文本只扫描一遍。
+
+    每条规则的多个正则合并为一个交替式。所有能提取出必含字面量的规则先用
+    字面量在小写后的整段文本中定位候选行（str.find，相当于多模式预过滤），
+    只有候选行才执行正则；提取不出字面量的模式合并成一个兜底正则整段扫描。
+    传入 stats 时按规则累计命中行数与 CPU 耗时（字面量与兜底正则的耗时分摊
+    到对应规则）。
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], stats: Optional[RuleStats] = None):
+        self.rules = list(rules)
+        self.stats = stats
+        self._rule_res: List[Tuple[Dict[str, Any], "re.Pattern[str]"]] = []
+        owners: Dict[str, List[str]] = {}
+        fallback: List[str] = []
+        self._fallback_owners: List[str] = []
+        for rule in self.rules:
+            patterns = rule.get("patterns") or []
+            if not patterns:
+                continue
+            self._rule_res.append((rule, re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)))
+            for p in patterns:
+                lit = required_literal(p)
+                if lit:
+                    owners.setdefault(lit, []).append(rule["id"])
+                else:
+                    fallback.append(f"(?:{p})")
+                    self._fallback_owners.append(rule["id"])
+        self._literals: List[Tuple[str, List[str]]] = sorted(owners.items())
+        self._fallback = re.compile("|".join(fallback), re.IGNORECASE) if fallback else None
+
+    def match_line(self, line: str) -> List[Dict[str, Any]]:
+        """返回命中该行的规则列表。"""
+        low = line.lower()
+        if not any(lit in low for lit, _ in self._literals) and not (self._fallback and self._fallback.search(line)):
+            return []
+        return [rule for rule, rx in self._rule_res if rx.search(line)]
+
+    @staticmethod
+    def _charge(cpu: Dict[str, int], owners: List[str], ns: int):
+        share = ns // max(1, len(owners))
+        for rid in owners:
+            cpu[rid] = cpu.get(rid, 0) + share
+
+    def _candidate_starts(self, text: str, cpu: Dict[str, int]) -> List[int]:
+        low = text.lower()
+        if len(low) != len(text):
+            # 个别 Unicode 字符小写后长度变化，偏移不再对应，逐行处理
+            starts, pos = [], 0
+            for line in text.split("\n"):
+                if self.match_line(line):
+                    starts.append(pos)
+                pos += len(line) + 1
+            return starts
+        starts = set()
+        for lit, owners in self._literals:
+            t0 = time.thread_time_ns()
+            pos = low.find(lit)
+            while pos >= 0:
+                line_start = text.rfind("\n", 0, pos) + 1
+                starts.add(line_start)
+                line_end = text.find("\n", pos)
+                if line_end < 0:
+                    break
+                pos = low.find(lit, line_end)
+            self._charge(cpu, owners, time.thread_time_ns() - t0)
+        if self._fallback is not None:
+            t0 = time.thread_time_ns()
+            for m in self._fallback.finditer(text):
+                starts.add(text.rfind("\n", 0, m.start()) + 1)
+            self._charge(cpu, self._fallback_owners, time.thread_time_ns() - t0)
+        return sorted(starts)
+
+    def scan(self, text: str) -> Iterator[Tuple[int, int, str, List[Dict[str, Any]]]]:
+        """遍历命中规则的行，产出 (行号, 行起始偏移, 行内容, 命中规则)。"""
+        cpu: Dict[str, int] = {}
+        hits: Dict[str, int] = {}
+        try:
+            line_no = 1
+            prev = 0
+            for start in self._candidate_starts(text, cpu):
+                end = text.find("\n", start)
+                line = text[start:] if end < 0 else text[start:end]
+                rules = []
+                for rule, rx in self._rule_res:
+                    t0 = time.thread_time_ns()
+                    found = rx.search(line)
+                    cpu[rule["id"]] = cpu.get(rule["id"], 0) + time.thread_time_ns() - t0
+                    if found:
+                        rules.append(rule)
+                        hits[rule["id"]] = hits.get(rule["id"], 0) + 1
+                if not rules:
+                    continue
+                line_no += text.count("\n", prev, start)
+                prev = start
+                yield line_no, start, line, rules
+        finally:
+            if self.stats is not None:
+                self.stats.merge(hits, cpu)
+
+
+def validate_rules(rules: Any) -> List[Dict[str, Any]]:
+    """校验规则目录中的规则列表，返回启用的规则；不合法时抛出 ValueError。"""
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("rules must be a non-empty list")
+    seen = set()
+    out: List[Dict[str, Any]] = []
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise ValueError(f"rule #{i} is not a mapping")
+        rid = rule.get("id")
+        if not isinstance(rid, str) or not rid:
+            raise ValueError(f"rule #{i} has no id")
+        if rid in seen:
+            raise ValueError(f"duplicate rule id: {rid}")
+        seen.add(rid)
+        patterns = rule.get("patterns")
+        if not isinstance(patterns, list) or not patterns or not all(isinstance(p, str) and p for p in patterns):
+            raise ValueError(f"rule {rid}: patterns must be a non-empty list of strings")
+        for p in patterns:
+            try:
+                re.compile(p, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"rule {rid}: bad pattern {p!r}: {e}")
+        if rule.get("enabled", True):
+            out.append({
+                "id": rid,
+                "severity": str(rule.get("severity") or "medium"),
+                "title": str(rule.get("title") or rid),
+                "patterns": list(patterns),
+                "advice": str(rule.get("advice") or ""),
+            })
+    return out
+
+
+class RuleCatalog:
+    """可热加载的故障规则目录。
+
+    path 为空时使用内置的 FAULT_RULES；否则从 YAML 文件加载（顶层 version 与
+    rules 列表），每隔 check_interval 秒检查一次文件修改时间，变化后重新编译
+    并整体替换匹配器，采集任务无需重启。新目录不合法时保留旧规则并记录错误。
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 5.0):
+        self.path = path or None
+        self.check_interval = check_interval
+        self.stats = RuleStats()
+        self._lock = threading.Lock()
+        self._matcher = RuleMatcher(FAULT_RULES, self.stats)
+        self.version = "builtin"
+        self.source = "builtin"
+        self.loaded_at = now_bj()
+        self.last_error: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        if self.path:
+            self.reload()
+
+    def matcher(self) -> RuleMatcher:
+        if self.path and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._mtime:
+                self.reload()
+        return self._matcher
+
+    def rules(self) -> List[Dict[str, Any]]:
+        return self.matcher().rules
+
+    def reload(self) -> Dict[str, Any]:
+        """重新加载规则文件，成功时原子替换匹配器。"""
+        with self._lock:
+            try:
+                if not self.path:
+                    raise ValueError("FAULT_RULES_FILE is not configured")
+                import yaml
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                doc = yaml.safe_load(raw) or {}
+                rules = validate_rules(doc.get("rules") if isinstance(doc, dict) else doc)
+                version = str(doc.get("version")) if isinstance(doc, dict) and doc.get("version") is not None else hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+                self._matcher = RuleMatcher(rules, self.stats)
+                self.version = version
+                self.source = self.path
+                self.loaded_at = now_bj()
+                self.last_error = None
+                self._mtime = mtime
+                print(f"Loaded {len(rules)} fault rules (version {version}) from {self.path}")
+            except Exception as e:
+                self.last_error = str(e)
+                try:
+                    self._mtime = os.path.getmtime(self.path) if self.path else None
+                except OSError:
+                    pass
+                print(f"Error loading fault rules from {self.path}: {e}")
+            return self.describe()
+
+    def describe(self) -> Dict[str, Any]:
+        m = self._matcher
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loadedAt": self.loaded_at.isoformat(),
+            "lastError": self.last_error,
+            "rules": [
+                {
+                    "id": r["id"],
+                    "severity": r.get("severity"),
+                    "title": r.get("title"),
+                    "patterns": r.get("patterns"),
+                    "stats": self.stats.snapshot(r["id"]),
+                }
+                for r in m.rules
+            ],
+        }
+
+
+rule_catalog = RuleCatalog(FAULT_RULES_FILE, FAULT_RULES_RELOAD_SECONDS)
+
+
+def match_rules(line: str) -> List[Dict[str, Any]]:
+    """返回命中该行的规则列表。"""
+    return rule_catalog.matcher().match_line(line)
+
+
+def _rule_hit(rule: Dict[str, Any], examples: List[Dict[str, Any]], count: int) -> Dict[str, Any]:
+    return {
+        "id": rule.get("id"),
+        "severity": rule.get("severity"),
+        "title": rule.get("title"),
+        "advice": rule.get("advice"),
+        "examples": examples,
+        "matchCountApprox": count,
+    }
+
+
+def detect_faults_from_log_text(text: str, max_examples_per_rule: int = 3) -> List[Dict[str, Any]]:
+    """对一段日志文本做一次性规则匹配。"""
+    matcher = rule_catalog.matcher()
+    examples: Dict[str, List[Dict[str, Any]]] = {}
+    for line_no, _, line, rules in matcher.scan(text or ""):
+        for rule in rules:
+            ex = examples.setdefault(rule["id"], [])
+            if len(ex) < max_examples_per_rule:
+                ex.append({"lineNo": line_no, "line": line[:500]})
+    return [_rule_hit(r, examples[r["id"]], len(examples[r["id"]])) for r in matcher.rules if r["id"] in examples]
+
+
+class _RuleState:
+    __slots__ = ("total", "first_seen", "last_seen", "buckets", "examples")
+
+    def __init__(self, max_examples: int):
+        self.total = 0
+        self.first_seen: Optional[datetime] = None
+        self.last_seen: Optional[datetime] = None
+        self.buckets: Dict[int, int] = {}  # 分钟序号 -> 命中次数
+        self.examples: Deque[Dict[str, Any]] = deque(maxlen=max_examples)
+
+
+class FaultStreamDetector:
+    """在日志入库流上持续执行故障规则。
+
+    按 (集群, 节点, 组件, 规则) 维护累计命中数、按分钟的命中桶（保留
+    window_minutes）和最近的示例行，并按 (集群, 节点, 组件) 记录最近一次
+    收到日志的时间。detect_cluster_faults 只对近期确有日志流入的
+    (节点, 组件) 直接读取这里的结果，其余节点仍通过 SSH 读取日志尾部。采集线程写、接口线程
+    读，内部加锁。
+    """
+
+    def __init__(self, window_minutes: int = 24 * 60, max_examples: int = 3):
+        self.window_minutes = window_minutes
+        self.max_examples = max_examples
+        self._state: Dict[Tuple[str, str, str, str], _RuleState] = {}
+        self._fed: Dict[Tuple[str, str, str], datetime] = {}  # (集群, 节点, 组件) -> 最近一次收到日志的时间
+        self._lock = threading.Lock()
+
+    def observe(self, cluster_name: str, logs: Iterable[Dict[str, Any]]) -> int:
+        """匹配一批已入库的日志，返回命中次数。"""
+        now = now_bj()
+        hits = 0
+        logs = list(logs)
+        # 整批拼成一段文本扫描一次，再按偏移映射回所属日志
+        offsets: List[int] = []
+        pos = 0
+        for log in logs:
+            offsets.append(pos)
+            pos += len(log.get("message") or "") + 1
+        text = "\n".join(log.get("message") or "" for log in logs)
+        matched: List[Tuple[Dict[str, Any], Dict[str, Any], str]] = []
+        seen = set()
+        for _, start, line, rules in rule_catalog.matcher().scan(text):
+            idx = bisect.bisect_right(offsets, start) - 1
+            for rule in rules:
+                if (idx, rule["id"]) not in seen:
+                    seen.add((idx, rule["id"]))
+                    matched.append((rule, logs[idx], line))
+        fed = {(log.get("host") or "", (log.get("service") or "").lower()) for log in logs}
+        with self._lock:
+            for host, service in fed:
+                self._fed[(cluster_name, host, service)] = now
+            oldest = int(now.timestamp() // 60) - self.window_minutes
+            for rule, log, line in matched:
+                ts = log.get("timestamp") or now
+                key = (cluster_name, log.get("host") or "", log.get("service") or "", rule["id"])
+                st = self._state.get(key)
+                if st is None:
+                    st = self._state[key] = _RuleState(self.max_examples)
+                st.total += 1
+                st.first_seen = ts if st.first_seen is None else min(st.first_seen, ts)
+                st.last_seen = ts if st.last_seen is None else max(st.last_seen, ts)
+                minute = int(ts.timestamp() // 60)
+                if minute >= oldest:
+                    st.buckets[minute] = st.buckets.get(minute, 0) + 1
+                if len(st.buckets) > self.window_minutes:
+                    for m in [m for m in st.buckets if m < oldest]:
+                        del st.buckets[m]
+                st.examples.append({"time": ts.isoformat(), "line": line[:500]})
+                hits += 1
+        return hits
+
+    def covered(self, cluster_name: str, components: List[str], node: Optional[str] = None,
+                stale_seconds: int = FAULT_STREAM_STALE_SECONDS) -> Set[Tuple[str, str]]:
+        """返回最近 stale_seconds 秒内有日志流入的 (节点, 组件)（指定 node 时只看该节点）。
+
+        只有这些节点上的组件可以用 summary 的结果代表“无故障”；同一组件在
+        其他节点上未被采集、采集已停止或近期没有新日志时不在其中，需要走
+        SSH 读取。
+        """
+        since = now_bj() - timedelta(seconds=stale_seconds)
+        comps = {c.lower() for c in components}
+        with self._lock:
+            return {
+                (host, service) for (cl, host, service), at in self._fed.items()
+                if cl == cluster_name and (not node or host == node) and service in comps and at >= since
+            }
+
+    def summary(self, cluster_name: str, components: Optional[List[str]] = None, node: Optional[str] = None, since_minutes: int = 180) -> List[Dict[str, Any]]:
+        """按规则汇总最近 since_minutes 分钟的命中（每个节点/组件一条）。"""
+        since = int(now_bj().timestamp() // 60) - since_minutes
+        comps = {c.lower() for c in components} if components else None
+        rules = {r["id"]: r for r in rule_catalog.rules()}
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            for (cl, host, service, rule_id), st in self._state.items():
+                if cl != cluster_name or (node and host != node) or (comps and service.lower() not in comps):
+                    continue
+                count = sum(n for m, n in st.buckets.items() if m >= since)
+                if not count or rule_id not in rules:
+                    continue
+                hit = _rule_hit(rules[rule_id], list(st.examples), count)
+                hit.update({
+                    "component": service,
+                    "node": host,
+                    "totalSinceStart": st.total,
+                    "firstSeen": st.first_seen.isoformat() if st.first_seen else None,
+                    "lastSeen": st.last_seen.isoformat() if st.last_seen else None,
+                })
+                out.append(hit)
+        return out
+
+
+fault_detector = FaultStreamDetector()
@@ -0,0 +1,179 @@
+import datetime
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import APP_TIMEZONE, BJ_TZ, LOG_RETENTION_DAYS, LOG_RETENTION_ACTION, LOG_PARTITION_PREMAKE_DAYS
+from ..log_ingest import HADOOP_LOG_COLUMNS
+
+PARTITION_PREFIX = "hadoop_logs_p"
+DEFAULT_PARTITION = "hadoop_logs_default"
+_PARTITION_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{8}})$")
+
+
+def partition_name(day: datetime.date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> Optional[datetime.date]:
+    m = _PARTITION_RE.match(name)
+    if not m:
+        return None
+    return datetime.datetime.strptime(m.group(1), "%Y%m%d").date()
+
+
+def partition_bounds(day: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    """[start, end) of one daily partition, midnight to midnight in the app timezone"""
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=BJ_TZ)
+    end = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min, tzinfo=BJ_TZ)
+    return start, end
+
+
+def retention_cutoff(today: datetime.date, retention_days: int) -> Optional[datetime.date]:
+    """Oldest day still kept; None when retention_days <= 0 keeps everything"""
+    if retention_days <= 0:
+        return None
+    return today - datetime.timedelta(days=retention_days)
+
+
+def default_days_to_rehome(days: List[datetime.date], today: datetime.date, retention_days: int, days_ahead: int) -> List[datetime.date]:
+    """Days found in the default partition that should get their own partition
+
+    Expired days are left for apply_retention to delete; days beyond the
+    pre-create window (bogus future timestamps) wait until they come into it.
+    """
+    cutoff = retention_cutoff(today, retention_days)
+    last = today + datetime.timedelta(days=max(0, days_ahead))
+    return sorted(d for d in set(days) if (cutoff is None or d >= cutoff) and d <= last)
+
+
+def expired_partitions(names: List[str], today: datetime.date, retention_days: int) -> List[str]:
+    """Daily partitions lying entirely before the retention window; retention_days <= 0 keeps everything"""
+    cutoff = retention_cutoff(today, retention_days)
+    if cutoff is None:
+        return []
+    out = []
+    for name in names:
+        day = partition_day(name)
+        if day is not None and day < cutoff:
+            out.append(name)
+    return sorted(out)
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    res = await db.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'hadoop_logs' LIMIT 1
+    """))
+    return res.first() is not None
+
+
+async def list_partitions(db: AsyncSession) -> List[str]:
+    res = await db.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'hadoop_logs'
+        ORDER BY c.relname
+    """))
+    return [r[0] for r in res.all()]
+
+
+async def create_partition(db: AsyncSession, day: datetime.date) -> str:
+    name = partition_name(day)
+    start, end = partition_bounds(day)
+    await db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF hadoop_logs "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return name
+
+
+async def default_partition_days(db: AsyncSession) -> List[datetime.date]:
+    """Days (in the app timezone) that have rows in the default partition"""
+    res = await db.execute(
+        text(f"SELECT DISTINCT (log_time AT TIME ZONE :tz)::date FROM {DEFAULT_PARTITION}"), {"tz": APP_TIMEZONE}
+    )
+    return [r[0] for r in res.all()]
+
+
+async def rehome_default_rows(db: AsyncSession, day: datetime.date) -> str:
+    """Create day's partition when the default partition already holds rows for it
+
+    CREATE ... PARTITION OF would fail on those rows, so they are moved into
+    a standalone table that is then attached as the day's partition.
+    """
+    name = partition_name(day)
+    start, end = partition_bounds(day)
+    columns = ", ".join(("log_id",) + HADOOP_LOG_COLUMNS)
+    await db.execute(text(f"CREATE TABLE {name} (LIKE hadoop_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    await db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE log_time >= :s AND log_time < :e RETURNING {columns}
+        )
+        INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+    """), {"s": start, "e": end})
+    await db.execute(text(
+        f"ALTER TABLE hadoop_logs ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return name
+
+
+async def ensure_partitions(db: AsyncSession, days_ahead: int = LOG_PARTITION_PREMAKE_DAYS, today: Optional[datetime.date] = None,
+                            retention_days: int = LOG_RETENTION_DAYS) -> List[str]:
+    """Create the partitions for yesterday, today and the next days_ahead days
+
+    Days that already have rows in the default partition (late or
+    out-of-range timestamps) get their partition too, with those rows moved
+    into it.
+    """
+    today = today or datetime.datetime.now(BJ_TZ).date()
+    existing = set(await list_partitions(db))
+    late = set(default_days_to_rehome(await default_partition_days(db), today, retention_days, days_ahead))
+    wanted = {today + datetime.timedelta(days=i) for i in range(-1, max(0, days_ahead) + 1)}
+    created = []
+    for day in sorted(wanted | late):
+        if partition_name(day) in existing:
+            continue
+        try:
+            async with db.begin_nested():
+                if day in late:
+                    created.append(await rehome_default_rows(db, day))
+                else:
+                    created.append(await create_partition(db, day))
+        except Exception as e:
+            # rows for that day reached the default partition meanwhile; moved on the next run
+            print(f"Error creating log partition for {day}: {e}")
+    await db.commit()
+    return created
+
+
+async def apply_retention(db: AsyncSession, retention_days: int = LOG_RETENTION_DAYS, action: str = LOG_RETENTION_ACTION, today: Optional[datetime.date] = None) -> List[str]:
+    """Drop (or detach) daily partitions older than the retention window
+
+    Expired rows in the default partition are deleted whatever the action,
+    since they cannot be detached on their own.
+    """
+    today = today or datetime.datetime.now(BJ_TZ).date()
+    expired = expired_partitions(await list_partitions(db), today, retention_days)
+    for name in expired:
+        if action == "detach":
+            await db.execute(text(f"ALTER TABLE hadoop_logs DETACH PARTITION {name}"))
+        else:
+            await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    cutoff = retention_cutoff(today, retention_days)
+    if cutoff is not None:
+        await db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE log_time < :c"), {"c": partition_bounds(cutoff)[0]})
+    await db.commit()
+    return expired
+
+
+async def maintain_log_partitions(db: AsyncSession) -> dict:
+    """Pre-create upcoming partitions and enforce retention; no-op while hadoop_logs is a plain table"""
+    if not await is_partitioned(db):
+        return {"partitioned": False, "created": [], "expired": []}
+    created = await ensure_partitions(db)
+    expired = await apply_retention(db)
+    return {"partitioned": True, "created": created, "expired": expired}
@@ -0,0 +1,169 @@
+import base64
+import datetime
+import json
+import shlex
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import LOG_READ_DEFAULT_BYTES, LOG_READ_MAX_BYTES, LOG_READ_SCAN_BYTES, SSH_EXEC_TIMEOUT
+
+# Line filter run next to the file. It reads a byte window, drops the first
+# `skip` records (the tail of a line cut by the window start, or the lines
+# before a requested line number), keeps the lines matching RF_PAT and the
+# RF_SINCE/RF_UNTIL window (continuation lines inherit the timestamp of the
+# line they follow) and stops before output would pass maxb bytes or maxl
+# lines. Unless the window ends at EOF or on a line boundary (eof=1), its
+# last record is incomplete and left for the next read, except when it is
+# the only one: a line longer than the window is then cut. The trailer reports
+# bytes consumed, bytes skipped, lines printed and whether `until` was passed.
+SCAN_AWK = r"""
+function take(l,  keep, len) {
+  len = length(l) + 1
+  if (skip > 0) { skip--; skipped += len; n += len; return }
+  if (l ~ /^[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]/) ts = substr(l, 1, 19)
+  if (until != "" && ts != "" && ts > until) { done = 1; finished = 1; return }
+  keep = (since == "" || (ts != "" && ts >= since)) && (pat == "" || l ~ pat)
+  if (keep && got > 0 && (out + len > maxb || (maxl > 0 && got >= maxl))) { done = 1; return }
+  n += len
+  if (keep) {
+    if (len > maxb) l = substr(l, 1, maxb - 1)
+    print l; out += length(l) + 1; got++
+  }
+}
+BEGIN { pat = ENVIRON["RF_PAT"]; since = ENVIRON["RF_SINCE"]; until = ENVIRON["RF_UNTIL"]; ts = "" }
+NR > 1 { take(prev); if (done) exit }
+{ prev = $0 }
+END { if (!done && NR > 0 && (eof || n == skipped)) take(prev); printf "@@ %d %d %d %d\n", n, skipped, got, finished }
+"""
+
+
+def log_time_key(value: Optional[str]) -> str:
+    """Normalize a time bound to the `YYYY-MM-DD HH:MM:SS` prefix of Hadoop log lines; raises ValueError"""
+    if not value:
+        return ""
+    return datetime.datetime.fromisoformat(value.strip().replace("T", " ")).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def encode_token(state: Dict[str, Any]) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Inverse of encode_token; raises ValueError for anything malformed"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(state, dict) or not isinstance(state.get("p"), str) or not isinstance(state.get("o"), int):
+            raise ValueError(token)
+        return state
+    except Exception as e:
+        raise ValueError(f"invalid token: {token}") from e
+
+
+class LogRotatedError(Exception):
+    """The file behind a continuation token was replaced (rotated or truncated)"""
+
+
+def build_scan_command(path: str, start: int, window: Optional[int], skip: int, eof: bool, max_bytes: int,
+                       max_lines: int = 0, pattern: str = "", since: str = "", until: str = "") -> str:
+    """Shell pipeline that feeds window bytes of path from start (to EOF if None) through SCAN_AWK"""
+    path_q = shlex.quote(path)
+    source = f"tail -c +{start + 1} {path_q} 2>/dev/null" if start else f"cat {path_q} 2>/dev/null"
+    if window is not None:
+        source += f" | head -c {window}"
+    env = f"RF_PAT={shlex.quote(pattern)} RF_SINCE={shlex.quote(since)} RF_UNTIL={shlex.quote(until)} LC_ALL=C"
+    args = f"-v eof={int(eof)} -v skip={int(skip)} -v maxb={int(max_bytes)} -v maxl={int(max_lines)}"
+    return f"{source} | {env} awk {args} {shlex.quote(SCAN_AWK)}"
+
+
+def parse_scan_output(raw: bytes) -> Tuple[bytes, int, int, int, bool]:
+    """Split SCAN_AWK output into (content, consumed, skipped, lines, finished)"""
+    body, _, trailer = raw.rstrip(b"\n").rpartition(b"\n")
+    if not trailer.startswith(b"@@ "):
+        raise ValueError("truncated scan output")
+    consumed, skipped, lines, finished = (int(x) for x in trailer.split()[1:5])
+    return (body + b"\n" if body else b""), consumed, skipped, lines, bool(finished)
+
+
+async def stat_file(ssh_client, path: str, timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> Tuple[int, int]:
+    """(size, inode) of a remote file; FileNotFoundError if it does not exist"""
+    _, out, _ = await ssh_client.aexecute(f"stat -L -c '%s %i' {shlex.quote(path)} 2>/dev/null", timeout)
+    parts = out.split()
+    if len(parts) != 2 or not all(p.isdigit() for p in parts):
+        raise FileNotFoundError(path)
+    return int(parts[0]), int(parts[1])
+
+
+async def read_log_range(ssh_client, path: str, *, offset: int = 0, before: Optional[int] = None, line: Optional[int] = None,
+                         tail: bool = False, length: int = LOG_READ_DEFAULT_BYTES, max_lines: int = 0, pattern: str = "", since: str = "",
+                         until: str = "", inode: Optional[int] = None, scan_bytes: int = LOG_READ_SCAN_BYTES,
+                         timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> Dict[str, Any]:
+    """Read whole lines of a remote log, returning at most length bytes of them.
+
+    Exactly one of the starting points applies: line (1-based line number),
+    tail (the last lines of the file), before (the lines ending at that
+    byte offset, i.e. the page preceding it) or offset (the lines from that
+    byte offset).
+    Forward reads with a filter scan up to scan_bytes on the remote side
+    per call. The result carries next/prev continuation tokens that pin the
+    file's inode and the filters; LogRotatedError if inode no longer
+    matches.
+    """
+    size, current_inode = await stat_file(ssh_client, path, timeout)
+    if inode is not None and inode != current_inode:
+        raise LogRotatedError(path)
+    length = max(1, min(int(length), LOG_READ_MAX_BYTES))
+    filtered = bool(pattern or since or until)
+    if line is not None:
+        # line numbers need the prefix counted; it is skipped on the remote side
+        start, window, eof, skip = 0, None, True, max(0, int(line) - 1)
+    elif tail or before is not None:
+        end = size if tail else max(0, min(int(before), size))
+        start = max(0, end - length)
+        window, eof, skip = end - start, True, 0
+    else:
+        start = max(0, min(int(offset), size))
+        window = min(scan_bytes if filtered else length, size - start)
+        eof, skip = start + window >= size, 0
+    if start > 0:
+        # begin one byte early: the first record is then the remainder of the cut line (empty on a boundary)
+        start -= 1
+        window = window + 1 if window is not None else None
+        skip += 1
+    code, out, err = await ssh_client.aexecute(
+        build_scan_command(path, start, window, skip, eof, length, max_lines, pattern, since, until), timeout
+    )
+    if code != 0:
+        raise ValueError((err or out).decode(errors="replace").strip()[:200] or f"scan failed ({code})")
+    content, consumed, skipped, lines, finished = parse_scan_output(out)
+    # awk counts a newline after the window's unterminated last record too
+    fed = window if window is not None else size - start
+    consumed, skipped = min(consumed, fed), min(skipped, fed)
+    first = min(start + skipped, size)
+    next_offset = min(start + consumed, size)
+    if line is None and (tail or before is not None) and start > 0 and first >= start + window:
+        # the page held only the end of a line longer than length; step past it so paging backwards moves on
+        first = start + 1
+    filters = {"g": pattern, "s": since, "u": until}
+    return {
+        "path": path,
+        "size": size,
+        "inode": current_inode,
+        "offset": first,
+        "next_offset": next_offset,
+        "lines": lines,
+        "eof": next_offset >= size,
+        "content": content.decode("utf-8", errors="replace"),
+        "next_token": None if finished else encode_token({"p": path, "i": current_inode, "o": next_offset, "d": "f", **filters}),
+        "prev_token": encode_token({"p": path, "i": current_inode, "o": first, "d": "b", **filters}) if first > 0 else None,
+    }
+
+
+async def read_log_token(ssh_client, token: str, length: int = LOG_READ_DEFAULT_BYTES, max_lines: int = 0,
+                         timeout: Optional[float] = SSH_EXEC_TIMEOUT) -> Dict[str, Any]:
+    """Continue a read_log_range() from one of its tokens"""
+    state = decode_token(token)
+    where = {"before": state["o"]} if state.get("d") == "b" else {"offset": state["o"]}
+    return await read_log_range(
+        ssh_client, state["p"], length=length, max_lines=max_lines, pattern=state.get("g") or "",
+        since=state.get("s") or "", until=state.get("u") or "", inode=state.get("i"), timeout=timeout, **where,
+    )
@@ -0,0 +1,125 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+
+_schema_ready = False
+
+
+async def ensure_log_schema(db: AsyncSession, force: bool = False):
+    """Create the tables and columns the log pipeline relies on (idempotent, once per process).
+
+    Only cheap, metadata-level DDL; indexes on hadoop_logs are built by
+    create_log_indexes from app.scripts.backfill_log_columns.
+    """
+    global _schema_ready
+    if _schema_ready and not force:
+        return
+    await db.execute(text("""
+        CREATE TABLE IF NOT EXISTS hadoop_log_checkpoints (
+            node_host VARCHAR(100) NOT NULL,
+            file_path TEXT NOT NULL,
+            inode BIGINT NOT NULL,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (node_host, file_path, inode)
+        )
+    """))
+    for ddl in (
+        "ALTER TABLE hadoop_logs ADD COLUMN IF NOT EXISTS level VARCHAR(10)",
+        "ALTER TABLE hadoop_logs ADD COLUMN IF NOT EXISTS service VARCHAR(50)",
+        "ALTER TABLE hadoop_logs ADD COLUMN IF NOT EXISTS logger VARCHAR(255)",
+        "ALTER TABLE hadoop_logs ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(16)",
+        "ALTER TABLE hadoop_logs ADD COLUMN IF NOT EXISTS template_id VARCHAR(16)",
+        "ALTER TABLE hadoop_logs ADD COLUMN IF NOT EXISTS params TEXT[]",
+        """CREATE TABLE IF NOT EXISTS hadoop_log_templates (
+            cluster_name VARCHAR(255) NOT NULL,
+            template_id VARCHAR(16) NOT NULL,
+            service VARCHAR(50),
+            template TEXT NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            first_seen TIMESTAMPTZ NOT NULL,
+            last_seen TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (cluster_name, template_id)
+        )""",
+    ):
+        await db.execute(text(ddl))
+    await db.commit()
+    _schema_ready = True
+
+
+# (name, definition after `ON <table>`); built by create_log_indexes, never on the request path
+LOG_INDEXES = (
+    # /logs by cluster and by node/service, newest first
+    ("ix_hadoop_logs_cluster_time", "(cluster_name, log_time DESC)"),
+    ("ix_hadoop_logs_node_service_time", "(node_host, service, log_time DESC)"),
+    ("ix_hadoop_logs_level_time", "(level, log_time DESC)"),
+    # /faults only ever reads title = 'fault' rows
+    ("ix_hadoop_logs_fault_time", "(cluster_name, log_time DESC) WHERE title = 'fault'"),
+    # full-text search on the message text (app/services/log_search.py)
+    ("ix_hadoop_logs_info_fts", "USING GIN (to_tsvector('simple', coalesce(info, '')))"),
+    # substring / class-name search; needs the pg_trgm extension
+    ("ix_hadoop_logs_info_trgm", "USING GIN (info gin_trgm_ops)"),
+)
+
+
+async def _build_index(conn: AsyncConnection, name: str, table: str, definition: str):
+    """CREATE INDEX CONCURRENTLY, first dropping an invalid leftover of an interrupted build"""
+    valid = (await conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :n"
+    ), {"n": name})).scalar()
+    if valid:
+        return
+    if valid is not None:
+        await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+    await conn.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON {table} {definition}'))
+
+
+async def create_log_indexes(engine: AsyncEngine):
+    """Build the hadoop_logs indexes without blocking writers.
+
+    Uses CREATE INDEX CONCURRENTLY on an autocommit connection, so it must
+    not run inside a transaction; meant for app/scripts, not request
+    handlers. On a partitioned hadoop_logs each index is created ON ONLY
+    the parent, built concurrently on every partition and attached; day
+    partitions created later inherit it.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            trgm = True
+        except Exception as e:
+            print(f"pg_trgm unavailable, class-name search will not be indexed: {e}")
+            trgm = False
+        partitions = [r[0] for r in (await conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'hadoop_logs'
+            ORDER BY c.relname
+        """))).all()]
+        partitioned = (await conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'hadoop_logs'"
+        ))).first() is not None
+        for name, definition in LOG_INDEXES:
+            if "gin_trgm_ops" in definition and not trgm:
+                continue
+            if not partitioned:
+                await _build_index(conn, name, "hadoop_logs", definition)
+                print(f"{name}: ready")
+                continue
+            await conn.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON ONLY hadoop_logs {definition}'))
+            for part in partitions:
+                attached = (await conn.execute(text("""
+                    SELECT 1 FROM pg_inherits i
+                    JOIN pg_index x ON x.indexrelid = i.inhrelid
+                    JOIN pg_class t ON t.oid = x.indrelid
+                    JOIN pg_class p ON p.oid = i.inhparent
+                    WHERE p.relname = :p AND t.relname = :t
+                """), {"p": name, "t": part})).first()
+                if attached:
+                    continue
+                part_index = f"{part}_{name[len('ix_hadoop_logs_'):]}"
+                await _build_index(conn, part_index, part, definition)
+                await conn.execute(text(f'ALTER INDEX "{name}" ATTACH PARTITION "{part_index}"'))
+            print(f"{name}: ready on {len(partitions)} partitions")
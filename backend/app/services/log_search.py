@@ -0,0 +1,109 @@
+import re
+from dataclasses import dataclass, field
+from typing import List
+from sqlalchemy import and_, func, literal_column, or_
+from ..models.hadoop_logs import HadoopLog
+
+# Must match the expression of ix_hadoop_logs_info_fts exactly, or the GIN index is not used
+TSVECTOR_SQL = "to_tsvector('simple', coalesce(hadoop_logs.info, ''))"
+INFO_TSVECTOR = literal_column(TSVECTOR_SQL)
+_SIMPLE = literal_column("'simple'")
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r"[\w]+", re.UNICODE)
+# Postgres' parser splits on these or keeps them inside one host/version/path lexeme, so such
+# tokens are never split on the Python side: whole ones go to phraseto_tsquery, prefixes to ILIKE
+_SEPARATOR_RE = re.compile(r"[_./:]")
+# java.io.IOException, NullPointerException, org.apache.hadoop.ipc.RemoteException$Foo
+_CLASS_RE = re.compile(r"^(?:[A-Za-z_$][\w$]*\.)+[A-Za-z_$][\w$]*$|^[A-Z][\w$]*(?:Exception|Error|Throwable)$")
+
+
+@dataclass
+class LogSearchQuery:
+    """A parsed search string.
+
+    Syntax: plain words must all appear, "quoted words" must appear as a
+    phrase, word* matches a prefix, and dotted or *Exception/*Error tokens
+    are matched as class names anywhere in the text. Words and phrases are
+    tokenized by Postgres itself (phraseto_tsquery), so block ids such as
+    blk_1073741825_1001 and addresses such as 10.0.0.1 match exactly what
+    to_tsvector indexed.
+    """
+    terms: List[str] = field(default_factory=list)
+    prefixes: List[str] = field(default_factory=list)
+    phrases: List[str] = field(default_factory=list)
+    classes: List[str] = field(default_factory=list)
+    substrings: List[str] = field(default_factory=list)
+
+    def tsquery(self):
+        """The full-text part as one tsquery expression, or None"""
+        parts = []
+        if self.prefixes:
+            parts.append(func.to_tsquery(_SIMPLE, " & ".join(f"{w}:*" for w in self.prefixes)))
+        parts += [func.phraseto_tsquery(_SIMPLE, t) for t in self.terms + self.phrases]
+        if not parts:
+            return None
+        query = parts[0]
+        for part in parts[1:]:
+            query = query.op("&&")(part)
+        return query
+
+    def is_empty(self) -> bool:
+        return not (self.terms or self.prefixes or self.phrases or self.classes or self.substrings)
+
+
+def parse_search_query(q: str) -> LogSearchQuery:
+    parsed = LogSearchQuery()
+    for phrase, token in _TOKEN_RE.findall(q or ""):
+        if phrase:
+            if _WORD_RE.search(phrase):
+                parsed.phrases.append(phrase.lower())
+            continue
+        if _CLASS_RE.match(token):
+            parsed.classes.append(token)
+            continue
+        if token.endswith("*"):
+            stem = token[:-1]
+            if _SEPARATOR_RE.search(stem):
+                parsed.substrings.append(stem)
+                continue
+            words = _WORD_RE.findall(stem)
+            if words:
+                parsed.terms.extend(w.lower() for w in words[:-1])
+                parsed.prefixes.append(words[-1].lower())
+            continue
+        if _WORD_RE.search(token):
+            parsed.terms.append(token.lower())
+    return parsed
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(parsed: LogSearchQuery):
+    """WHERE clause for a parsed query: GIN full-text match plus trigram ILIKE for class names and substrings"""
+    conds = []
+    tsq = parsed.tsquery()
+    if tsq is not None:
+        conds.append(INFO_TSVECTOR.op("@@")(tsq))
+    for value in parsed.classes + parsed.substrings:
+        conds.append(HadoopLog.info.ilike(f"%{_escape_like(value)}%", escape="\\"))
+    return and_(*conds) if conds else None
+
+
+def search_rank(parsed: LogSearchQuery):
+    """ts_rank_cd of the full-text part, or None when the query has no full-text part"""
+    tsq = parsed.tsquery()
+    if tsq is None:
+        return None
+    return func.ts_rank_cd(INFO_TSVECTOR, tsq)
+
+
+def source_condition(source: str):
+    """/logs `source` filter: text search on info, or a substring of the service / node name"""
+    parsed = parse_search_query(source)
+    cond = search_condition(parsed)
+    like = f"%{_escape_like(source)}%"
+    alts = [HadoopLog.service.ilike(like, escape="\\"), HadoopLog.title.ilike(like, escape="\\"), HadoopLog.node_host.ilike(like, escape="\\")]
+    return or_(cond, *alts) if cond is not None else or_(*alts)
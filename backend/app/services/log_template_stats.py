@@ -0,0 +1,40 @@
+import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import BJ_TZ
+from ..models.hadoop_logs import HadoopLog
+from ..models.hadoop_log_templates import HadoopLogTemplate
+
+
+async def top_templates(db: AsyncSession, cluster_name: Optional[str] = None, node: Optional[str] = None,
+                        minutes: int = 10, limit: int = 20, level: Optional[str] = None) -> List[Dict]:
+    """Most frequent log templates of the last `minutes`, newest partitions only"""
+    since = datetime.datetime.now(BJ_TZ) - datetime.timedelta(minutes=minutes)
+    n = func.count().label("n")
+    stmt = (
+        select(HadoopLog.cluster_name, HadoopLog.template_id, HadoopLogTemplate.template, HadoopLogTemplate.service, n, func.max(HadoopLog.log_time).label("last"))
+        .outerjoin(HadoopLogTemplate, and_(HadoopLogTemplate.cluster_name == HadoopLog.cluster_name, HadoopLogTemplate.template_id == HadoopLog.template_id))
+        .where(HadoopLog.log_time >= since, HadoopLog.template_id.is_not(None))
+        .group_by(HadoopLog.cluster_name, HadoopLog.template_id, HadoopLogTemplate.template, HadoopLogTemplate.service)
+        .order_by(n.desc())
+        .limit(limit)
+    )
+    if cluster_name:
+        stmt = stmt.where(HadoopLog.cluster_name == cluster_name)
+    if node:
+        stmt = stmt.where(HadoopLog.node_host == node)
+    if level:
+        stmt = stmt.where(HadoopLog.level == level.upper())
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            "cluster": r.cluster_name,
+            "template_id": r.template_id,
+            "template": r.template,
+            "service": r.service,
+            "count": int(r.n),
+            "last_seen": r.last.isoformat() if r.last else None,
+        }
+        for r in rows
+    ]
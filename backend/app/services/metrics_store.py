@@ -0,0 +1,380 @@
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import BJ_TZ, METRICS_RAW_TTL_HOURS, METRICS_1M_TTL_DAYS, METRICS_1H_TTL_DAYS
+
+# Bucket widths (seconds) a trend query may be rounded to
+BUCKET_STEPS = (5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+DEFAULT_TREND_POINTS = 120
+STATS = ("avg", "min", "max", "p95")
+STAT_PATTERN = "^(avg|min|max|p95)$"
+# Rollups are computed in chunks of this many seconds so a first run over a long backlog stays bounded
+ROLLUP_CHUNK_SECONDS = 6 * 3600
+
+
+@dataclass(frozen=True)
+class MetricTier:
+    name: str
+    table: str
+    width: int  # bucket width in seconds, 0 for raw samples
+    ttl: datetime.timedelta
+    source: Optional[str] = None  # tier this one is rolled up from
+
+
+def metric_tiers() -> Tuple[MetricTier, ...]:
+    """raw -> 1m -> 1h, finest first"""
+    return (
+        MetricTier("raw", "node_metrics", 0, datetime.timedelta(hours=METRICS_RAW_TTL_HOURS)),
+        MetricTier("1m", "node_metrics_1m", 60, datetime.timedelta(days=METRICS_1M_TTL_DAYS), "raw"),
+        MetricTier("1h", "node_metrics_1h", 3600, datetime.timedelta(days=METRICS_1H_TTL_DAYS), "1m"),
+    )
+
+_schema_ready = False
+
+_ROLLUP_TABLE_DDL = """CREATE TABLE IF NOT EXISTS {table} (
+    cluster_id INTEGER NOT NULL,
+    hostname VARCHAR(100) NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    node_id INTEGER,
+    samples INTEGER NOT NULL,
+    cpu_min DOUBLE PRECISION, cpu_avg DOUBLE PRECISION, cpu_max DOUBLE PRECISION, cpu_p95 DOUBLE PRECISION,
+    mem_min DOUBLE PRECISION, mem_avg DOUBLE PRECISION, mem_max DOUBLE PRECISION, mem_p95 DOUBLE PRECISION,
+    PRIMARY KEY (cluster_id, hostname, bucket)
+)"""
+
+
+async def ensure_metrics_schema(db: AsyncSession, force: bool = False):
+    """Create node_metrics / cluster_metrics and their time indexes (idempotent, once per process)."""
+    global _schema_ready
+    if _schema_ready and not force:
+        return
+    await db.execute(text("""
+        CREATE TABLE IF NOT EXISTS node_metrics (
+            id SERIAL PRIMARY KEY,
+            cluster_id INTEGER,
+            node_id INTEGER,
+            hostname VARCHAR(100),
+            cpu_usage DOUBLE PRECISION,
+            memory_usage DOUBLE PRECISION,
+            created_at TIMESTAMPTZ
+        )
+    """))
+    await db.execute(text("""
+        CREATE TABLE IF NOT EXISTS cluster_metrics (
+            id SERIAL PRIMARY KEY,
+            cluster_id INTEGER,
+            cluster_name VARCHAR(100),
+            cpu_avg DOUBLE PRECISION,
+            memory_avg DOUBLE PRECISION,
+            created_at TIMESTAMPTZ
+        )
+    """))
+    for ddl in (
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS node_id INTEGER",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS hostname VARCHAR(100)",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS cpu_usage DOUBLE PRECISION",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS memory_usage DOUBLE PRECISION",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS cluster_id INTEGER",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS disk_usage DOUBLE PRECISION",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS load1 DOUBLE PRECISION",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS net_rx_bps DOUBLE PRECISION",
+        "ALTER TABLE node_metrics ADD COLUMN IF NOT EXISTS net_tx_bps DOUBLE PRECISION",
+        "ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS cluster_name VARCHAR(100)",
+        "ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS cpu_avg DOUBLE PRECISION",
+        "ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS memory_avg DOUBLE PRECISION",
+        "ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ",
+        "ALTER TABLE cluster_metrics ADD COLUMN IF NOT EXISTS cluster_id INTEGER",
+        # trend queries: one cluster / one node over a time range
+        "CREATE INDEX IF NOT EXISTS ix_node_metrics_cluster_host_time ON node_metrics (cluster_id, hostname, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_cluster_metrics_cluster_time ON cluster_metrics (cluster_id, created_at)",
+        # rollup scans and TTL deletes by time alone
+        "CREATE INDEX IF NOT EXISTS ix_node_metrics_time ON node_metrics (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_cluster_metrics_time ON cluster_metrics (created_at)",
+        *(_ROLLUP_TABLE_DDL.format(table=t) for t in ("node_metrics_1m", "node_metrics_1h")),
+        *(f"CREATE INDEX IF NOT EXISTS ix_{t}_bucket ON {t} (bucket)" for t in ("node_metrics_1m", "node_metrics_1h")),
+        """CREATE TABLE IF NOT EXISTS metrics_rollup_state (
+            tier VARCHAR(10) PRIMARY KEY,
+            rolled_until TIMESTAMPTZ NOT NULL
+        )""",
+    ):
+        await db.execute(text(ddl))
+    await db.commit()
+    _schema_ready = True
+
+
+def cluster_rollup(samples: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One cluster_metrics row per cluster: the average over each node's latest sample in the batch"""
+    latest: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for s in samples:
+        key = (s["cluster_id"], s["node_id"])
+        cur = latest.get(key)
+        if cur is None or s["ts"] >= cur["ts"]:
+            latest[key] = s
+    per_cluster: Dict[int, List[Dict[str, Any]]] = {}
+    for (cid, _), s in latest.items():
+        per_cluster.setdefault(cid, []).append(s)
+    rows = []
+    for cid, items in per_cluster.items():
+        rows.append({
+            "cid": cid,
+            "cpu": round(sum(s["cpu"] for s in items) / len(items), 2),
+            "mem": round(sum(s["mem"] for s in items) / len(items), 2),
+            "ts": max(s["ts"] for s in items),
+        })
+    return rows
+
+
+def values_clause(rows: Sequence[Dict[str, Any]], columns: Sequence[Tuple[str, str]]) -> Tuple[str, Dict[str, Any]]:
+    """Multi-row VALUES list with one bind per cell: ("(CAST(:a_0 AS T), ...), (...)", params).
+
+    columns are (key, SQL type) pairs; every cell is cast so Postgres knows
+    the column types of the derived table even when a value is NULL.
+    """
+    parts = []
+    params: Dict[str, Any] = {}
+    for i, row in enumerate(rows):
+        cells = []
+        for key, sql_type in columns:
+            params[f"{key}_{i}"] = row.get(key)
+            cells.append(f"CAST(:{key}_{i} AS {sql_type})")
+        parts.append("(" + ", ".join(cells) + ")")
+    return ", ".join(parts), params
+
+
+_SAMPLE_COLUMNS = (
+    ("cid", "INTEGER"), ("nid", "INTEGER"), ("hn", "VARCHAR(100)"), ("cpu", "DOUBLE PRECISION"), ("mem", "DOUBLE PRECISION"),
+    ("disk", "DOUBLE PRECISION"), ("load1", "DOUBLE PRECISION"), ("rx", "DOUBLE PRECISION"), ("tx", "DOUBLE PRECISION"), ("ts", "TIMESTAMPTZ"),
+)
+_NODE_COLUMNS = (("nid", "INTEGER"), ("cpu", "DOUBLE PRECISION"), ("mem", "DOUBLE PRECISION"), ("disk", "DOUBLE PRECISION"), ("ts", "TIMESTAMPTZ"))
+_ROLLUP_COLUMNS = (("cid", "INTEGER"), ("cpu", "DOUBLE PRECISION"), ("mem", "DOUBLE PRECISION"), ("ts", "TIMESTAMPTZ"))
+
+
+async def write_samples(db: AsyncSession, samples: Sequence[Dict[str, Any]]):
+    """Append a batch of node samples, refresh nodes' current values and roll up cluster_metrics in one transaction.
+
+    Each sample is a dict with node_id, hostname, cluster_id, cpu, mem and ts,
+    plus optional disk, load1, net_rx_bps and net_tx_bps from the node probe.
+    A None cpu/mem/disk leaves the node's current value untouched. Every table
+    gets a single multi-row statement, whatever the number of nodes.
+    """
+    if not samples:
+        return
+    await ensure_metrics_schema(db)
+    rows = [{
+        "nid": s["node_id"], "hn": s["hostname"], "cid": s["cluster_id"], "cpu": s["cpu"], "mem": s["mem"], "ts": s["ts"],
+        "disk": s.get("disk"), "load1": s.get("load1"), "rx": s.get("net_rx_bps"), "tx": s.get("net_tx_bps"),
+    } for s in samples]
+    values, params = values_clause(rows, _SAMPLE_COLUMNS)
+    await db.execute(text(
+        "INSERT INTO node_metrics (cluster_id, node_id, hostname, cpu_usage, memory_usage, disk_usage, load1, net_rx_bps, net_tx_bps, created_at) "
+        f"VALUES {values}"
+    ), params)
+    latest: Dict[int, Dict[str, Any]] = {}
+    for r in rows:
+        if r["nid"] not in latest or r["ts"] >= latest[r["nid"]]["ts"]:
+            latest[r["nid"]] = r
+    values, params = values_clause(list(latest.values()), _NODE_COLUMNS)
+    await db.execute(text(f"""
+        UPDATE nodes AS n SET
+            cpu_usage = COALESCE(v.cpu, n.cpu_usage),
+            memory_usage = COALESCE(v.mem, n.memory_usage),
+            disk_usage = COALESCE(v.disk, n.disk_usage),
+            last_heartbeat = v.ts
+        FROM (VALUES {values}) AS v(nid, cpu, mem, disk, ts)
+        WHERE n.id = v.nid
+    """), params)
+    rollup = cluster_rollup([s for s in samples if s["cpu"] is not None and s["mem"] is not None])
+    if rollup:
+        values, params = values_clause(rollup, _ROLLUP_COLUMNS)
+        await db.execute(text(f"""
+            INSERT INTO cluster_metrics (cluster_id, cluster_name, cpu_avg, memory_avg, created_at)
+            SELECT c.id, c.name, v.cpu, v.mem, v.ts
+            FROM (VALUES {values}) AS v(cid, cpu, mem, ts)
+            JOIN clusters c ON c.id = v.cid
+        """), params)
+    await db.commit()
+
+
+def pick_bucket_seconds(start: datetime.datetime, end: datetime.datetime, max_points: int = DEFAULT_TREND_POINTS) -> int:
+    """Smallest bucket width from BUCKET_STEPS that keeps the range within max_points buckets"""
+    span = max(1.0, (end - start).total_seconds())
+    for step in BUCKET_STEPS:
+        if span / step <= max_points:
+            return step
+    return BUCKET_STEPS[-1]
+
+
+def bucket_floor(ts: datetime.datetime, step: int) -> datetime.datetime:
+    epoch = int(ts.timestamp())
+    return datetime.datetime.fromtimestamp(epoch - epoch % step, BJ_TZ)
+
+
+def fill_series(rows: Sequence[Tuple[datetime.datetime, Optional[float]]], start: datetime.datetime, end: datetime.datetime, step: int) -> Tuple[List[datetime.datetime], List[Optional[float]]]:
+    """Dense series from start to end in step-second buckets; buckets without samples are None"""
+    got = {int(ts.timestamp()): v for ts, v in rows}
+    times: List[datetime.datetime] = []
+    values: List[Optional[float]] = []
+    t = bucket_floor(start, step)
+    while t < end:
+        v = got.get(int(t.timestamp()))
+        times.append(t)
+        values.append(round(float(v), 2) if v is not None else None)
+        t += datetime.timedelta(seconds=step)
+    return times, values
+
+
+def format_times(times: Sequence[datetime.datetime], start: datetime.datetime, end: datetime.datetime) -> List[str]:
+    fmt = "%H:%M" if (end - start) <= datetime.timedelta(days=1) else "%m-%d %H:%M"
+    return [t.astimezone(BJ_TZ).strftime(fmt) for t in times]
+
+
+def pick_tier(step: int, start: datetime.datetime, now: datetime.datetime, tiers: Optional[Sequence[MetricTier]] = None) -> MetricTier:
+    """Coarsest tier whose buckets are no wider than step, among the tiers still holding data back to start.
+
+    When only coarser tiers reach back that far the finest of those is used
+    and the caller has to widen step to its bucket width.
+    """
+    tiers = tiers or metric_tiers()
+    covering = [t for t in tiers if now - t.ttl <= start] or [tiers[-1]]
+    fitting = [t for t in covering if t.width <= step]
+    return fitting[-1] if fitting else covering[0]
+
+
+def _bucket_sql(col: str, step: int) -> str:
+    return f"to_timestamp(floor(extract(epoch FROM {col}) / {int(step)}) * {int(step)})"
+
+
+def _stat_sql(tier: MetricTier, stat: str, metric: str = "cpu") -> str:
+    """Aggregate of one stat within an output bucket; rollup p95 over several buckets is the p95 of their p95s"""
+    if tier.width == 0:
+        col = f"{metric}_usage" if metric == "cpu" else "memory_usage"
+        return {
+            "avg": f"avg({col})",
+            "min": f"min({col})",
+            "max": f"max({col})",
+            "p95": f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {col})",
+        }[stat]
+    return {
+        "avg": f"sum({metric}_avg * samples) / nullif(sum(samples), 0)",
+        "min": f"min({metric}_min)",
+        "max": f"max({metric}_max)",
+        "p95": f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {metric}_p95)",
+    }[stat]
+
+
+async def cpu_series(db: AsyncSession, cluster_id: int, start: datetime.datetime, end: datetime.datetime, step: int, hostname: Optional[str] = None, stat: str = "avg") -> Tuple[List[datetime.datetime], List[Optional[float]], int, str]:
+    """CPU stat per bucket for a cluster or one of its nodes, read from the coarsest tier that fits step.
+
+    Returns (bucket times, values, effective step, tier name).
+    """
+    await ensure_metrics_schema(db)
+    tier = pick_tier(step, start, datetime.datetime.now(BJ_TZ))
+    if tier.width > step:
+        step = tier.width
+    if tier.width == 0 and not hostname:
+        # cluster-level raw series comes from the per-flush cluster averages
+        table, time_col, agg, extra = "cluster_metrics", "created_at", _stat_sql(tier, stat).replace("cpu_usage", "cpu_avg"), ""
+    else:
+        table = tier.table
+        time_col = "created_at" if tier.width == 0 else "bucket"
+        agg = _stat_sql(tier, stat)
+        extra = "AND hostname = :hn" if hostname else ""
+    res = await db.execute(text(f"""
+        SELECT {_bucket_sql(time_col, step)} AS b, {agg}
+        FROM {table}
+        WHERE cluster_id = :cid {extra} AND {time_col} >= :start AND {time_col} < :end
+        GROUP BY b ORDER BY b
+    """), {"cid": cluster_id, "start": bucket_floor(start, step), "end": end, **({"hn": hostname} if hostname else {})})
+    times, values = fill_series(res.all(), start, end, step)
+    return times, values, step, tier.name
+
+
+def _rollup_sql(tier: MetricTier, source: MetricTier) -> str:
+    src_time = "created_at" if source.width == 0 else "bucket"
+    count = "count(*)" if source.width == 0 else "sum(samples)"
+    aggs = ", ".join(_stat_sql(source, st, m) for m in ("cpu", "mem") for st in ("min", "avg", "max", "p95"))
+    cols = "cpu_min, cpu_avg, cpu_max, cpu_p95, mem_min, mem_avg, mem_max, mem_p95"
+    return f"""
+        INSERT INTO {tier.table} (cluster_id, hostname, bucket, node_id, samples, {cols})
+        SELECT cluster_id, hostname, {_bucket_sql(src_time, tier.width)} AS b, max(node_id), {count}, {aggs}
+        FROM {source.table}
+        WHERE cluster_id IS NOT NULL AND hostname IS NOT NULL AND {src_time} >= :since AND {src_time} < :until
+        GROUP BY cluster_id, hostname, b
+        ON CONFLICT (cluster_id, hostname, bucket) DO UPDATE SET
+            node_id = EXCLUDED.node_id, samples = EXCLUDED.samples,
+            {", ".join(f"{c} = EXCLUDED.{c}" for c in cols.split(", "))}
+    """
+
+
+async def rollup_tier(db: AsyncSession, tier: MetricTier, source: MetricTier, now: datetime.datetime) -> int:
+    """Recompute tier buckets from the last rolled-up bucket (it may have been partial) up to now.
+
+    Buckets are rebuilt from the source with an upsert, so samples arriving
+    late within the current bucket are picked up on the next run.
+    """
+    res = await db.execute(text("SELECT rolled_until FROM metrics_rollup_state WHERE tier = :t"), {"t": tier.name})
+    until_prev = res.scalar()
+    if until_prev is None:
+        time_col = "created_at" if source.width == 0 else "bucket"
+        res = await db.execute(text(f"SELECT min({time_col}) FROM {source.table}"))
+        until_prev = res.scalar() or now
+    since = bucket_floor(until_prev, tier.width)
+    chunks = 0
+    while since < now:
+        until = min(now, since + datetime.timedelta(seconds=ROLLUP_CHUNK_SECONDS))
+        await db.execute(text(_rollup_sql(tier, source)), {"since": since, "until": until})
+        await db.execute(text(
+            "INSERT INTO metrics_rollup_state (tier, rolled_until) VALUES (:t, :u) "
+            "ON CONFLICT (tier) DO UPDATE SET rolled_until = EXCLUDED.rolled_until"
+        ), {"t": tier.name, "u": until})
+        await db.commit()
+        since = until
+        chunks += 1
+    return chunks
+
+
+def expiry_cutoffs(tiers: Sequence[MetricTier], watermarks: Dict[str, datetime.datetime], now: datetime.datetime) -> Dict[str, datetime.datetime]:
+    """Per tier, the time before which rows can be deleted: past its TTL and already rolled into the next tier"""
+    out = {}
+    for i, tier in enumerate(tiers):
+        cutoff = now - tier.ttl
+        if i + 1 < len(tiers):
+            rolled = watermarks.get(tiers[i + 1].name)
+            if rolled is None:
+                continue
+            cutoff = min(cutoff, bucket_floor(rolled, tiers[i + 1].width))
+        out[tier.name] = cutoff
+    return out
+
+
+async def expire_metrics(db: AsyncSession, now: datetime.datetime) -> Dict[str, datetime.datetime]:
+    tiers = metric_tiers()
+    res = await db.execute(text("SELECT tier, rolled_until FROM metrics_rollup_state"))
+    cutoffs = expiry_cutoffs(tiers, {t: u for t, u in res.all()}, now)
+    for tier in tiers:
+        cutoff = cutoffs.get(tier.name)
+        if cutoff is None:
+            continue
+        if tier.width == 0:
+            await db.execute(text("DELETE FROM node_metrics WHERE created_at < :c"), {"c": cutoff})
+            await db.execute(text("DELETE FROM cluster_metrics WHERE created_at < :c"), {"c": cutoff})
+        else:
+            await db.execute(text(f"DELETE FROM {tier.table} WHERE bucket < :c"), {"c": cutoff})
+    await db.commit()
+    return cutoffs
+
+
+async def rollup_metrics(db: AsyncSession, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+    """Bring every rollup tier up to date, then expire rows past their TTL"""
+    await ensure_metrics_schema(db)
+    now = now or datetime.datetime.now(BJ_TZ)
+    tiers = {t.name: t for t in metric_tiers()}
+    chunks = {}
+    for tier in tiers.values():
+        if tier.source:
+            chunks[tier.name] = await rollup_tier(db, tier, tiers[tier.source], now)
+    cutoffs = await expire_metrics(db, now)
+    return {"chunks": chunks, "expiredBefore": {k: v.isoformat() for k, v in cutoffs.items()}}
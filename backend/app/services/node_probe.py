@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# One remote exec per sample. Every section is printed behind an "@name" marker
+# so the whole payload can be parsed in a single pass; the kernel counters are
+# read back to back, so they describe the same instant.
+PROBE_COMMAND = r"""LC_ALL=C; export LC_ALL
+echo "@ts $(date +%s.%N 2>/dev/null || date +%s)"
+echo @stat; head -n 1 /proc/stat
+echo @mem; grep -E '^(MemTotal|MemAvailable|MemFree|Buffers|Cached|SwapTotal|SwapFree):' /proc/meminfo
+echo @load; cat /proc/loadavg
+echo @net; tail -n +3 /proc/net/dev
+echo @disk; awk '$3 !~ /^(loop|ram|zram|fd|sr|dm-|md)/ {print $3, $4, $6, $8, $10, $13}' /proc/diskstats
+echo @blk; ls /sys/block 2>/dev/null
+echo @df; df -P -k -x tmpfs -x devtmpfs -x overlay -x squashfs 2>/dev/null | tail -n +2
+echo @jvm; for p in $(pgrep -f -- '-Dproc_' 2>/dev/null); do
+  r=$(tr '\0' '\n' < /proc/$p/cmdline 2>/dev/null | grep -m 1 '^-Dproc_')
+  s=$(awk '/^(VmRSS|Threads):/ {printf "%s ", $2}' /proc/$p/status 2>/dev/null)
+  [ -n "$r" ] && echo "$p ${r#-Dproc_} $s"
+done
+echo @end"""
+
+_SKIP_IFACES = ("lo",)
+SECTOR_BYTES = 512
+
+
+def _ints(parts: List[str]) -> List[int]:
+    out = []
+    for p in parts:
+        try:
+            out.append(int(p))
+        except ValueError:
+            out.append(0)
+    return out
+
+
+def parse_probe_output(text: str) -> Dict[str, Any]:
+    """Split PROBE_COMMAND output into raw counters (no deltas yet)"""
+    raw: Dict[str, Any] = {"ts": None, "cpu": None, "mem": {}, "load": None, "net": {}, "disk": {}, "df": [], "jvm": [], "complete": False}
+    whole_disks = set()
+    section = None
+    for line in (text or "").splitlines():
+        if line.startswith("@"):
+            head, _, rest = line.partition(" ")
+            section = head[1:]
+            if section == "ts":
+                try:
+                    raw["ts"] = float(rest.strip())
+                except ValueError:
+                    pass
+            elif section == "end":
+                raw["complete"] = True
+            continue
+        parts = line.split()
+        if not parts:
+            continue
+        if section == "stat" and parts[0] == "cpu":
+            raw["cpu"] = _ints(parts[1:])
+        elif section == "mem" and len(parts) >= 2:
+            raw["mem"][parts[0].rstrip(":")] = _ints(parts[1:2])[0]
+        elif section == "load" and len(parts) >= 3:
+            try:
+                raw["load"] = tuple(float(x) for x in parts[:3])
+            except ValueError:
+                pass
+        elif section == "net":
+            iface, _, counters = line.partition(":")
+            iface = iface.strip()
+            vals = _ints(counters.split())
+            if iface and iface not in _SKIP_IFACES and len(vals) >= 9:
+                raw["net"][iface] = (vals[0], vals[8])  # rx bytes, tx bytes
+        elif section == "disk" and len(parts) >= 6:
+            # reads, sectors read, writes, sectors written, ms doing io
+            raw["disk"][parts[0]] = tuple(_ints(parts[1:6]))
+        elif section == "blk":
+            whole_disks.update(parts)
+        elif section == "df" and len(parts) >= 6:
+            size, used, avail = _ints(parts[1:4])
+            raw["df"].append({"fs": parts[0], "mount": parts[5], "size_kb": size, "used_kb": used, "avail_kb": avail})
+        elif section == "jvm" and len(parts) >= 2:
+            nums = _ints(parts[2:4]) + [0, 0]
+            raw["jvm"].append({"pid": _ints(parts[:1])[0], "role": parts[1], "rss_kb": nums[0], "threads": nums[1]})
+    if whole_disks:
+        # partitions repeat their disk's counters
+        raw["disk"] = {k: v for k, v in raw["disk"].items() if k in whole_disks}
+    return raw
+
+
+def cpu_percent(prev: Optional[List[int]], cur: Optional[List[int]]) -> Optional[float]:
+    """Busy share between two /proc/stat cpu lines; iowait counts as idle, guest time is already in user"""
+    if not prev or not cur:
+        return None
+    get_p = lambda i: prev[i] if i < len(prev) else 0
+    get_c = lambda i: cur[i] if i < len(cur) else 0
+    idle = (get_c(3) + get_c(4)) - (get_p(3) + get_p(4))
+    total = sum(get_c(i) - get_p(i) for i in range(8))
+    if total <= 0:
+        return None
+    return round(max(0.0, min(100.0, (1.0 - idle / total) * 100.0)), 2)
+
+
+def memory_percent(mem: Dict[str, int]) -> Optional[float]:
+    total = mem.get("MemTotal") or 0
+    if total <= 0:
+        return None
+    avail = mem.get("MemAvailable")
+    if avail is None:  # kernels before 3.14
+        avail = mem.get("MemFree", 0) + mem.get("Buffers", 0) + mem.get("Cached", 0)
+    return round((1.0 - avail / total) * 100.0, 2)
+
+
+def disk_percent(df: List[Dict[str, Any]]) -> Optional[float]:
+    """Used share over all real filesystems (size weighted), as df reports it"""
+    used = sum(d["used_kb"] for d in df)
+    usable = sum(d["used_kb"] + d["avail_kb"] for d in df)
+    if usable <= 0:
+        return None
+    return round(used / usable * 100.0, 2)
+
+
+def _rates(prev: Dict[str, Tuple[int, ...]], cur: Dict[str, Tuple[int, ...]], idx: Tuple[int, ...], dt: float, scale: int = 1) -> List[float]:
+    sums = [0] * len(idx)
+    for key, vals in cur.items():
+        old = prev.get(key)
+        if old is None:
+            continue
+        for n, i in enumerate(idx):
+            d = vals[i] - old[i]
+            if d > 0:  # counter wrap or device reset: skip
+                sums[n] += d
+    return [round(s * scale / dt, 1) for s in sums]
+
+
+def compute_metrics(prev: Optional[Dict[str, Any]], cur: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn two raw probes into usage percentages and per-second rates; rates are None without a previous probe"""
+    load = cur.get("load") or (None, None, None)
+    out: Dict[str, Any] = {
+        "cpu": cpu_percent(prev.get("cpu") if prev else None, cur.get("cpu")),
+        "mem": memory_percent(cur.get("mem") or {}),
+        "disk": disk_percent(cur.get("df") or []),
+        "load1": load[0],
+        "load5": load[1],
+        "load15": load[2],
+        "net_rx_bps": None,
+        "net_tx_bps": None,
+        "disk_read_bps": None,
+        "disk_write_bps": None,
+        "mounts": [{"mount": d["mount"], "pct": round(d["used_kb"] / (d["used_kb"] + d["avail_kb"]) * 100.0, 2) if d["used_kb"] + d["avail_kb"] else None} for d in cur.get("df") or []],
+        "jvm": cur.get("jvm") or [],
+    }
+    if prev and prev.get("ts") and cur.get("ts"):
+        dt = cur["ts"] - prev["ts"]
+        if dt > 0:
+            out["net_rx_bps"], out["net_tx_bps"] = _rates(prev.get("net") or {}, cur.get("net") or {}, (0, 1), dt)
+            out["disk_read_bps"], out["disk_write_bps"] = _rates(prev.get("disk") or {}, cur.get("disk") or {}, (1, 3), dt, SECTOR_BYTES)
+    return out
+
+
+class NodeProber:
+    """Runs PROBE_COMMAND and keeps each node's previous raw counters.
+
+    CPU and I/O rates are deltas against the node's previous probe, so a
+    steady collector needs exactly one exec per sample and never sleeps.
+    Only the very first probe of a node takes a baseline, waits warmup
+    seconds and probes again; with warmup=0 its CPU value is None instead.
+    """
+
+    def __init__(self, warmup: float = 0.5, max_age: float = 600.0):
+        self.warmup = warmup
+        self.max_age = max_age
+        self._prev: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def forget(self, node: str):
+        with self._lock:
+            self._prev.pop(node, None)
+
+    def _previous(self, node: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._prev.get(node)
+        return entry[1] if entry and time.monotonic() - entry[0] <= self.max_age else None
+
+    def _remember(self, node: str, cur: Dict[str, Any]):
+        with self._lock:
+            self._prev[node] = (time.monotonic(), cur)
+
+    def sample(self, node: str, execute: Callable[[str], Tuple[str, str]]) -> Dict[str, Any]:
+        """Probe node through execute(command) -> (stdout, stderr) and return compute_metrics() for it"""
+        prev = self._previous(node)
+        if prev is None and self.warmup > 0:
+            prev = self._parse(*execute(PROBE_COMMAND))
+            time.sleep(self.warmup)
+        cur = self._parse(*execute(PROBE_COMMAND))
+        self._remember(node, cur)
+        return compute_metrics(prev, cur)
+
+    async def asample(self, node: str, execute: Callable[[str], Awaitable[Tuple[str, str]]]) -> Dict[str, Any]:
+        """sample() with an awaitable execute; the warmup wait does not hold a thread"""
+        prev = self._previous(node)
+        if prev is None and self.warmup > 0:
+            prev = self._parse(*await execute(PROBE_COMMAND))
+            await asyncio.sleep(self.warmup)
+        cur = self._parse(*await execute(PROBE_COMMAND))
+        self._remember(node, cur)
+        return compute_metrics(prev, cur)
+
+    @staticmethod
+    def _parse(out: str, err: str) -> Dict[str, Any]:
+        raw = parse_probe_output(out)
+        if raw["cpu"] is None:
+            raise RuntimeError(f"probe failed: {(err or out or 'empty output').strip()[:200]}")
+        if raw["ts"] is None:
+            raw["ts"] = time.time()
+        return raw
+
+
+node_prober = NodeProber()
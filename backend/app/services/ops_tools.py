@@ -1,9 +1,8 @@
 import shlex
 import asyncio
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 from datetime import datetime, timezone
 import json
-import re
 import httpx
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -19,7 +18,8 @@ from ..models.clusters import Cluster
 from ..models.hadoop_exec_logs import HadoopExecLog
 from ..ssh_utils import SSHClient, ssh_manager
 from ..log_reader import log_reader
-from ..config import now_bj
+from ..config import now_bj, SSH_EXEC_TIMEOUT
+from .fault_detection import FAULT_RULES, detect_faults_from_log_text, fault_detector
 
 
 def _now() -> datetime:
@@ -97,16 +97,16 @@ async def tool_read_log(db: AsyncSession, user_name: str, node: str, path: str,
     start = _now()
     bash_cmd = f"bash -lc {shlex.quote(cmd)}"
 
-    def _run():
-        client = ssh_manager.get_connection(
-            str(getattr(n, "hostname", node)),
-            ip=str(getattr(n, "ip_address", "")),
-            username=(ssh_user or getattr(n, "ssh_user", None) or "hadoop"),
-            password=str(getattr(n, "ssh_password", "")),
-        )
-        return client.execute_command_with_timeout_and_status(bash_cmd, timeout=timeout)
-
-    code, out, err = await asyncio.to_thread(_run)
+    client = ssh_manager.get_connection(
+        str(getattr(n, "hostname", node)),
+        ip=str(getattr(n, "ip_address", "")),
+        username=(ssh_user or getattr(n, "ssh_user", None) or "hadoop"),
+        password=str(getattr(n, "ssh_password", "")),
+    )
+    try:
+        code, out, err = await client.aexecute_command_with_status(bash_cmd, timeout=timeout)
+    except asyncio.TimeoutError:
+        code, out, err = -1, "", f"timeout after {timeout}s"
     end = _now()
     exec_id = f"tool_{start.timestamp():.0f}"
     await _write_exec_log(db, exec_id, "read_log", ("success" if code == 0 else "failed"), start, end, code, user_name, out, err)
@@ -388,24 +388,24 @@ async def tool_read_cluster_log(
     if not target_hostname:
         target_hostname = target_ip
 
-    def _tail_via_ssh() -> Dict[str, Any]:
+    async def _tail_via_ssh() -> Dict[str, Any]:
         ip = str(target_ip)
         hn = str(target_hostname)
-        log_reader.find_working_log_dir(hn, ip)
         ssh_client = ssh_manager.get_connection(hn, ip=ip, username=ssh_user, password=ssh_password)
+        await log_reader.afind_working_log_dir(hn, ip)
         paths = log_reader.get_log_file_paths(hn, log_type.lower())
         for p in paths:
             p_q = shlex.quote(p)
-            out, err = ssh_client.execute_command(f"ls -la {p_q} 2>/dev/null")
+            out, err = await ssh_client.aexecute_command(f"ls -la {p_q} 2>/dev/null", SSH_EXEC_TIMEOUT)
             if err or not out.strip():
                 continue
-            out2, err2 = ssh_client.execute_command(f"tail -n {int(lines)} {p_q} 2>/dev/null")
+            out2, err2 = await ssh_client.aexecute_command(f"tail -n {int(lines)} {p_q} 2>/dev/null", SSH_EXEC_TIMEOUT)
             if err2:
                 continue
             return {"status": "success", "node": hn, "log_type": log_type, "path": p, "content": out2}
         base_dir = log_reader._node_log_dir.get(hn, log_reader.log_dir)
         base_q = shlex.quote(base_dir)
-        out, err = ssh_client.execute_command(f"ls -1 {base_q} 2>/dev/null")
+        out, err = await ssh_client.aexecute_command(f"ls -1 {base_q} 2>/dev/null", SSH_EXEC_TIMEOUT)
         if err or not out.strip():
             return {"status": "error", "message": "log_dir_not_found", "node": hn}
         for fn in out.splitlines():
@@ -416,107 +416,38 @@ async def tool_read_cluster_log(
             if log_type.lower() in lf and hn.lower() in lf and (lf.endswith(".log") or lf.endswith(".out") or lf.endswith(".out.1")):
                 full = f"{base_dir}/{f}"
                 full_q = shlex.quote(full)
-                out2, err2 = ssh_client.execute_command(f"tail -n {int(lines)} {full_q} 2>/dev/null")
+                out2, err2 = await ssh_client.aexecute_command(f"tail -n {int(lines)} {full_q} 2>/dev/null", SSH_EXEC_TIMEOUT)
                 if not err2:
                     return {"status": "success", "node": hn, "log_type": log_type, "path": full, "content": out2}
         return {"status": "error", "message": "log_file_not_found", "node": hn}
 
-    return await asyncio.to_thread(_tail_via_ssh)
-
-
-_FAULT_RULES: List[Dict[str, Any]] = [
-    {
-        "id": "hdfs_safemode",
-        "severity": "high",
-        "title": "NameNode 处于 SafeMode",
-        "patterns": [r"SafeModeException", r"NameNode is in safe mode", r"Safe mode is ON"],
-        "advice": "检查 DataNode 是否全部注册、磁盘与网络是否正常；必要时执行 hdfs dfsadmin -safemode leave。",
-    },
-    {
-        "id": "hdfs_standby",
-        "severity": "high",
-        "title": "访问到 Standby NameNode",
-        "patterns": [r"StandbyException", r"Operation category READ is not supported in state standby"],
-        "advice": "确认客户端的 fs.defaultFS/HA 配置；确认 active/standby 切换状态是否正确。",
-    },
-    {
-        "id": "rpc_connection_refused",
-        "severity": "high",
-        "title": "RPC 连接被拒绝或目标服务未启动",
-        "patterns": [r"java\.net\.ConnectException:\s*Connection refused", r"Call to .* failed on local exception", r"Connection refused"],
-        "advice": "确认对应守护进程是否存活、端口是否监听、iptables/安全组是否放通。",
-    },
-    {
-        "id": "dns_or_route",
-        "severity": "high",
-        "title": "DNS/网络不可达",
-        "patterns": [r"UnknownHostException", r"No route to host", r"Network is unreachable", r"Connection timed out"],
-        "advice": "检查 DNS 解析、/etc/hosts、一致的主机名配置与网络连通性。",
-    },
-    {
-        "id": "disk_no_space",
-        "severity": "high",
-        "title": "磁盘空间不足",
-        "patterns": [r"No space left on device", r"DiskOutOfSpaceException", r"ENOSPC"],
-        "advice": "清理磁盘、检查日志/临时目录增长；确认 DataNode 存储目录剩余空间。",
-    },
-    {
-        "id": "permission_denied",
-        "severity": "medium",
-        "title": "权限不足或 HDFS ACL/权限问题",
-        "patterns": [r"Permission denied", r"AccessControlException"],
-        "advice": "检查用户/组映射、HDFS 权限与 ACL；确认相关目录权限与 umask。",
-    },
-    {
-        "id": "kerberos_auth",
-        "severity": "high",
-        "title": "Kerberos 认证失败",
-        "patterns": [r"GSSException", r"Failed to find any Kerberos tgt", r"Client cannot authenticate via:\s*\[TOKEN, KERBEROS\]"],
-        "advice": "检查 KDC、keytab、principal、时间同步；确认客户端已 kinit 且票据未过期。",
-    },
-    {
-        "id": "oom",
-        "severity": "high",
-        "title": "Java 内存溢出",
-        "patterns": [r"OutOfMemoryError", r"Java heap space", r"GC overhead limit exceeded"],
-        "advice": "检查相关服务 JVM 参数（-Xmx/-Xms）、容器/节点内存；结合 GC 日志定位内存泄漏或峰值。",
-    },
-    {
-        "id": "jvm_exit_killed",
-        "severity": "medium",
-        "title": "进程异常退出或被杀",
-        "patterns": [r"ExitCodeException exitCode=143", r"Killed by signal", r"Container killed"],
-        "advice": "检查是否被资源管理器/系统 OOM killer 杀死；核对 YARN 队列资源与节点资源。",
-    },
-]
-
-
-def _detect_faults_from_log_text(text: str, max_examples_per_rule: int = 3) -> List[Dict[str, Any]]:
-    lines = (text or "").splitlines()
-    hits: List[Dict[str, Any]] = []
-    for rule in _FAULT_RULES:
-        patterns = rule.get("patterns") or []
-        compiled = [re.compile(p, re.IGNORECASE) for p in patterns]
-        examples: List[Dict[str, Any]] = []
-        for idx, line in enumerate(lines):
-            if not line:
-                continue
-            if any(rgx.search(line) for rgx in compiled):
-                examples.append({"lineNo": idx + 1, "line": line[:500]})
-                if len(examples) >= max_examples_per_rule:
-                    break
-        if examples:
-            hits.append(
-                {
-                    "id": rule.get("id"),
-                    "severity": rule.get("severity"),
-                    "title": rule.get("title"),
-                    "advice": rule.get("advice"),
-                    "examples": examples,
-                    "matchCountApprox": len(examples),
-                }
-            )
-    return hits
+    return await _tail_via_ssh()
+
+
+# 规则与匹配逻辑在 services/fault_detection.py，这里保留旧名称
+_FAULT_RULES = FAULT_RULES
+_detect_faults_from_log_text = detect_faults_from_log_text
+
+
+async def _component_hosts(db: AsyncSession, cluster: Cluster, comps: List[str]) -> Dict[str, List[Optional[str]]]:
+    """返回各组件所在的节点主机名。
+
+    namenode/resourcemanager 取集群配置的主节点，其余组件可能运行在任意
+    节点上，取集群全部节点；无法确定时为 [None]，由 tool_read_cluster_log
+    自行选择节点。
+    """
+    res = await db.execute(select(Node).where(Node.cluster_id == cluster.id))
+    nodes = list(res.scalars().all())
+    by_ip = {str(n.ip_address): n.hostname for n in nodes}
+    masters = {"namenode": cluster.namenode_ip, "resourcemanager": cluster.rm_ip}
+    hosts: Dict[str, List[Optional[str]]] = {}
+    for comp in comps:
+        if comp in masters:
+            ip = masters[comp]
+            hosts[comp] = [by_ip.get(str(ip)) if ip else None]
+        else:
+            hosts[comp] = sorted({n.hostname for n in nodes}) or [None]
+    return hosts
 
 
 async def tool_detect_cluster_faults(
@@ -526,7 +457,15 @@ async def tool_detect_cluster_faults(
     components: Optional[List[str]] = None,
     node_hostname: Optional[str] = None,
     lines: int = 200,
+    window_minutes: int = 180,
 ) -> Dict[str, Any]:
+    """识别集群故障。
+
+    按 (节点, 组件) 判断：最近 FAULT_STREAM_STALE_SECONDS 秒内有日志流入
+    的，直接读取入库流上最近 window_minutes 分钟的匹配结果；其余节点
+    （未采集、采集已停止或近期无新日志）通过 SSH 读取最近 lines 行，两部分
+    结果合并返回。未指定 node_hostname 时检查运行该组件的所有节点。
+    """
     import uuid as uuidlib
 
     try:
@@ -540,16 +479,46 @@ async def tool_detect_cluster_faults(
     if not comps:
         return {"status": "error", "message": "no_components"}
 
-    reads: List[Dict[str, Any]] = []
+    severity_order = {"high": 0, "medium": 1, "low": 2}
+
+    def _sort_key(x: Dict[str, Any]):
+        return (severity_order.get((x.get("severity") or "").lower(), 9), -x.get("matchCountApprox", 0), x.get("id") or "")
+
+    cluster_res = await db.execute(select(Cluster).where(Cluster.uuid == cluster_uuid).limit(1))
+    cluster = cluster_res.scalars().first()
+    covered: Set[Tuple[str, str]] = set()
+    targets: Dict[str, List[Optional[str]]] = {c: [node_hostname] for c in comps}
     faults: List[Dict[str, Any]] = []
+    if cluster and await _user_has_cluster_access(db, user_name, int(cluster.id)):
+        covered = fault_detector.covered(cluster.name, comps, node_hostname)
+        if not node_hostname:
+            targets = await _component_hosts(db, cluster, comps)
+        if covered:
+            faults = [
+                f for f in fault_detector.summary(cluster.name, comps, node_hostname, since_minutes=window_minutes)
+                if (f["node"], f["component"].lower()) in covered
+            ]
+    ssh_targets = [(c, h) for c in comps for h in targets[c] if (h, c) not in covered]
+    if not ssh_targets:
+        faults.sort(key=_sort_key)
+        return {
+            "status": "success",
+            "cluster_uuid": cluster_uuid,
+            "components": comps,
+            "source": "stream",
+            "windowMinutes": window_minutes,
+            "faults": faults[:20],
+        }
 
-    for comp in comps:
+    reads: List[Dict[str, Any]] = []
+
+    for comp, host in ssh_targets:
         r = await tool_read_cluster_log(
             db=db,
             user_name=user_name,
             cluster_uuid=cluster_uuid,
             log_type=comp,
-            node_hostname=node_hostname,
+            node_hostname=host,
             lines=lines,
         )
         reads.append({k: r.get(k) for k in ("status", "node", "log_type", "path", "message")})
@@ -564,16 +533,22 @@ async def tool_detect_cluster_faults(
             f2["path"] = r.get("path")
             faults.append(f2)
 
-    severity_order = {"high": 0, "medium": 1, "low": 2}
-    faults.sort(key=lambda x: (severity_order.get((x.get("severity") or "").lower(), 9), x.get("id") or ""))
+    faults.sort(key=_sort_key)
 
-    return {
+    result = {
         "status": "success",
         "cluster_uuid": cluster_uuid,
         "components": comps,
+        "source": "stream+ssh_tail" if covered else "ssh_tail",
         "reads": reads,
         "faults": faults[:20],
     }
+    if covered:
+        # 部分节点的组件来自入库流
+        result["streamComponents"] = sorted({c for _, c in covered})
+        result["streamNodes"] = [{"node": h, "component": c} for h, c in sorted(covered)]
+        result["windowMinutes"] = window_minutes
+    return result
 
 
 _OPS_COMMANDS: Dict[str, Dict[str, Any]] = {
@@ -627,12 +602,11 @@ async def tool_run_cluster_command(
     bash_cmd = f"bash -lc {shlex.quote(cmd)}"
 
     async def _exec_on_node(hostname: str, ip: str, ssh_user: Optional[str], ssh_password: Optional[str]) -> Dict[str, Any]:
-        def _run():
-            client = ssh_manager.get_connection(hostname, ip=ip, username=ssh_user, password=ssh_password)
-            exit_code, out, err = client.execute_command_with_timeout_and_status(bash_cmd, timeout=timeout)
-            return exit_code, out, err
-
-        exit_code, out, err = await asyncio.to_thread(_run)
+        client = ssh_manager.get_connection(hostname, ip=ip, username=ssh_user, password=ssh_password)
+        try:
+            exit_code, out, err = await client.aexecute_command_with_status(bash_cmd, timeout=timeout)
+        except asyncio.TimeoutError:
+            exit_code, out, err = -1, "", f"timeout after {timeout}s"
         return {
             "node": hostname,
             "ip": ip,
@@ -674,11 +648,13 @@ async def tool_run_cluster_command(
     elif tgt == "all_nodes":
         nodes_stmt = select(Node).where(Node.cluster_id == cluster.id).limit(limit_nodes)
         nodes = (await db.execute(nodes_stmt)).scalars().all()
+        targets = []
         for n in nodes:
             n2 = await _find_accessible_node(db, user_name, n.hostname)
-            if not n2:
-                continue
-            results.append(await _exec_on_node(n2.hostname, str(n2.ip_address), n2.ssh_user or "hadoop", n2.ssh_password))
+            if n2:
+                targets.append(n2)
+        # 各节点并发执行，总耗时取决于最慢的节点
+        results.extend(await asyncio.gather(*(_exec_on_node(n2.hostname, str(n2.ip_address), n2.ssh_user or "hadoop", n2.ssh_password) for n2 in targets)))
 
     else:
         return {"status": "error", "message": "invalid_target"}
@@ -792,7 +768,8 @@ def openai_tools_schema() -> List[Dict[str, Any]]:
                         "cluster_uuid": {"type": "string", "description": "集群的 UUID"},
                         "components": {"type": "array", "items": {"type": "string"}, "description": "要分析的组件列表，例如 [namenode, resourcemanager, datanode]"},
                         "node_hostname": {"type": "string", "description": "可选：指定节点主机名（适用于 datanode 等多实例组件）"},
-                        "lines": {"type": "integer", "default": 200, "description": "每个组件读取的行数"},
+                        "lines": {"type": "integer", "default": 200, "description": "未开启日志采集时，每个组件读取的行数"},
+                        "window_minutes": {"type": "integer", "default": 180, "description": "开启日志采集时，统计最近多少分钟的故障命中"},
                     },
                     "required": ["cluster_uuid"],
                 },
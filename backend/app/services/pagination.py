@@ -0,0 +1,71 @@
+import base64
+import json
+import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from sqlalchemy import Select, select, func, tuple_
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+COUNT_MODES = ("exact", "estimate", "capped", "none")
+COUNT_MODE_PATTERN = "^(exact|estimate|capped|none)$"
+DEFAULT_COUNT_CAP = 10000
+
+
+def encode_cursor(ts: datetime.datetime, key: Any) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    raw = json.dumps([ts.isoformat(), str(key)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: Callable[[str], Any] = int) -> Tuple[datetime.datetime, Any]:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, key = json.loads(raw)
+        return datetime.datetime.fromisoformat(ts), key_type(key)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def keyset_page(stmt: Select, time_col, key_col, size: int, cursor: Optional[str] = None, key_type: Callable[[str], Any] = int) -> Select:
+    """Newest-first page of stmt after cursor, ordered by (time_col, key_col) DESC.
+
+    Fetches size + 1 rows so the caller can tell whether there is a next page.
+    """
+    if cursor:
+        ts, key = decode_cursor(cursor, key_type)
+        stmt = stmt.where(tuple_(time_col, key_col) < tuple_(ts, key))
+    return stmt.order_by(time_col.desc(), key_col.desc()).limit(size + 1)
+
+
+def next_cursor(rows: Sequence[Any], size: int, time_attr: str, key_attr: str) -> Tuple[Sequence[Any], Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the following page"""
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_attr), getattr(last, key_attr))
+
+
+async def count_rows(db: AsyncSession, stmt: Select, mode: str = "exact", cap: int = DEFAULT_COUNT_CAP) -> Dict[str, Any]:
+    """Row count of a filtered select.
+
+    exact   - count(*)
+    capped  - count(*) over at most cap + 1 rows; "capped" tells whether the real total is larger
+    estimate - the planner's row estimate from EXPLAIN, no rows are read
+    none    - skip counting
+    """
+    if mode == "none":
+        return {"total": None, "total_mode": mode}
+    if mode == "estimate":
+        sql = str(stmt.compile(dialect=PGDialect_asyncpg(), compile_kwargs={"literal_binds": True}))
+        conn = await db.connection()
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return {"total": int(plan[0]["Plan"]["Plan Rows"]), "total_mode": mode}
+    if mode == "capped":
+        n = (await db.execute(select(func.count()).select_from(stmt.limit(cap + 1).subquery()))).scalar() or 0
+        return {"total": min(int(n), cap), "total_mode": mode, "capped": n > cap}
+    n = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar() or 0
+    return {"total": int(n), "total_mode": "exact"}
@@ -1,8 +1,16 @@
 import os
+import time
+import codecs
+import select
 import socket
+import asyncio
+import threading
 import paramiko
-from typing import Optional, TextIO, Dict, Tuple
-from .config import SSH_PORT, SSH_TIMEOUT
+from typing import Optional, TextIO, Dict, List, Tuple, AsyncIterator, Callable
+from .config import (
+    SSH_PORT, SSH_TIMEOUT, SSH_MAX_TRANSPORTS_PER_HOST, SSH_MAX_CHANNELS_PER_TRANSPORT, SSH_IDLE_SECONDS,
+    SSH_KEEPALIVE_SECONDS, SSH_ACQUIRE_TIMEOUT,
+)
 
 # Create a static node configuration dictionary that will be used for all requests
 # This avoids the issue of environment variables not being available in child processes
@@ -59,31 +67,43 @@ class SSHClient:
             sock=sock,
         )
     
+    def _exec(self, command: str, timeout: Optional[float] = None) -> Tuple[int, bytes, bytes]:
+        """Run command and return (exit status, stdout, stderr), draining both streams together"""
+        self._ensure_connected()
+        stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
+        channel = stdout.channel
+        out, err = drain_channel(channel, timeout=timeout)
+        return channel.recv_exit_status(), out, err
+
     def execute_command(self, command: str) -> tuple:
         """Execute command on remote server"""
-        self._ensure_connected()
-        
-        stdin, stdout, stderr = self.client.exec_command(command)
-        return stdout.read().decode(), stderr.read().decode()
+        _, out, err = self._exec(command)
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    def execute_command_bytes(self, command: str) -> Tuple[bytes, bytes]:
+        """Execute command and return raw (stdout, stderr) bytes, for byte-exact offset tracking"""
+        _, out, err = self._exec(command)
+        return out, err
 
     def execute_command_with_status(self, command: str) -> tuple:
-        self._ensure_connected()
-        stdin, stdout, stderr = self.client.exec_command(command)
-        exit_code = stdout.channel.recv_exit_status()
-        return exit_code, stdout.read().decode(), stderr.read().decode()
+        exit_code, out, err = self._exec(command)
+        return exit_code, out.decode(errors="replace"), err.decode(errors="replace")
     
     def execute_command_with_timeout(self, command: str, timeout: int = 30) -> tuple:
         """Execute command with timeout"""
-        self._ensure_connected()
-        
-        stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
-        return stdout.read().decode(), stderr.read().decode()
+        _, out, err = self._exec(command, timeout)
+        return out.decode(errors="replace"), err.decode(errors="replace")
 
     def execute_command_with_timeout_and_status(self, command: str, timeout: int = 30) -> tuple:
+        exit_code, out, err = self._exec(command, timeout)
+        return exit_code, out.decode(errors="replace"), err.decode(errors="replace")
+    
+    def open_channel(self, command: str) -> paramiko.Channel:
+        """Start command on a new session channel and return it unread, for streaming consumers"""
         self._ensure_connected()
-        stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
-        exit_code = stdout.channel.recv_exit_status()
-        return exit_code, stdout.read().decode(), stderr.read().decode()
+        channel = self.client.get_transport().open_session()
+        channel.exec_command(command)
+        return channel
     
     def read_file(self, file_path: str) -> str:
         """Read file content from remote server"""
@@ -115,52 +135,452 @@ class SSHClient:
         """Context manager exit"""
         self.close()
 
-class SSHConnectionManager:
-    """SSH Connection Manager for managing multiple SSH connections"""
-    
-    def __init__(self):
-        self.connections = {}
-    
-    def get_connection(self, node_name: str, ip: str = None, username: str = None, password: str = None) -> SSHClient:
-        """Get or create SSH connection for a node"""
-        if node_name in self.connections:
-            client = self.connections[node_name]
-            if ip and getattr(client, "hostname", None) != ip:
-                try:
-                    client.close()
-                except Exception:
-                    pass
-                del self.connections[node_name]
-            elif username and getattr(client, "username", None) != username:
-                try:
-                    client.close()
-                except Exception:
-                    pass
-                del self.connections[node_name]
-            elif password and getattr(client, "password", None) != password:
+class HostPool:
+    """Bounded set of SSH transports to one (ip, port, user, password) target.
+
+    At most max_transports connections are opened and each carries at most
+    max_channels concurrent channels, staying below sshd's MaxSessions. A
+    caller waits for a free channel slot instead of opening more connections,
+    dead or long-idle transports are dropped and live ones send keepalives.
+    The lock only guards bookkeeping: connects and closes run outside it, so
+    release() and stats() never wait on the network.
+    """
+
+    def __init__(self, ip: str, username: str, password: str, port: int = SSH_PORT,
+                 max_transports: int = SSH_MAX_TRANSPORTS_PER_HOST, max_channels: int = SSH_MAX_CHANNELS_PER_TRANSPORT,
+                 idle_seconds: float = SSH_IDLE_SECONDS, keepalive: int = SSH_KEEPALIVE_SECONDS,
+                 client_factory: Optional[Callable[[str, str, str, int], "SSHClient"]] = None):
+        self.ip = ip
+        self.username = username
+        self.password = password
+        self.port = port
+        self.max_transports = max(1, max_transports)
+        self.max_channels = max(1, max_channels)
+        self.idle_seconds = idle_seconds
+        self.keepalive = keepalive
+        self._factory = client_factory or SSHClient
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # a connect finished or a slot was released
+        self._slots = threading.BoundedSemaphore(self.max_transports * self.max_channels)
+        self._clients: List[SSHClient] = []
+        self._pending = 0  # transports being connected outside the lock
+        self._inflight: Dict[int, int] = {}
+        self._last_used: Dict[int, float] = {}
+        self._channels: List[Tuple[SSHClient, paramiko.Channel]] = []  # open_channel() channels still holding a slot
+        self.connects = 0
+
+    @staticmethod
+    def _alive(client: "SSHClient") -> bool:
+        try:
+            transport = client.client.get_transport() if client.client else None
+            return transport is not None and transport.is_active()
+        except Exception:
+            return False
+
+    def _detach(self, client: "SSHClient") -> "SSHClient":
+        """Forget a transport (lock held); the caller closes it after releasing the lock"""
+        if client in self._clients:
+            self._clients.remove(client)
+        self._inflight.pop(id(client), None)
+        self._last_used.pop(id(client), None)
+        return client
+
+    @staticmethod
+    def _close_clients(clients: List["SSHClient"], wait: bool = True):
+        """Close detached transports; wait=False leaves the teardown to a daemon thread"""
+        def close_all():
+            for client in clients:
                 try:
                     client.close()
                 except Exception:
                     pass
-                del self.connections[node_name]
 
-        if node_name not in self.connections:
-            if not ip:
+        if wait:
+            close_all()
+        elif clients:
+            threading.Thread(target=close_all, daemon=True).start()
+
+    def _reap(self) -> List["SSHClient"]:
+        """Release slots of finished streaming channels and detach dead or idle transports (lock held)"""
+        still_open = []
+        for client, channel in self._channels:
+            if channel.closed or (channel.eof_received and channel.exit_status_ready()):
+                self._inflight[id(client)] = max(0, self._inflight.get(id(client), 1) - 1)
+                self._last_used[id(client)] = time.monotonic()
+                self._slots.release()
+            else:
+                still_open.append((client, channel))
+        self._channels = still_open
+        now = time.monotonic()
+        dropped = []
+        for client in list(self._clients):
+            idle = not self._inflight.get(id(client)) and now - self._last_used.get(id(client), now) > self.idle_seconds
+            if idle or (not self._inflight.get(id(client)) and not self._alive(client)):
+                dropped.append(self._detach(client))
+        return dropped
+
+    def acquire(self, timeout: float = SSH_ACQUIRE_TIMEOUT) -> "SSHClient":
+        """Reserve a channel slot and return the transport to open it on"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            dropped = self._reap()
+        self._close_clients(dropped)
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"no free SSH channel to {self.ip} within {timeout}s")
+        try:
+            with self._lock:
+                while True:
+                    live = [c for c in self._clients if self._alive(c)]
+                    best = min(live, key=lambda c: self._inflight.get(id(c), 0), default=None)
+                    room = len(self._clients) + self._pending < self.max_transports
+                    if best is not None and (self._inflight.get(id(best), 0) < self.max_channels or not (room or self._pending)):
+                        self._inflight[id(best)] = self._inflight.get(id(best), 0) + 1
+                        return best
+                    if room:
+                        # reserve the transport; it is connected outside the lock
+                        dropped = [self._detach(c) for c in self._clients if c not in live and not self._inflight.get(id(c))]
+                        self._pending += 1
+                        break
+                    # every allowed transport is busy or still connecting
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"no SSH transport to {self.ip} within {timeout}s")
+                    self._changed.wait(remaining)
+            self._close_clients(dropped)
+            client = None
+            try:
+                client = self._factory(self.ip, self.username, self.password, self.port)
+                client.connect()
+                if self.keepalive > 0 and client.client is not None:
+                    try:
+                        client.client.get_transport().set_keepalive(self.keepalive)
+                    except Exception:
+                        pass
+            except BaseException:
+                client = None
+                raise
+            finally:
+                # register in the same critical section that drops the reservation
+                with self._lock:
+                    self._pending -= 1
+                    if client is not None:
+                        self.connects += 1
+                        self._clients.append(client)
+                        self._inflight[id(client)] = 1
+                    self._changed.notify_all()
+            return client
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, client: "SSHClient", broken: bool = False, wait: bool = True):
+        """Give a slot back; from the event loop pass wait=False so a dropped transport closes in the background"""
+        dropped = []
+        with self._lock:
+            self._inflight[id(client)] = max(0, self._inflight.get(id(client), 1) - 1)
+            self._last_used[id(client)] = time.monotonic()
+            if broken or not self._alive(client):
+                # other callers may still have channels on it; it is closed once they are done
+                if not self._inflight.get(id(client)):
+                    dropped.append(self._detach(client))
+                elif client in self._clients:
+                    self._clients.remove(client)
+            self._changed.notify_all()
+        self._slots.release()
+        self._close_clients(dropped, wait)
+
+    def hold_channel(self, client: "SSHClient", channel: paramiko.Channel):
+        """Keep the slot of a streaming channel until the channel closes"""
+        with self._lock:
+            self._channels.append((client, channel))
+
+    def close(self, wait: bool = True):
+        with self._lock:
+            dropped = [self._detach(c) for c in list(self._clients)]
+        self._close_clients(dropped, wait)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            dropped = self._reap()
+            stats = {
+                "transports": len(self._clients),
+                "inflight": sum(self._inflight.values()),
+                "streaming": len(self._channels),
+                "connects": self.connects,
+            }
+        self._close_clients(dropped)
+        return stats
+
+
+class PooledSSHClient:
+    """SSHClient-compatible handle whose calls borrow a transport from a HostPool
+
+    The a*-prefixed methods are awaitable and never block the event loop;
+    the blocking ones are for worker threads and scripts.
+    """
+
+    def __init__(self, pool: HostPool):
+        self.pool = pool
+        self.hostname = pool.ip
+        self.username = pool.username
+        self.password = pool.password
+        self.port = pool.port
+
+    def _call(self, method: str, *args, **kwargs):
+        client = self.pool.acquire()
+        broken = False
+        try:
+            return getattr(client, method)(*args, **kwargs)
+        except (paramiko.SSHException, EOFError, OSError):
+            broken = not HostPool._alive(client)
+            raise
+        finally:
+            self.pool.release(client, broken)
+
+    def execute_command(self, command: str) -> tuple:
+        return self._call("execute_command", command)
+
+    def execute_command_bytes(self, command: str) -> Tuple[bytes, bytes]:
+        return self._call("execute_command_bytes", command)
+
+    def execute_command_with_status(self, command: str) -> tuple:
+        return self._call("execute_command_with_status", command)
+
+    def execute_command_with_timeout(self, command: str, timeout: int = 30) -> tuple:
+        return self._call("execute_command_with_timeout", command, timeout)
+
+    def execute_command_with_timeout_and_status(self, command: str, timeout: int = 30) -> tuple:
+        return self._call("execute_command_with_timeout_and_status", command, timeout)
+
+    def read_file(self, file_path: str) -> str:
+        return self._call("read_file", file_path)
+
+    def download_file(self, remote_path: str, local_path: str) -> None:
+        return self._call("download_file", remote_path, local_path)
+
+    def _open(self, command: str) -> Tuple["SSHClient", paramiko.Channel]:
+        """Take a slot and start command on it (blocking); the caller owns the slot afterwards"""
+        client = self.pool.acquire()
+        try:
+            return client, client.open_channel(command)
+        except BaseException:
+            self.pool.release(client, not HostPool._alive(client))
+            raise
+
+    def _discard(self, opened: Tuple["SSHClient", paramiko.Channel]):
+        """Close the channel and free its slot; runs on the event loop, so it never waits on a transport close"""
+        client, channel = opened
+        channel.close()
+        self.pool.release(client, wait=False)
+
+    def open_channel(self, command: str) -> paramiko.Channel:
+        """The channel keeps its pool slot until it is closed"""
+        client, channel = self._open(command)
+        self.pool.hold_channel(client, channel)
+        return channel
+
+    async def aexecute(self, command: str, timeout: Optional[float] = None) -> Tuple[int, bytes, bytes]:
+        """Run command without blocking the event loop; returns (exit status, stdout, stderr).
+
+        Only taking the pool slot and opening the session run in a worker
+        thread, the output is read with aiter_channel. On timeout
+        (TimeoutError) or cancellation the channel is closed, which ends the
+        remote command, and the slot goes back to the pool.
+        """
+        return await asyncio.wait_for(self._aexecute(command), timeout)
+
+    async def _aexecute(self, command: str) -> Tuple[int, bytes, bytes]:
+        client, channel = await _to_thread_owned(self._open, command, cleanup=self._discard)
+        broken = False
+        try:
+            out = bytearray()
+            err = bytearray()
+            async for o, e in aiter_channel(channel):
+                out += o
+                err += e
+            # the exit status may trail the EOF by a packet
+            while not channel.exit_status_ready():
+                await asyncio.sleep(0.01)
+            return channel.recv_exit_status(), bytes(out), bytes(err)
+        except (paramiko.SSHException, EOFError, OSError):
+            broken = not HostPool._alive(client)
+            raise
+        finally:
+            channel.close()
+            self.pool.release(client, broken, wait=False)
+
+    def astream(self, command: str, lines: bool = False, max_bytes: Optional[int] = None, timeout: Optional[float] = None,
+                chunk_size: int = 65536) -> "CommandStream":
+        """Stream command output as decoded chunks or lines as it arrives; see CommandStream"""
+        return CommandStream(self, command, lines, max_bytes, timeout, chunk_size)
+
+    async def aexecute_command(self, command: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+        _, out, err = await self.aexecute(command, timeout)
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    async def aexecute_command_bytes(self, command: str, timeout: Optional[float] = None) -> Tuple[bytes, bytes]:
+        _, out, err = await self.aexecute(command, timeout)
+        return out, err
+
+    async def aexecute_command_with_status(self, command: str, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        code, out, err = await self.aexecute(command, timeout)
+        return code, out.decode(errors="replace"), err.decode(errors="replace")
+
+    def close(self) -> None:
+        """Pooled transports are shared; they are closed by idle eviction or close_all()"""
+
+
+class CommandStream:
+    """Output of one remote command as ("stdout" | "stderr", text) pairs, as it arrives.
+
+    Both streams are drained together, so a chatty stderr cannot stall
+    stdout, and each is decoded incrementally (a UTF-8 character split
+    across packets is not mangled). With lines=True whole lines are
+    yielded without their newline; otherwise chunks. Memory stays at about
+    one chunk whatever the output size, and while the consumer is busy
+    the SSH window fills and the remote side waits.
+
+    Reading stops after max_bytes (both streams together), with truncated
+    set and any incomplete last line dropped; after timeout seconds TimeoutError is
+    raised. Either way, and on early exit, the channel is closed (ending
+    the remote command) and its pool slot released. exit_status is set
+    when the command ran to completion.
+
+        async with ssh_client.astream("cat big.log", lines=True) as stream:
+            async for name, line in stream:
+                ...
+    """
+
+    def __init__(self, client: PooledSSHClient, command: str, lines: bool = False, max_bytes: Optional[int] = None,
+                 timeout: Optional[float] = None, chunk_size: int = 65536):
+        self.client = client
+        self.command = command
+        self.lines = lines
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.exit_status: Optional[int] = None
+        self.truncated = False
+        self.received = 0
+        self._opened: Optional[Tuple[SSHClient, paramiko.Channel]] = None
+
+    async def __aenter__(self) -> "CommandStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        return self._iterate()
+
+    def close(self):
+        if self._opened is not None:
+            opened, self._opened = self._opened, None
+            self.client._discard(opened)
+
+    async def _iterate(self) -> AsyncIterator[Tuple[str, str]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout if self.timeout is not None else None
+        self._opened = await _to_thread_owned(self.client._open, self.command, cleanup=self.client._discard)
+        channel = self._opened[1]
+        decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in ("stdout", "stderr")}
+        partial = {"stdout": "", "stderr": ""}
+        idle = None if deadline is None else max(0.0, deadline - loop.time())
+        chunks = aiter_channel(channel, self.chunk_size, idle_timeout=idle)
+        try:
+            async for out, err in chunks:
+                if deadline is not None and loop.time() >= deadline:
+                    raise TimeoutError(f"command on {self.client.hostname} timed out after {self.timeout}s")
+                for name, data in (("stdout", out), ("stderr", err)):
+                    if not data or self.truncated:
+                        continue
+                    if self.max_bytes is not None and self.received + len(data) > self.max_bytes:
+                        data = data[:max(0, self.max_bytes - self.received)]
+                        self.truncated = True
+                    self.received += len(data)
+                    text = decoders[name].decode(data)
+                    if not self.lines:
+                        if text:
+                            yield name, text
+                        continue
+                    *complete, partial[name] = (partial[name] + text).split("\n")
+                    for line in complete:
+                        yield name, line
+                if self.truncated:
+                    return
+            for name in ("stdout", "stderr"):
+                rest = partial[name] + decoders[name].decode(b"", final=True)
+                if rest:
+                    yield name, rest
+            while not channel.exit_status_ready():
+                await asyncio.sleep(0.01)
+            self.exit_status = channel.recv_exit_status()
+        finally:
+            await chunks.aclose()
+            self.close()
+
+
+class SSHConnectionManager:
+    """SSH Connection Manager: one HostPool per (ip, port, user, password), safe to share across threads.
+
+    A node whose address or credentials change gets a new pool; the old one
+    is left to finish its in-flight calls and is evicted once idle.
+    """
+
+    def __init__(self, client_factory: Optional[Callable[[str, str, str, int], "SSHClient"]] = None):
+        self._lock = threading.Lock()
+        self._client_factory = client_factory
+        self.pools: Dict[Tuple[str, int, str, str], HostPool] = {}
+        self.nodes: Dict[str, Tuple[str, int, str, str]] = {}  # node name -> pool key last used for it
+
+    def get_connection(self, node_name: str, ip: str = None, username: str = None, password: str = None) -> PooledSSHClient:
+        """Get a client for a node; calls on it are pooled per host"""
+        with self._lock:
+            known = self.nodes.get(node_name)
+            if not ip and known is None:
                 raise ValueError(f"IP address required for new connection to {node_name}")
+            # omitted credentials reuse the ones this node was last reached with, as long as the address is the same
+            same_host = known is not None and (not ip or str(ip) == known[0])
+            key = (
+                str(ip or known[0]),
+                SSH_PORT,
+                username or (known[2] if same_host else DEFAULT_SSH_USER),
+                password or (known[3] if same_host else DEFAULT_SSH_PASSWORD),
+            )
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = HostPool(key[0], key[2], key[3], key[1], client_factory=self._client_factory)
+                self.pools[key] = pool
+            self.nodes[node_name] = key
+            unused = [(k, p) for k, p in self.pools.items() if k not in set(self.nodes.values())]
+        self._evict_unused(unused)
+        return PooledSSHClient(pool)
 
-            _user = username or DEFAULT_SSH_USER
-            _pass = password or DEFAULT_SSH_PASSWORD
+    def _evict_unused(self, unused: List[Tuple[Tuple[str, int, str, str], HostPool]]):
+        """Drop idle pools no node maps to; pool locks and closes are taken outside the manager lock"""
+        for key, pool in unused:
+            stats = pool.stats()
+            if stats["inflight"] or stats["streaming"]:
+                continue
+            with self._lock:
+                if key in set(self.nodes.values()) or self.pools.get(key) is not pool:
+                    continue
+                del self.pools[key]
+            pool.close(wait=False)
 
-            client = SSHClient(ip, _user, _pass)
-            self.connections[node_name] = client
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            items = list(self.pools.items())
+        return {f"{user}@{ip}:{port}": pool.stats() for (ip, port, user, _), pool in items}
 
-        return self.connections[node_name]
-    
     def close_all(self) -> None:
         """Close all SSH connections"""
-        for conn in self.connections.values():
-            conn.close()
-        self.connections.clear()
+        with self._lock:
+            pools = list(self.pools.values())
+            self.pools.clear()
+            self.nodes.clear()
+        for pool in pools:
+            pool.close()
     
     def __enter__(self):
         """Context manager entry"""
@@ -174,6 +594,75 @@ class SSHConnectionManager:
 ssh_manager = SSHConnectionManager()
 
 
+async def aiter_channel(channel: paramiko.Channel, chunk_size: int = 65536, idle_timeout: Optional[float] = None) -> AsyncIterator[Tuple[bytes, bytes]]:
+    """Yield (stdout, stderr) chunks from a channel as they arrive, without blocking the loop.
+
+    Uses the channel's readiness pipe with loop.add_reader, so no thread is
+    parked per channel. When idle_timeout is set, an empty (b"", b"") pair is
+    yielded after that many idle seconds so callers can flush buffers.
+    The iterator ends when the remote side closes the channel.
+    """
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    fd = channel.fileno()
+    loop.add_reader(fd, ready.set)
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(ready.wait(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                yield b"", b""
+                continue
+            ready.clear()
+            out = b""
+            err = b""
+            while channel.recv_ready():
+                out += channel.recv(chunk_size)
+            while channel.recv_stderr_ready():
+                err += channel.recv_stderr(chunk_size)
+            if out or err:
+                yield out, err
+            if channel.closed or (channel.eof_received and not channel.recv_ready() and not channel.recv_stderr_ready()):
+                return
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _to_thread_owned(func: Callable, *args, cleanup: Callable):
+    """asyncio.to_thread whose result is handed to cleanup if the awaiting task is cancelled first
+
+    A worker thread cannot be interrupted, so a pool slot or channel it
+    obtains after the caller gave up would otherwise leak.
+    """
+    fut = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(fut)
+    except asyncio.CancelledError:
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception() is not None or cleanup(f.result()))
+        raise
+
+
+def drain_channel(channel: paramiko.Channel, chunk_size: int = 65536, timeout: Optional[float] = None) -> Tuple[bytes, bytes]:
+    """Read a channel's stdout and stderr to EOF together (blocking).
+
+    Reading one stream to EOF before the other deadlocks once the unread
+    one fills its SSH window; this takes whichever has data. Raises
+    socket.timeout when nothing arrives for timeout seconds.
+    """
+    out = bytearray()
+    err = bytearray()
+    fd = channel.fileno()
+    while True:
+        if channel.recv_ready():
+            out += channel.recv(chunk_size)
+        elif channel.recv_stderr_ready():
+            err += channel.recv_stderr(chunk_size)
+        elif channel.eof_received or channel.closed:
+            return bytes(out), bytes(err)
+        elif not select.select([fd], [], [], timeout)[0]:
+            raise socket.timeout(f"no output within {timeout}s")
+
+
 def _parse_hostport(value: str, default_port: int) -> tuple[str, int]:
     s = (value or "").strip()
     if not s:
@@ -14,9 +14,10 @@ async def collect_once(cluster_uuid: str):
             return
         res = await session.execute(select(Node.id, Node.hostname, Node.ip_address).where(Node.cluster_id == cid))
         rows = res.all()
-        for nid, hn, ip in rows:
-            cpu, mem = metrics_collector._read_cpu_mem(hn, str(ip))
-            await metrics_collector._save_metrics(nid, hn, cid, cpu, mem)
+        samples, errors = await metrics_collector.probe_nodes([(nid, hn, str(ip), cid) for nid, hn, ip in rows])
+        for hn, err in errors.items():
+            print(f"Error probing {hn}: {err}")
+        await metrics_collector._save_samples(samples)
 
 async def runner(cluster_uuid: str, interval: int):
     while True:
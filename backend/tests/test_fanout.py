@@ -0,0 +1,53 @@
+import asyncio
+import time
+from app.log_reader import LogReader
+from app.services.fanout import fan_out
+
+
+def test_fan_out_bounds_concurrency_and_yields_in_completion_order():
+    active = 0
+    peak = 0
+
+    async def work(delay):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(delay)
+        active -= 1
+        return delay
+
+    async def run():
+        return [r.item async for r in fan_out([0.08, 0.01, 0.03, 0.02], work, limit=2, timeout=1)]
+
+    assert asyncio.run(run()) == [0.01, 0.03, 0.02, 0.08]
+    assert peak == 2
+
+
+def test_fan_out_deadline_is_per_item_and_errors_are_isolated():
+    async def work(item):
+        if item == "slow":
+            await asyncio.sleep(10)
+        if item == "bad":
+            raise RuntimeError("ssh down")
+        return item.upper()
+
+    async def run():
+        return {r.item: (r.value, r.error) async for r in fan_out(["ok", "slow", "bad"], work, limit=3, timeout=0.05)}
+
+    started = time.perf_counter()
+    assert asyncio.run(run()) == {"ok": ("OK", None), "slow": (None, "timeout"), "bad": (None, "ssh down")}
+    assert time.perf_counter() - started < 1.0
+
+
+def test_all_nodes_log_returns_partial_results():
+    reader = LogReader()
+
+    async def fake_read(node_name, log_type, ip, timeout=None):
+        if node_name == "dn2":
+            await asyncio.sleep(10)
+        return f"{node_name} {log_type}"
+
+    reader.aread_log = fake_read
+    nodes = [{"name": "dn1", "ip": "10.0.0.1"}, {"name": "dn2", "ip": "10.0.0.2"}, {"name": "dn3", "ip": None}]
+    logs = asyncio.run(reader.aread_all_nodes_log(nodes, "datanode", limit=4, node_timeout=0.05))
+    assert logs == {"dn1": "dn1 datanode", "dn2": "Error reading log: timeout", "dn3": "Error: IP address not found"}
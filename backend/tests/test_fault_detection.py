@@ -0,0 +1,143 @@
+import datetime
+import os
+import pytest
+from app.config import now_bj
+from app.services.fault_detection import FaultStreamDetector, RuleCatalog, detect_faults_from_log_text, validate_rules
+from app.services.ops_tools import _detect_faults_from_log_text
+
+
+def test_detect_faults_from_text_keeps_legacy_shape():
+    text = "\n".join([
+        "2024-01-01 10:00:00,001 INFO x: ok",
+        "2024-01-01 10:00:01,001 ERROR x: java.net.ConnectException: Connection refused",
+        "2024-01-01 10:00:02,001 WARN x: No space left on device",
+        "2024-01-01 10:00:03,001 ERROR x: Connection refused again",
+    ])
+    hits = {h["id"]: h for h in detect_faults_from_log_text(text)}
+    assert set(hits) == {"rpc_connection_refused", "disk_no_space"}
+    assert [e["lineNo"] for e in hits["rpc_connection_refused"]["examples"]] == [2, 4]
+    assert _detect_faults_from_log_text is detect_faults_from_log_text
+
+
+def test_stream_detector_counts_per_node_and_window():
+    det = FaultStreamDetector(max_examples=2)
+    now = now_bj()
+    old = now - datetime.timedelta(hours=5)
+    logs = [
+        {"host": "dn1", "service": "datanode", "message": "ERROR DiskOutOfSpaceException: /data", "timestamp": now},
+        {"host": "dn1", "service": "datanode", "message": "WARN No space left on device", "timestamp": now},
+        {"host": "dn1", "service": "datanode", "message": "WARN No space left on device", "timestamp": old},
+        {"host": "nn1", "service": "namenode", "message": "SafeModeException: Name node is in safe mode\n\tat x", "timestamp": now},
+        {"host": "nn1", "service": "namenode", "message": "INFO all good", "timestamp": now},
+    ]
+    assert det.observe("c1", logs) == 4
+    assert det.covered("c1", ["datanode", "namenode", "resourcemanager"]) == {("dn1", "datanode"), ("nn1", "namenode")}
+    assert det.covered("c1", ["datanode", "namenode"], node="nn1") == {("nn1", "namenode")}
+    assert det.covered("c1", ["datanode"], node="dn2") == set()  # another datanode is not covered by dn1
+    assert det.covered("c2", ["datanode"]) == set()
+
+    recent = {(h["node"], h["id"]): h for h in det.summary("c1", since_minutes=60)}
+    assert recent[("dn1", "disk_no_space")]["matchCountApprox"] == 2
+    assert recent[("dn1", "disk_no_space")]["totalSinceStart"] == 3
+    assert len(recent[("dn1", "disk_no_space")]["examples"]) == 2
+    assert recent[("nn1", "hdfs_safemode")]["examples"][0]["line"].startswith("SafeModeException")
+
+    wide = det.summary("c1", since_minutes=600)
+    assert {h["matchCountApprox"] for h in wide if h["id"] == "disk_no_space"} == {3}
+    assert [h["node"] for h in det.summary("c1", components=["namenode"])] == ["nn1"]
+
+
+def test_stream_coverage_goes_stale():
+    det = FaultStreamDetector()
+    det.observe("c1", [
+        {"host": "dn1", "service": "datanode", "message": "INFO ok", "timestamp": now_bj()},
+        {"host": "dn2", "service": "datanode", "message": "INFO ok", "timestamp": now_bj()},
+    ])
+    det._fed[("c1", "dn1", "datanode")] -= datetime.timedelta(minutes=2)
+    # a collector that stopped a few intervals ago no longer answers for its node
+    assert det.covered("c1", ["datanode"], stale_seconds=60) == {("dn2", "datanode")}
+    assert det.covered("c1", ["datanode"], stale_seconds=300) == {("dn1", "datanode"), ("dn2", "datanode")}
+
+
+def test_required_literal_extraction():
+    from app.services.fault_detection import required_literal
+    assert required_literal(r"java\.net\.ConnectException:\s*Connection refused") == "java.net.connectexception:"
+    assert required_literal(r"Call to .* failed on local exception") == " failed on local exception"
+    assert required_literal(r"foo(bar)?bazzz") == "bazzz"
+    assert required_literal(r"Refused|Denied") is None
+    assert required_literal(r"\d+") is None
+
+
+def test_rule_matcher_agrees_with_per_line_regexes():
+    import re
+    from app.services.fault_detection import RuleMatcher, FAULT_RULES
+    rules = FAULT_RULES + [{"id": "no_literal", "patterns": [r"\d{3}ms"]}]
+    m = RuleMatcher(rules)
+    lines = [
+        "INFO ok", "WARN connection REFUSED by peer", "Call to hadoop102 failed on local exception: x",
+        "took 250ms", "", "İstanbul OutOfMemoryError: Java heap space", "tail without newline ENOSPC",
+    ]
+    text = "\n".join(lines)
+    expected = []
+    for no, line in enumerate(lines, 1):
+        ids = [r["id"] for r in rules if any(re.search(p, line, re.I) for p in r["patterns"])]
+        if ids:
+            expected.append((no, line, ids))
+    got = [(no, line, [r["id"] for r in rs]) for no, _, line, rs in m.scan(text)]
+    assert got == expected
+    # ASCII-only text takes the literal prefilter path
+    ascii_text = text.replace("İ", "I")
+    assert [no for no, *_ in m.scan(ascii_text)] == [no for no, *_ in expected]
+
+
+_CATALOG_V1 = """
+version: v1
+rules:
+  - id: disk_fail
+    severity: high
+    title: disk failure
+    patterns: ["DiskErrorException", "Too many failed volumes"]
+  - id: muted
+    patterns: ["Connection refused"]
+    enabled: false
+"""
+
+
+def test_rule_catalog_loads_and_hot_reloads(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text(_CATALOG_V1, encoding="utf-8")
+    cat = RuleCatalog(str(path), check_interval=0)
+    assert cat.version == "v1" and cat.last_error is None
+    assert [r["id"] for r in cat.rules()] == ["disk_fail"]
+    text = "ERROR DiskErrorException: /data1\nWARN Connection refused\nINFO ok\nFATAL Too many failed volumes"
+    assert [line_no for line_no, _, _, _ in cat.matcher().scan(text)] == [1, 4]
+    stats = cat.describe()["rules"][0]["stats"]
+    assert stats["matchedLines"] == 2 and stats["lastHit"] is not None and stats["cpuMs"] >= 0
+
+    # a broken catalog keeps serving the previous rules
+    path.write_text("version: v2\nrules:\n  - id: bad\n    patterns: ['(unclosed']\n", encoding="utf-8")
+    os.utime(path, (1, 1))
+    assert [r["id"] for r in cat.rules()] == ["disk_fail"]
+    assert cat.version == "v1" and "bad pattern" in cat.last_error
+
+    path.write_text(_CATALOG_V1.replace("v1", "v3").replace("enabled: false", "enabled: true"), encoding="utf-8")
+    os.utime(path, (2, 2))
+    assert [r["id"] for r in cat.rules()] == ["disk_fail", "muted"]
+    assert cat.version == "v3" and cat.last_error is None
+    # statistics survive the reload
+    assert cat.describe()["rules"][0]["stats"]["matchedLines"] == 2
+
+
+def test_validate_rules_rejects_duplicates_and_empty_patterns():
+    with pytest.raises(ValueError):
+        validate_rules([{"id": "a", "patterns": ["x"]}, {"id": "a", "patterns": ["y"]}])
+    with pytest.raises(ValueError):
+        validate_rules([{"id": "a", "patterns": []}])
+
+
+def test_example_catalog_is_valid():
+    path = os.path.join(os.path.dirname(__file__), "..", "fault_rules.example.yaml")
+    cat = RuleCatalog(path)
+    assert cat.last_error is None
+    assert "datanode_disk_failure" in {r["id"] for r in cat.rules()}
+
@@ -0,0 +1,123 @@
+import asyncio
+import app.log_collector as lc
+
+def test_resume_offset_rules():
+    c = lc.LogCollector()
+    c.max_bytes_per_pull = 100
+    # no checkpoint: only the tail of the file, like the first poll used to do
+    assert c._resume_offset(1000, 7, None) == 900
+    assert c._resume_offset(50, 7, None) == 0
+    # same inode resumes exactly at the committed offset
+    assert c._resume_offset(1000, 7, (7, 420)) == 420
+    # truncated below the checkpoint
+    assert c._resume_offset(10, 7, (7, 420)) == 0
+    # different inode is a new file
+    assert c._resume_offset(1000, 8, (7, 420)) == 0
+
+def test_drain_file_commits_offsets_per_complete_line():
+    c = lc.LogCollector()
+    c.max_bytes_per_pull = 8
+    data = b"aaa\nbbb\ncc"
+    saved = []
+
+    async def _fake_read_range(node, ip, path, offset, length):
+        return data[offset:offset + length]
+
+    async def _fake_save(node, log_type, content, checkpoint=None):
+        saved.append((content, checkpoint["offset"]))
+        return True
+
+    c._read_range = _fake_read_range
+    c._save_log_chunk_async = _fake_save
+    reached = asyncio.run(c._drain_file("h1", "10.0.0.1", "namenode", "/logs/nn.log", 5, 0, len(data)))
+    # the unterminated "cc" is left for the next poll
+    assert reached == 8
+    assert saved == [("aaa\nbbb\n", 8)]
+
+def test_recover_rotated_drains_old_inode_to_eof():
+    c = lc.LogCollector()
+    old = b"x1\nx2\nlast-without-newline"
+    saved = []
+
+    async def _fake_find_rotated(node, ip, path, inode):
+        assert inode == 7
+        return path + ".1", len(old)
+
+    async def _fake_read_range(node, ip, path, offset, length):
+        assert path == "/logs/nn.log.1"
+        return old[offset:offset + length]
+
+    async def _fake_save(node, log_type, content, checkpoint=None):
+        saved.append((content, checkpoint))
+        return True
+
+    c._find_rotated = _fake_find_rotated
+    c._read_range = _fake_read_range
+    c._save_log_chunk_async = _fake_save
+    asyncio.run(c._recover_rotated("h1_namenode", "h1", "10.0.0.1", "namenode", "/logs/nn.log", (7, 3), 8))
+    assert saved == [("x2\nlast-without-newline", {"node_host": "h1", "file_path": "/logs/nn.log", "inode": 7, "offset": len(old)})]
+    assert c.rotation_recovered_bytes["h1_namenode"] == len(old) - 3
+
+def test_recover_rotated_noop_for_same_inode():
+    c = lc.LogCollector()
+
+    async def _boom(*args):
+        raise AssertionError("should not look for a rotated file")
+
+    c._find_rotated = _boom
+    asyncio.run(c._recover_rotated("h1_namenode", "h1", "10.0.0.1", "namenode", "/logs/nn.log", (8, 3), 8))
+    asyncio.run(c._recover_rotated("h1_namenode", "h1", "10.0.0.1", "namenode", "/logs/nn.log", None, 8))
+    assert c.rotation_recovered_bytes == {}
+
+def test_follow_logs_commits_frames_under_the_inode_they_came_from(monkeypatch):
+    c = lc.LogCollector()
+    path = "/logs/nn.log"
+    stats = iter([{path: (10, 7)}, {path: (30, 8)}, {path: (30, 8)}])
+    opened = []
+    saved = []
+    recovered = []
+
+    class _Channel:
+        def close(self):
+            pass
+
+    class _Conn:
+        def open_channel(self, command):
+            opened.append(command)
+            return _Channel()
+
+    async def _fake_stream(channel, idle_timeout=None):
+        if len(opened) > 1:
+            raise asyncio.CancelledError()
+        yield b"0\tbefore rotation\n", b""
+
+    async def _fake_stat(node, ip, paths):
+        return next(stats)
+
+    async def _fake_checkpoint(node, p):
+        return c._positions.get((node, p), (7, 10))
+
+    async def _fake_recover(collector_id, node, ip, log_type, p, checkpoint, inode):
+        recovered.append((checkpoint, inode))
+
+    async def _fake_save(node, log_type, content, checkpoint=None):
+        saved.append((content, checkpoint["inode"], checkpoint["offset"]))
+        c._positions[(node, checkpoint["file_path"])] = (checkpoint["inode"], checkpoint["offset"])
+        return True
+
+    async def _discover():
+        return {path: "namenode"}
+
+    monkeypatch.setattr(lc, "aiter_channel", _fake_stream)
+    monkeypatch.setattr(lc.ssh_manager, "get_connection", lambda *a, **k: _Conn())
+    c._stat_files = _fake_stat
+    c._load_checkpoint = _fake_checkpoint
+    c._recover_rotated = _fake_recover
+    c._save_log_chunk_async = _fake_save
+    c._intervals["h1_namenode"] = 0
+    asyncio.run(c._follow_logs("h1_namenode", "h1", "10.0.0.1", _discover))
+    # the frame was read from inode 7 and is committed there, even though the path now has inode 8
+    assert saved == [("before rotation\n", 7, 26)]
+    # the reopened stream drains the old file from that checkpoint and starts the new one at 0
+    assert recovered == [((7, 10), 7), ((7, 26), 8)]
+    assert "--bytes=+11 " in opened[0] and "--bytes=+1 " in opened[1]
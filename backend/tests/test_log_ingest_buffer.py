@@ -0,0 +1,65 @@
+import asyncio
+import app.log_ingest as li
+
+
+class _FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        self.log.append("commit")
+
+
+def _buffer(monkeypatch, log, fail=False, **kw):
+    async def _fake_write(session, records, mode="copy"):
+        if fail:
+            raise RuntimeError("db down")
+        log.append(("rows", len(records)))
+        return len(records)
+
+    async def _fake_upsert(session, checkpoint):
+        log.append(("cp", checkpoint["file_path"], checkpoint["offset"]))
+
+    monkeypatch.setattr(li, "write_log_records", _fake_write)
+    monkeypatch.setattr(li, "upsert_checkpoint", _fake_upsert)
+    return li.LogIngestBuffer(lambda: _FakeSession(log), max_retries=0, **kw)
+
+
+def test_buffer_coalesces_collectors_into_one_transaction(monkeypatch):
+    log = []
+    buf = _buffer(monkeypatch, log, max_batch_rows=100, max_delay=0.05)
+
+    async def _main():
+        cp = lambda path, off: {"node_host": "h1", "file_path": path, "inode": 1, "offset": off}
+        return await asyncio.gather(
+            buf.submit([("c",)] * 3, cp("/a.log", 10)),
+            buf.submit([("c",)] * 2, cp("/b.log", 20)),
+            buf.submit([("c",)] * 4, cp("/a.log", 30)),
+        )
+
+    assert asyncio.run(_main()) == [True, True, True]
+    # one flush: all rows, latest checkpoint per file, single commit
+    assert log == [("rows", 9), ("cp", "/a.log", 30), ("cp", "/b.log", 20), "commit"]
+    stats = buf.get_stats()
+    assert stats["flushes"] == 1 and stats["rows_written"] == 9 and stats["queue_depth_rows"] == 0
+
+
+def test_buffer_splits_at_batch_size_and_counts_drops(monkeypatch):
+    log = []
+    buf = _buffer(monkeypatch, log, max_batch_rows=2, max_delay=0.01)
+
+    async def _main():
+        return await asyncio.gather(*(buf.submit([("c",)]) for _ in range(5)))
+
+    assert asyncio.run(_main()) == [True] * 5
+    assert [e for e in log if e != "commit"] == [("rows", 2), ("rows", 2), ("rows", 1)]
+
+    failing = _buffer(monkeypatch, [], fail=True, max_delay=0.01)
+    assert asyncio.run(failing.submit([("c",)] * 3)) is False
+    assert failing.get_stats()["dropped_rows"] == 3
@@ -0,0 +1,56 @@
+from app.log_parser import Log4jParser
+
+
+def test_parse_default_hadoop_layout():
+    p = Log4jParser()
+    ev = p.parse_line("2024-01-01 10:00:00,123 WARN org.apache.hadoop.hdfs.server.datanode.DataNode: Slow BlockReceiver", "hadoop102", "datanode")
+    assert ev["log_level"] == "WARN"
+    assert ev["logger"] == "org.apache.hadoop.hdfs.server.datanode.DataNode"
+    assert ev["body"] == "Slow BlockReceiver"
+    assert (ev["timestamp"].hour, ev["timestamp"].microsecond) == (10, 123000)
+    assert ev["timestamp"].tzinfo is not None
+
+    short = p.parse_line("24/01/01 10:00:01 ERROR yarn.Client: Application failed", "h", "yarn")
+    assert short["log_level"] == "ERROR" and short["logger"] == "yarn.Client"
+    assert short["timestamp"].year == 2024
+
+    bracket = p.parse_line("[2024-12-17 10:00:00,456] INFO org.apache.hadoop.Foo: Started", "h", "namenode")
+    assert bracket["log_level"] == "INFO" and bracket["body"] == "Started"
+
+
+def test_stack_trace_folded_into_previous_event():
+    p = Log4jParser()
+    content = "\n".join([
+        "2024-01-01 10:00:00,001 INFO org.apache.hadoop.ipc.Server: ok",
+        "2024-01-01 10:00:00,002 ERROR org.apache.hadoop.hdfs.server.datanode.DataNode: IOException in offerService",
+        "java.io.EOFException: End of File Exception",
+        "\tat org.apache.hadoop.ipc.Client.call(Client.java:1476)",
+        "\tat org.apache.hadoop.ipc.Client.call(Client.java:1413)",
+        "Caused by: java.io.EOFException",
+        "\t... 12 more",
+        "Plain line without timestamp INFO something",
+    ])
+    events = p.parse_chunk(content, "hadoop102", "datanode")
+    assert len(events) == 3
+    err = events[1]
+    assert err["log_level"] == "ERROR"
+    assert err["message"].count("\n") == 5
+    assert err["message"].endswith("... 12 more")
+    assert events[2]["message"] == "Plain line without timestamp INFO something"
+
+
+def test_timestamp_cache_reused_per_second():
+    p = Log4jParser()
+    a = p.parse_line("2024-01-01 10:00:00,100 INFO a.B: x", "h", "s")["timestamp"]
+    b = p.parse_line("2024-01-01 10:00:00,900 INFO a.B: y", "h", "s")["timestamp"]
+    assert len(p._ts_cache) == 1
+    assert (b - a).total_seconds() == 0.8
+
+
+def test_fingerprint_ignores_variable_tokens():
+    p = Log4jParser()
+    a = p.parse_line("2024-01-01 10:00:00,001 INFO a.DataNode: Receiving blk_1073741825_1001 src: /10.0.0.1:50010", "h", "datanode")
+    b = p.parse_line("2024-01-01 10:00:01,002 INFO a.DataNode: Receiving blk_1073741999_1175 src: /10.0.0.7:50010", "h", "datanode")
+    c = p.parse_line("2024-01-01 10:00:01,002 INFO a.DataNode: Deleting blk_1073741999_1175", "h", "datanode")
+    assert a["fingerprint"] == b["fingerprint"] != c["fingerprint"]
+    assert len(a["fingerprint"]) == 16
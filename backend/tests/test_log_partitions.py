@@ -0,0 +1,81 @@
+import asyncio
+import datetime
+from app.services.log_partitions import (
+    partition_name, partition_day, partition_bounds, expired_partitions, default_days_to_rehome, ensure_partitions, apply_retention,
+)
+
+
+def test_partition_names_round_trip():
+    day = datetime.date(2024, 3, 9)
+    assert partition_name(day) == "hadoop_logs_p20240309"
+    assert partition_day("hadoop_logs_p20240309") == day
+    assert partition_day("hadoop_logs_default") is None
+    start, end = partition_bounds(day)
+    assert (end - start) == datetime.timedelta(days=1)
+    assert start.tzinfo is not None and start.hour == 0
+
+
+def test_expired_partitions_respects_retention():
+    names = ["hadoop_logs_p20240101", "hadoop_logs_p20240105", "hadoop_logs_p20240110", "hadoop_logs_default"]
+    today = datetime.date(2024, 1, 10)
+    assert expired_partitions(names, today, 5) == ["hadoop_logs_p20240101"]
+    assert expired_partitions(names, today, 4) == ["hadoop_logs_p20240101", "hadoop_logs_p20240105"]
+    assert expired_partitions(names, today, 0) == []
+
+
+def test_default_days_to_rehome_skips_expired_and_far_future():
+    today = datetime.date(2024, 1, 10)
+    days = [datetime.date(2024, 1, 1), datetime.date(2024, 1, 6), datetime.date(2024, 1, 12), datetime.date(2030, 1, 1)]
+    assert default_days_to_rehome(days, today, 5, 3) == [datetime.date(2024, 1, 6), datetime.date(2024, 1, 12)]
+    assert default_days_to_rehome(days, today, 0, 3)[0] == datetime.date(2024, 1, 1)
+
+
+class _FakeDb:
+    def __init__(self, partitions, default_days):
+        self.partitions = partitions
+        self.default_days = default_days
+        self.sql = []
+
+    async def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.sql.append((sql, params))
+        rows = []
+        if "FROM pg_inherits" in sql:
+            rows = [(p,) for p in self.partitions]
+        elif sql.startswith("SELECT DISTINCT"):
+            rows = [(d,) for d in self.default_days]
+        return type("R", (), {"all": lambda _: rows})()
+
+    def begin_nested(self):
+        return _Nested()
+
+    async def commit(self):
+        pass
+
+
+class _Nested:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_default_partition_rows_are_rehomed_and_expired():
+    today = datetime.date(2024, 1, 10)
+    existing = [partition_name(today + datetime.timedelta(days=i)) for i in range(-1, 2)] + ["hadoop_logs_default"]
+    db = _FakeDb(existing, [datetime.date(2024, 1, 1), datetime.date(2024, 1, 7)])
+    created = asyncio.run(ensure_partitions(db, days_ahead=1, today=today, retention_days=5))
+    assert created == ["hadoop_logs_p20240107"]
+    statements = [sql for sql, _ in db.sql]
+    moved = [(sql, params) for sql, params in db.sql if "DELETE FROM hadoop_logs_default" in sql]
+    assert moved and "INSERT INTO hadoop_logs_p20240107" in moved[0][0]
+    assert moved[0][1]["s"] == partition_bounds(datetime.date(2024, 1, 7))[0]
+    assert any(s.startswith("ALTER TABLE hadoop_logs ATTACH PARTITION hadoop_logs_p20240107") for s in statements)
+    # the expired day stays in the default partition until retention deletes it
+    assert not any("hadoop_logs_p20240101" in s for s in statements)
+
+    db = _FakeDb(existing, [])
+    asyncio.run(apply_retention(db, retention_days=5, today=today))
+    deletes = [(sql, params) for sql, params in db.sql if sql.startswith("DELETE FROM hadoop_logs_default")]
+    assert deletes == [("DELETE FROM hadoop_logs_default WHERE log_time < :c", {"c": partition_bounds(datetime.date(2024, 1, 5))[0]})]
@@ -0,0 +1,91 @@
+import asyncio
+import shutil
+import subprocess
+import pytest
+from app.services.log_ranges import LogRotatedError, decode_token, log_time_key, read_log_range, read_log_token
+
+pytestmark = pytest.mark.skipif(not (shutil.which("bash") and shutil.which("awk")), reason="needs bash and awk")
+
+LINES = [f"2024-01-01 10:00:{i:02d},000 INFO line {i}" for i in range(20)]
+LINES.insert(5, "\tat org.example.Foo(Foo.java:1)")
+DATA = "\n".join(LINES) + "\n"
+
+
+class LocalShell:
+    """Runs the remote pipeline with the local shell, like PooledSSHClient.aexecute"""
+
+    def __init__(self):
+        self.commands = []
+
+    async def aexecute(self, command, timeout=None):
+        self.commands.append(command)
+        p = subprocess.run(["bash", "-c", command], capture_output=True)
+        return p.returncode, p.stdout, p.stderr
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "hadoop-hadoop-namenode-nn1.log"
+    path.write_text(DATA)
+    return str(path)
+
+
+def test_forward_pages_cover_the_file_in_whole_lines(log_file):
+    sh = LocalShell()
+
+    async def run():
+        page = await read_log_range(sh, log_file, offset=0, length=120)
+        pages = [page]
+        while not page["eof"]:
+            page = await read_log_token(sh, page["next_token"], length=120)
+            pages.append(page)
+        return pages
+
+    pages = asyncio.run(run())
+    assert all(len(p["content"]) <= 120 and p["content"].endswith("\n") for p in pages)
+    assert "".join(p["content"] for p in pages) == DATA
+    # an offset inside a line starts at the next one
+    mid = asyncio.run(read_log_range(sh, log_file, offset=50, length=60))
+    assert mid["offset"] == DATA.index("2024-01-01 10:00:02") and mid["content"].startswith("2024-01-01 10:00:02")
+
+
+def test_tail_and_backward_pages(log_file):
+    sh = LocalShell()
+
+    async def run():
+        page = await read_log_range(sh, log_file, tail=True, length=100)
+        content = page["content"]
+        first = page["content"]
+        while page["prev_token"]:
+            page = await read_log_token(sh, page["prev_token"], length=100)
+            content = page["content"] + content
+        return first, content
+
+    first, content = asyncio.run(run())
+    assert first == "\n".join(LINES[-2:]) + "\n"
+    assert content == DATA
+
+
+def test_remote_filters_and_line_window(log_file):
+    sh = LocalShell()
+    page = asyncio.run(read_log_range(sh, log_file, pattern="line 1[0-9]$", since=log_time_key("2024-01-01T10:00:12"),
+                                      until="2024-01-01 10:00:14", length=100))
+    assert page["content"] == LINES[13] + "\n" + LINES[14] + "\n"
+    rest = asyncio.run(read_log_token(sh, page["next_token"], length=100))
+    assert rest["content"] == LINES[15] + "\n" and rest["next_token"] is None  # stopped past `until`
+    assert decode_token(page["next_token"])["g"] == "line 1[0-9]$"
+
+    window = asyncio.run(read_log_range(sh, log_file, line=5, max_lines=2))
+    assert window["content"] == LINES[4] + "\n" + LINES[5] + "\n"  # the stack trace line follows its entry
+
+
+def test_rotated_file_and_bad_pattern(log_file):
+    sh = LocalShell()
+    page = asyncio.run(read_log_range(sh, log_file, offset=0, length=100))
+    subprocess.run(["bash", "-c", f"mv {log_file} {log_file}.1 && printf 'new\\n' > {log_file}"], check=True)
+    with pytest.raises(LogRotatedError):
+        asyncio.run(read_log_token(sh, page["next_token"]))
+    with pytest.raises(ValueError):
+        asyncio.run(read_log_range(sh, log_file, pattern="("))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(read_log_range(sh, log_file + ".missing"))
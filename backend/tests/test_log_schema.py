@@ -0,0 +1,82 @@
+import asyncio
+from app.services import log_schema
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class _Conn:
+    """Records statements; answers the catalog queries of create_log_indexes"""
+
+    def __init__(self, partitions=(), valid=None):
+        self.sql = []
+        self.partitions = list(partitions)
+        self.valid = valid or {}
+        self.isolation_level = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execution_options(self, isolation_level=None):
+        self.isolation_level = isolation_level
+        return self
+
+    async def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.sql.append(sql)
+        if "FROM pg_index i JOIN pg_class c" in sql:
+            return _Result([(self.valid[params["n"]],)] if params["n"] in self.valid else [])
+        if "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'hadoop_logs'" in sql:
+            return _Result([(p,) for p in self.partitions])
+        if "pg_partitioned_table" in sql:
+            return _Result([(1,)] if self.partitions else [])
+        return _Result([])
+
+    async def commit(self):
+        pass
+
+
+class _Engine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return self.conn
+
+
+def test_ensure_log_schema_runs_no_index_ddl():
+    conn = _Conn()
+    asyncio.run(log_schema.ensure_log_schema(conn, force=True))
+    assert conn.sql and not any("INDEX" in s for s in conn.sql)
+
+
+def test_create_log_indexes_builds_concurrently_and_rebuilds_invalid():
+    conn = _Conn(valid={"ix_hadoop_logs_cluster_time": True, "ix_hadoop_logs_level_time": False})
+    asyncio.run(log_schema.create_log_indexes(_Engine(conn)))
+    assert conn.isolation_level == "AUTOCOMMIT"
+    creates = [s for s in conn.sql if s.startswith("CREATE INDEX")]
+    assert creates and all("CONCURRENTLY" in s for s in creates)
+    assert not any('"ix_hadoop_logs_cluster_time"' in s for s in creates)
+    assert 'DROP INDEX CONCURRENTLY IF EXISTS "ix_hadoop_logs_level_time"' in conn.sql
+
+
+def test_create_log_indexes_on_partitions_attaches_to_parent():
+    conn = _Conn(partitions=["hadoop_logs_default", "hadoop_logs_p20240101"])
+    asyncio.run(log_schema.create_log_indexes(_Engine(conn)))
+    assert 'CREATE INDEX IF NOT EXISTS "ix_hadoop_logs_cluster_time" ON ONLY hadoop_logs (cluster_name, log_time DESC)' in conn.sql
+    assert any(s.startswith('CREATE INDEX CONCURRENTLY IF NOT EXISTS "hadoop_logs_p20240101_cluster_time" ON hadoop_logs_p20240101') for s in conn.sql)
+    assert 'ALTER INDEX "ix_hadoop_logs_cluster_time" ATTACH PARTITION "hadoop_logs_default_cluster_time"' in conn.sql
@@ -0,0 +1,48 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+from app.models.hadoop_logs import HadoopLog
+from app.services.log_search import parse_search_query, search_condition, source_condition, TSVECTOR_SQL
+
+
+def test_parse_search_query_kinds():
+    q = parse_search_query('"slow blockreceiver" heartbeat* java.io.IOException NullPointerException Disk-full')
+    assert q.phrases == ["slow blockreceiver"]
+    assert q.prefixes == ["heartbeat"]
+    assert q.classes == ["java.io.IOException", "NullPointerException"]
+    assert q.terms == ["disk-full"]
+    assert _sql(q.tsquery()) == (
+        "(to_tsquery('simple', 'heartbeat:*') && phraseto_tsquery('simple', 'disk-full'))"
+        " && phraseto_tsquery('simple', 'slow blockreceiver')"
+    )
+    assert parse_search_query('"" * -').is_empty()
+
+
+def _sql(expr):
+    return str(expr.compile(dialect=PGDialect_asyncpg(), compile_kwargs={"literal_binds": True}))
+
+
+def test_search_condition_uses_indexed_expressions():
+    cond = search_condition(parse_search_query("timeout org.my_pkg.BadError"))
+    sql = _sql(select(HadoopLog.log_id).where(cond))
+    assert TSVECTOR_SQL + " @@ phraseto_tsquery('simple', 'timeout')" in sql
+    # LIKE wildcards in class names are escaped
+    assert "ILIKE '%org.my\\_pkg.BadError%'" in sql
+
+
+def test_block_ids_and_addresses_are_tokenized_by_postgres():
+    # Postgres splits blk_1073741825_1001 on "_" and keeps 10.0.0.1 as one lexeme;
+    # the tokens are passed whole so phraseto_tsquery parses them the same way to_tsvector did
+    q = parse_search_query("blk_1073741825_1001 10.0.0.1 hadoop102:9866 blk_10737*")
+    assert q.terms == ["blk_1073741825_1001", "10.0.0.1", "hadoop102:9866"]
+    assert q.substrings == ["blk_10737"]
+    sql = _sql(select(HadoopLog.log_id).where(search_condition(q)))
+    assert "phraseto_tsquery('simple', 'blk_1073741825_1001')" in sql
+    assert "phraseto_tsquery('simple', '10.0.0.1')" in sql
+    assert "ILIKE '%blk\\_10737%'" in sql
+
+
+def test_source_filter_keeps_partial_service_and_host_matches():
+    sql = _sql(select(HadoopLog.log_id).where(source_condition("hadoop10")))
+    assert "hadoop_logs.service ILIKE '%hadoop10%'" in sql
+    assert "hadoop_logs.node_host ILIKE '%hadoop10%'" in sql
+    assert TSVECTOR_SQL + " @@ phraseto_tsquery('simple', 'hadoop10')" in sql
@@ -0,0 +1,48 @@
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import pytest
+import app.log_collector as lc
+import app.log_reader as lr
+
+def test_split_follow_frames_keeps_partial_line():
+    data = b"0\tfirst line\n1\tsecond\r\n0\tthird"
+    frames, rest = lc.split_follow_frames(data)
+    assert frames == [(0, b"first line\n"), (1, b"second\r\n")]
+    assert rest == b"0\tthird"
+
+def test_split_follow_frames_ignores_unframed_lines():
+    frames, rest = lc.split_follow_frames(b"tail: cannot open\n2\tok\n")
+    assert frames == [(2, b"ok\n")]
+    assert rest == b""
+
+def test_build_follow_command_uses_one_channel_per_host():
+    cmd = lc.build_follow_command([("/logs/hadoop-hadoop-datanode-h1.log", 0), ("/logs/my dir/nm.log", 41)])
+    script = shlex.split(cmd)[2]
+    assert shlex.split(cmd)[:2] == ["sh", "-c"]
+    assert "--bytes=+1 /logs/hadoop-hadoop-datanode-h1.log" in script
+    assert "--bytes=+42 '/logs/my dir/nm.log'" in script
+    assert script.count("tail -f") == 2
+    assert script.endswith("wait")
+
+@pytest.mark.skipif(not (shutil.which("tail") and shutil.which("sed")), reason="needs tail and sed")
+def test_follow_command_frames_lines_from_offset(tmp_path):
+    a = tmp_path / "a.log"
+    b = tmp_path / "b.log"
+    a.write_bytes(b"skip\nx\ty\x00 \\n %s\n")
+    b.write_bytes(b"one\npartial")
+    proc = subprocess.Popen(shlex.split(lc.build_follow_command([(str(a), 5), (str(b), 0)])), stdout=subprocess.PIPE,
+                            start_new_session=True)
+    try:
+        lines = sorted(proc.stdout.readline() for _ in range(2))
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    assert lines == [b"0\tx\ty\x00 \\n %s\n", b"1\tone\n"]
+
+def test_service_from_filename():
+    assert lr.LogReader.service_from_filename("hadoop-hadoop-secondarynamenode-h1.log") == "secondarynamenode"
+    assert lr.LogReader.service_from_filename("hadoop-hadoop-nodemanager-h1.log") == "nodemanager"
+    assert lr.LogReader.service_from_filename("SecurityAuth-hadoop.audit") is None
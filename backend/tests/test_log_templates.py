@@ -0,0 +1,41 @@
+from app.log_templates import DrainMiner, TemplateMiners, WILDCARD
+
+
+def test_drain_groups_lines_and_extracts_params():
+    m = DrainMiner(scope="c|datanode")
+    t1, p1 = m.add("Receiving blk_1073741825_1001 src: /10.0.0.1:50010 dest: /10.0.0.2:50010")
+    t2, p2 = m.add("Receiving blk_1073741826_1002 src: /10.0.0.3:50010 dest: /10.0.0.2:50010")
+    t3, _ = m.add("Deleting block blk_1073741825_1001 file /data/dn/current/finalized")
+    assert t1 is t2 and t1 is not t3
+    assert t1.text == f"Receiving {WILDCARD} src: {WILDCARD} dest: {WILDCARD}"
+    assert p2 == ["blk_1073741826_1002", "/10.0.0.3:50010", "/10.0.0.2:50010"]
+    # differing words generalize the template; the id stays stable
+    t5, _ = m.add("Starting thread pool for volume /data/1")
+    t6, p6 = m.add("Starting thread pool for disk /data/2")
+    assert t6 is t5
+    assert t5.text == f"Starting thread pool for {WILDCARD} {WILDCARD}"
+    assert p6 == ["disk", "/data/2"]
+
+
+def test_template_ids_are_stable_across_miners_and_evicted_lru():
+    a = DrainMiner(scope="c|nn").add("Roll Edit Log from 10.0.0.1")[0].template_id
+    b = DrainMiner(scope="c|nn").add("Roll Edit Log from 10.0.0.7")[0].template_id
+    assert a == b
+    m = DrainMiner(max_templates=2)
+    m.add("alpha one")
+    m.add("beta two three")
+    m.add("gamma")
+    assert len(m.templates) == 2
+
+
+def test_annotate_counts_per_template():
+    miners = TemplateMiners()
+    logs = [
+        {"service": "datanode", "body": f"Receiving blk_{i} src: /10.0.0.{i}:50010", "message": "", "timestamp": i}
+        for i in range(3)
+    ] + [{"service": "datanode", "body": "Starting DataNode", "message": "", "timestamp": 9}]
+    counts = miners.annotate("c1", logs)
+    assert sorted(v["count"] for v in counts.values()) == [1, 3]
+    assert logs[0]["template_id"] == logs[2]["template_id"] != logs[3]["template_id"]
+    big = counts[("c1", logs[0]["template_id"])]
+    assert (big["first_seen"], big["last_seen"]) == (0, 2)
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from app.metrics_collector import MetricsCollector, next_tick
+from app.services.metrics_store import values_clause
+
+
+def test_next_tick_is_wall_clock_aligned():
+    assert next_tick(100.0, 5) == 105
+    assert next_tick(103.9, 5) == 105
+    assert next_tick(105.0, 5) == 110
+
+
+def test_values_clause_binds_every_cell():
+    sql, params = values_clause([{"a": 1, "b": None}, {"a": 2, "b": 3.5}], (("a", "INTEGER"), ("b", "DOUBLE PRECISION")))
+    assert sql == "(CAST(:a_0 AS INTEGER), CAST(:b_0 AS DOUBLE PRECISION)), (CAST(:a_1 AS INTEGER), CAST(:b_1 AS DOUBLE PRECISION))"
+    assert params == {"a_0": 1, "b_0": None, "a_1": 2, "b_1": 3.5}
+
+
+def test_tick_probes_nodes_concurrently_and_writes_once():
+    mc = MetricsCollector()
+    active = 0
+    peak = 0
+
+    async def fake_probe(node_name, ip):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        if node_name == "bad":
+            raise RuntimeError("ssh down")
+        return {"cpu": 10.0, "mem": 20.0, "disk": 30.0, "load1": 0.5, "net_rx_bps": None, "net_tx_bps": None}
+
+    writes = []
+
+    async def fake_save(samples, engine=None):
+        writes.append(samples)
+
+    mc._aprobe = fake_probe
+    mc._save_samples = fake_save
+    mc._get_engine = lambda: None
+    for i in range(8):
+        mc.collectors[f"dn{i}"] = (i, f"dn{i}", "10.0.0.1", 1)
+    mc.collectors["bad"] = (99, "bad", "10.0.0.2", 1)
+
+    started = time.perf_counter()
+    asyncio.run(mc._tick(1000.0))
+    elapsed = time.perf_counter() - started
+
+    assert peak > 1 and elapsed < 0.05 * 9
+    assert len(writes) == 1 and len(writes[0]) == 8
+    assert {s["ts"].timestamp() for s in writes[0]} == {1000.0}
+    assert writes[0][0]["disk"] == 30.0
+    assert mc.last_errors == {"bad": "ssh down"}
+    assert mc.tick_stats["ticks"] == 1
@@ -0,0 +1,65 @@
+import datetime
+from app.config import BJ_TZ
+from app.services.metrics_store import MetricTier, cluster_rollup, expiry_cutoffs, fill_series, format_times, pick_bucket_seconds, pick_tier
+
+
+def _ts(h, m=0, s=0):
+    return datetime.datetime(2024, 1, 1, h, m, s, tzinfo=BJ_TZ)
+
+
+def test_cluster_rollup_uses_latest_sample_per_node():
+    samples = [
+        {"cluster_id": 1, "node_id": 10, "cpu": 90.0, "mem": 50.0, "ts": _ts(10, 0, 0)},
+        {"cluster_id": 1, "node_id": 10, "cpu": 10.0, "mem": 20.0, "ts": _ts(10, 0, 5)},
+        {"cluster_id": 1, "node_id": 11, "cpu": 30.0, "mem": 40.0, "ts": _ts(10, 0, 3)},
+        {"cluster_id": 2, "node_id": 20, "cpu": 70.0, "mem": 10.0, "ts": _ts(10, 0, 1)},
+    ]
+    rows = {r["cid"]: r for r in cluster_rollup(samples)}
+    assert rows[1] == {"cid": 1, "cpu": 20.0, "mem": 30.0, "ts": _ts(10, 0, 5)}
+    assert rows[2]["cpu"] == 70.0
+
+
+def test_pick_bucket_seconds_bounds_points():
+    assert pick_bucket_seconds(_ts(10), _ts(10, 10)) == 5
+    assert pick_bucket_seconds(_ts(0), _ts(0) + datetime.timedelta(days=1)) == 900
+    assert pick_bucket_seconds(_ts(0), _ts(0) + datetime.timedelta(days=365)) == 86400
+
+
+def test_fill_series_marks_empty_buckets():
+    rows = [(_ts(10, 0), 12.345), (_ts(10, 2), 40.0)]
+    times, values = fill_series(rows, _ts(10, 0, 30), _ts(10, 3), 60)
+    assert times == [_ts(10, 0), _ts(10, 1), _ts(10, 2)]
+    assert values == [12.35, None, 40.0]
+    assert format_times(times, _ts(10, 0, 30), _ts(10, 3)) == ["10:00", "10:01", "10:02"]
+
+
+_TIERS = (
+    MetricTier("raw", "node_metrics", 0, datetime.timedelta(hours=48)),
+    MetricTier("1m", "node_metrics_1m", 60, datetime.timedelta(days=30), "raw"),
+    MetricTier("1h", "node_metrics_1h", 3600, datetime.timedelta(days=400), "1m"),
+)
+
+
+def test_pick_tier_uses_coarsest_tier_that_fits_step_and_range():
+    now = _ts(12)
+    hour_ago = now - datetime.timedelta(hours=1)
+    assert pick_tier(5, hour_ago, now, _TIERS).name == "raw"
+    assert pick_tier(60, hour_ago, now, _TIERS).name == "1m"
+    assert pick_tier(900, hour_ago, now, _TIERS).name == "1m"
+    assert pick_tier(3600, hour_ago, now, _TIERS).name == "1h"
+    # raw samples are gone for last week: fall back to the 1m tier even for a 5s step
+    assert pick_tier(5, now - datetime.timedelta(days=7), now, _TIERS).name == "1m"
+    assert pick_tier(60, now - datetime.timedelta(days=90), now, _TIERS).name == "1h"
+    assert pick_tier(60, now - datetime.timedelta(days=1000), now, _TIERS).name == "1h"
+
+
+def test_expiry_never_drops_rows_not_yet_rolled_up():
+    now = _ts(12)
+    cutoffs = expiry_cutoffs(_TIERS, {"1m": now - datetime.timedelta(days=3, seconds=30)}, now)
+    # raw TTL is 48h but the 1m tier only reaches three days back
+    assert cutoffs["raw"] == now - datetime.timedelta(days=3, minutes=1)
+    assert "1m" not in cutoffs  # 1h has never run
+    assert cutoffs["1h"] == now - datetime.timedelta(days=400)
+    cutoffs = expiry_cutoffs(_TIERS, {"1m": now, "1h": now}, now)
+    assert cutoffs["raw"] == now - datetime.timedelta(hours=48)
+    assert cutoffs["1m"] == now - datetime.timedelta(days=30)
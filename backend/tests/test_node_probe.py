@@ -0,0 +1,84 @@
+import asyncio
+from app.services.node_probe import NodeProber, compute_metrics, parse_probe_output
+
+
+def _payload(ts, cpu, rx, sectors_read):
+    return "\n".join([
+        f"@ts {ts}",
+        "@stat",
+        "cpu  " + " ".join(str(v) for v in cpu),
+        "@mem",
+        "MemTotal:        1000 kB",
+        "MemAvailable:     250 kB",
+        "@load",
+        "1.50 1.00 0.50 2/300 4242",
+        "@net",
+        "    lo: 999 1 0 0 0 0 0 0 999 1 0 0 0 0 0 0",
+        f"  eth0: {rx} 10 0 0 0 0 0 0 {rx // 2} 10 0 0 0 0 0 0",
+        "@disk",
+        f"sda 10 {sectors_read} 5 0 7",
+        f"sda1 10 {sectors_read} 5 0 7",
+        "@blk",
+        "sda",
+        "@df",
+        "/dev/sda1 1000 600 200 75% /",
+        "/dev/sdb1 1000 200 600 25% /data",
+        "@jvm",
+        "4242 namenode 524288 87 ",
+        "@end",
+    ])
+
+
+def test_parse_probe_output_sections():
+    raw = parse_probe_output(_payload(100.0, [100, 0, 100, 800, 0, 0, 0, 0], 1000, 0))
+    assert raw["complete"] and raw["ts"] == 100.0
+    assert raw["mem"] == {"MemTotal": 1000, "MemAvailable": 250}
+    assert raw["load"] == (1.5, 1.0, 0.5)
+    assert raw["net"] == {"eth0": (1000, 500)}
+    assert list(raw["disk"]) == ["sda"]  # partitions dropped
+    assert raw["jvm"] == [{"pid": 4242, "role": "namenode", "rss_kb": 524288, "threads": 87}]
+
+
+def test_compute_metrics_uses_previous_counters():
+    prev = parse_probe_output(_payload(100.0, [100, 0, 100, 800, 0, 0, 0, 0], 1000, 0))
+    cur = parse_probe_output(_payload(102.0, [160, 0, 140, 900, 0, 0, 0, 0], 5000, 8))
+    m = compute_metrics(prev, cur)
+    assert m["cpu"] == 50.0
+    assert m["mem"] == 75.0
+    assert m["disk"] == 50.0  # 800 used of 1600 usable
+    assert m["net_rx_bps"] == 2000.0 and m["net_tx_bps"] == 1000.0
+    assert m["disk_read_bps"] == 2048.0
+    assert compute_metrics(None, cur)["cpu"] is None
+
+
+def test_prober_runs_one_exec_per_sample_after_warmup():
+    calls = []
+    payloads = iter([
+        _payload(100.0, [100, 0, 100, 800, 0, 0, 0, 0], 0, 0),
+        _payload(101.0, [150, 0, 150, 900, 0, 0, 0, 0], 0, 0),
+        _payload(102.0, [150, 0, 150, 1000, 0, 0, 0, 0], 0, 0),
+    ])
+
+    def execute(cmd):
+        calls.append(cmd)
+        return next(payloads), ""
+
+    prober = NodeProber(warmup=0.01)
+    assert prober.sample("dn1", execute)["cpu"] == 50.0
+    assert len(calls) == 2  # baseline + sample
+    assert prober.sample("dn1", execute)["cpu"] == 0.0
+    assert len(calls) == 3
+
+
+def test_async_prober_shares_previous_counters():
+    payloads = iter([
+        _payload(100.0, [100, 0, 100, 800, 0, 0, 0, 0], 0, 0),
+        _payload(101.0, [150, 0, 150, 900, 0, 0, 0, 0], 0, 0),
+    ])
+
+    async def execute(cmd):
+        return next(payloads), ""
+
+    prober = NodeProber(warmup=0.0)
+    assert asyncio.run(prober.asample("dn1", execute))["cpu"] is None
+    assert asyncio.run(prober.asample("dn1", execute))["cpu"] == 50.0
@@ -0,0 +1,36 @@
+import datetime
+import uuid
+import pytest
+from types import SimpleNamespace
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from app.config import BJ_TZ
+from app.models.hadoop_logs import HadoopLog
+from app.services.pagination import encode_cursor, decode_cursor, keyset_page, next_cursor
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    ts = datetime.datetime(2024, 1, 1, 10, 0, 0, 123000, tzinfo=BJ_TZ)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+    uid = uuid.uuid4()
+    assert decode_cursor(encode_cursor(ts, uid), key_type=uuid.UUID) == (ts, uid)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_keyset_page_seeks_after_cursor():
+    ts = datetime.datetime(2024, 1, 1, tzinfo=BJ_TZ)
+    stmt = keyset_page(select(HadoopLog), HadoopLog.log_time, HadoopLog.log_id, 10, encode_cursor(ts, 7))
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "(hadoop_logs.log_time, hadoop_logs.log_id) < (" in sql
+    assert "ORDER BY hadoop_logs.log_time DESC, hadoop_logs.log_id DESC" in sql
+    assert "OFFSET" not in sql
+
+
+def test_next_cursor_uses_last_row_of_page():
+    ts = datetime.datetime(2024, 1, 1, tzinfo=BJ_TZ)
+    rows = [SimpleNamespace(log_time=ts, log_id=i) for i in (5, 4, 3)]
+    page, nxt = next_cursor(rows, 2, "log_time", "log_id")
+    assert [r.log_id for r in page] == [5, 4]
+    assert decode_cursor(nxt) == (ts, 4)
+    assert next_cursor(rows, 3, "log_time", "log_id") == (rows, None)
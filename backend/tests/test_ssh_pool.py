@@ -0,0 +1,355 @@
+import asyncio
+import os
+import threading
+import time
+from app.ssh_utils import HostPool, SSHConnectionManager, drain_channel
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, n):
+        self.keepalive = n
+
+
+class FakeParamiko:
+    def __init__(self):
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+
+class FakeChannel:
+    def __init__(self):
+        self.closed = False
+        self.eof_received = False
+
+    def exit_status_ready(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+class PipeChannel:
+    """Channel with a real readiness fd, fed from the test like paramiko's buffered pipe"""
+
+    def __init__(self, command):
+        self.command = command
+        self.closed = False
+        self.eof_received = False
+        self.status = None
+        self.out = b""
+        self.err = b""
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+
+    def fileno(self):
+        return self._r
+
+    def feed(self, out=b"", err=b"", status=None):
+        self.out += out
+        self.err += err
+        if status is not None:
+            self.status = status
+            self.eof_received = True
+        os.write(self._w, b"x")
+
+    def _drain(self):
+        if not self.out and not self.err:
+            try:
+                os.read(self._r, 1024)
+            except BlockingIOError:
+                pass
+
+    def recv_ready(self):
+        return bool(self.out)
+
+    def recv_stderr_ready(self):
+        return bool(self.err)
+
+    def recv(self, n):
+        data, self.out = self.out[:n], self.out[n:]
+        self._drain()
+        return data
+
+    def recv_stderr(self, n):
+        data, self.err = self.err[:n], self.err[n:]
+        self._drain()
+        return data
+
+    def exit_status_ready(self):
+        return self.status is not None or self.closed
+
+    def recv_exit_status(self):
+        return self.status if self.status is not None else -1
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            os.close(self._r)
+            os.close(self._w)
+
+
+class FakeClient:
+    created = []
+
+    def __init__(self, ip, username, password, port):
+        self.ip, self.username, self.password = ip, username, password
+        self.client = None
+        self.active_calls = 0
+        self.peak = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        FakeClient.created.append(self)
+
+    def connect(self):
+        time.sleep(0.01)
+        self.client = FakeParamiko()
+
+    def close(self):
+        self.closed = True
+        if self.client:
+            self.client.transport.active = False
+
+    def execute_command(self, command):
+        with self._lock:
+            self.active_calls += 1
+            self.peak = max(self.peak, self.active_calls)
+        time.sleep(0.02)
+        with self._lock:
+            self.active_calls -= 1
+        return command, ""
+
+    def open_channel(self, command):
+        if command.startswith("async:"):
+            self.channel = PipeChannel(command)
+            return self.channel
+        return FakeChannel()
+
+
+def test_pool_bounds_transports_and_channels_under_concurrency():
+    FakeClient.created = []
+    pool = HostPool("10.0.0.1", "hadoop", "pw", max_transports=2, max_channels=3, client_factory=FakeClient)
+    mgr_errors = []
+
+    def worker():
+        try:
+            client = pool.acquire()
+            try:
+                client.execute_command("echo")
+            finally:
+                pool.release(client)
+        except Exception as e:
+            mgr_errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(30)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not mgr_errors
+    assert len(FakeClient.created) == 2  # no reconnect storm
+    assert all(c.peak <= 3 for c in FakeClient.created)
+    assert pool.stats()["inflight"] == 0
+
+
+def test_streaming_channel_holds_slot_until_closed():
+    FakeClient.created = []
+    mgr = SSHConnectionManager(client_factory=FakeClient)
+    cli = mgr.get_connection("nn1", ip="10.0.0.1")
+    cli.pool.max_transports = 1
+    ch = cli.open_channel("tail -F x")
+    assert cli.pool.stats()["streaming"] == 1 and cli.pool.stats()["inflight"] == 1
+    ch.close()
+    assert cli.pool.stats() == {"transports": 1, "inflight": 0, "streaming": 0, "connects": 1}
+
+
+def test_credential_change_does_not_close_busy_transport():
+    FakeClient.created = []
+    mgr = SSHConnectionManager(client_factory=FakeClient)
+    old = mgr.get_connection("dn1", ip="10.0.0.2", username="hadoop", password="a")
+    busy = old.pool.acquire()
+    new = mgr.get_connection("dn1", ip="10.0.0.2", username="hadoop", password="b")
+    assert new.pool is not old.pool and not busy.closed
+    # omitted credentials keep the last ones used for the node
+    assert mgr.get_connection("dn1").pool is new.pool
+    assert mgr.get_connection("dn1", ip="10.0.0.2").pool is new.pool
+    old.pool.release(busy)
+    mgr.get_connection("dn1")
+    assert len(mgr.pools) == 1
+    # the evicted pool is closed in the background, off the caller's thread
+    deadline = time.monotonic() + 2
+    while not busy.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert busy.closed
+
+
+def test_release_does_not_wait_for_a_slow_connect():
+    connecting = threading.Event()
+    proceed = threading.Event()
+
+    class SlowClient(FakeClient):
+        def connect(self):
+            if FakeClient.created[0] is not self:
+                connecting.set()
+                proceed.wait(5)
+            super().connect()
+
+    FakeClient.created = []
+    pool = HostPool("10.0.0.5", "hadoop", "pw", max_transports=2, max_channels=1, client_factory=SlowClient)
+    first = pool.acquire()
+    waiter = threading.Thread(target=lambda: pool.release(pool.acquire()))
+    waiter.start()
+    assert connecting.wait(5)
+    started = time.monotonic()
+    pool.release(first)
+    assert pool.stats()["transports"] == 1
+    assert time.monotonic() - started < 0.5
+    proceed.set()
+    waiter.join(5)
+    assert not waiter.is_alive() and pool.stats()["inflight"] == 0
+
+
+def test_release_of_a_broken_transport_does_not_wait_for_close():
+    closing = threading.Event()
+
+    class SlowCloseClient(FakeClient):
+        def close(self):
+            closing.wait(5)
+            super().close()
+
+    FakeClient.created = []
+    pool = HostPool("10.0.0.6", "hadoop", "pw", client_factory=SlowCloseClient)
+    client = pool.acquire()
+    started = time.monotonic()
+    pool.release(client, broken=True, wait=False)
+    assert time.monotonic() - started < 0.5
+    assert pool.stats() == {"transports": 0, "inflight": 0, "streaming": 0, "connects": 1}
+    closing.set()
+
+
+def test_idle_transports_are_evicted():
+    FakeClient.created = []
+    pool = HostPool("10.0.0.3", "hadoop", "pw", idle_seconds=0.0, client_factory=FakeClient)
+    client = pool.acquire()
+    pool.release(client)
+    time.sleep(0.01)
+    assert pool.stats()["transports"] == 0 and client.closed
+
+
+def test_aexecute_reads_output_without_a_thread_per_command():
+    FakeClient.created = []
+    mgr = SSHConnectionManager(client_factory=FakeClient)
+    cli = mgr.get_connection("dn2", ip="10.0.0.4")
+
+    async def run():
+        task = asyncio.ensure_future(cli.aexecute_command_with_status("async:echo"))
+        while not getattr(FakeClient.created[-1] if FakeClient.created else None, "channel", None):
+            await asyncio.sleep(0.005)
+        channel = FakeClient.created[0].channel
+        channel.feed(out=b"hel")
+        await asyncio.sleep(0.01)
+        channel.feed(out=b"lo\xff", err=b"warn", status=3)
+        return await task
+
+    assert asyncio.run(run()) == (3, "hello\ufffd", "warn")
+    assert FakeClient.created[0].channel.closed
+    assert cli.pool.stats()["inflight"] == 0
+
+
+def test_aexecute_timeout_closes_channel_and_frees_slot():
+    FakeClient.created = []
+    mgr = SSHConnectionManager(client_factory=FakeClient)
+    cli = mgr.get_connection("dn3", ip="10.0.0.5")
+
+    async def run():
+        try:
+            await cli.aexecute("async:sleep 100", timeout=0.1)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    started = time.perf_counter()
+    assert asyncio.run(run())
+    assert time.perf_counter() - started < 1.0
+    assert FakeClient.created[0].channel.closed
+    assert cli.pool.stats()["inflight"] == 0
+
+
+def test_astream_decodes_split_characters_and_yields_lines():
+    FakeClient.created = []
+    mgr = SSHConnectionManager(client_factory=FakeClient)
+    cli = mgr.get_connection("dn4", ip="10.0.0.6")
+
+    async def run():
+        got = []
+        async with cli.astream("async:cat x", lines=True, timeout=2) as stream:
+            async for item in stream:
+                got.append(item)
+                if len(got) == 1:
+                    channel = FakeClient.created[0].channel
+                    channel.feed(out=b"\xe6\x97", err=b"warn\n")
+                    await asyncio.sleep(0.01)
+                    channel.feed(out=b"\xa5\xe5\xbf\x97\nlast", status=0)
+            return got, stream.exit_status
+
+    async def start():
+        task = asyncio.ensure_future(run())
+        while not getattr(FakeClient.created[-1] if FakeClient.created else None, "channel", None):
+            await asyncio.sleep(0.005)
+        FakeClient.created[0].channel.feed(out=b"first\n")
+        return await task
+
+    got, status = asyncio.run(start())
+    assert [t for name, t in got if name == "stdout"] == ["first", "日志", "last"]
+    assert [t for name, t in got if name == "stderr"] == ["warn"]
+    assert status == 0
+    assert FakeClient.created[0].channel.closed and cli.pool.stats()["inflight"] == 0
+
+
+def test_astream_stops_at_max_bytes_and_closes_channel():
+    FakeClient.created = []
+    mgr = SSHConnectionManager(client_factory=FakeClient)
+    cli = mgr.get_connection("dn5", ip="10.0.0.7")
+
+    async def feed():
+        while not getattr(FakeClient.created[-1] if FakeClient.created else None, "channel", None):
+            await asyncio.sleep(0.005)
+        FakeClient.created[0].channel.feed(out=b"x" * 100)
+
+    async def run():
+        stream = cli.astream("async:cat big", max_bytes=10, timeout=2)
+        feeder = asyncio.ensure_future(feed())
+        chunks = []
+        async with stream:
+            async for _, text in stream:
+                chunks.append(text)
+        await feeder
+        return "".join(chunks), stream
+
+    text, stream = asyncio.run(run())
+    assert text == "x" * 10 and stream.truncated and stream.exit_status is None
+    assert FakeClient.created[0].channel.closed and cli.pool.stats()["inflight"] == 0
+
+
+def test_drain_channel_reads_stderr_while_stdout_is_pending():
+    channel = PipeChannel("cmd")
+
+    def remote():
+        for i in range(50):
+            channel.feed(err=b"e" * 1000)
+            time.sleep(0.001)
+        channel.feed(out=b"done", status=0)
+
+    t = threading.Thread(target=remote)
+    t.start()
+    out, err = drain_channel(channel, chunk_size=512, timeout=2)
+    t.join()
+    assert out == b"done" and err == b"e" * 50000
+    channel.close()